@@ -27,12 +27,93 @@ Key (path)                          Value (object)
 Note:   The keys for objects in this dictionary, including
         the ServiceRoot key, do NOT have trailing slashes.
 
+The fish is a FishDict, which works exactly like a normal dictionary
+but also calls a list of listener functions with the key of any
+object that is set, replaced, or deleted. Code that changes an object
+in place (for example, fish[key]['Name'] = 'New') must call
+fish.touch(key) afterwards, so that listeners (such as the response
+cache) learn about the change. With the "lazyFish" configuration
+parameter, the fish becomes a LazyFishDict (see fishem_lazyfish.py),
+which decodes each object from the input fish file when it is first
+read; with the "fishStore" configuration parameter set to "sqlite",
+it becomes a SqlFishDict (see fishem_sqlfish.py), which keeps the
+objects in a SQLite database.
+
 fishem configuration setup information is shared in a dictionary
 named "fishem_config".
 """
 
+
+# Class: FishDict
+
+class FishDict(dict):
+    """Dictionary type for the fish. Calls each function in
+    'listeners' with the key of every object that is set, replaced,
+    or deleted, and of every object reported by touch(). 'forkable'
+    is False for types that cannot be used in a forked child process
+    (see fishem_snapshot.py)."""
+
+    forkable = True
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self.listeners = []
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        for listener in self.listeners:
+            listener(key)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        for listener in self.listeners:
+            listener(key)
+
+    def pop(self, key, *default):
+        present = key in self
+        value = dict.pop(self, key, *default)
+        if present:
+            for listener in self.listeners:
+                listener(key)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        for listener in self.listeners:
+            listener(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        keys = list(self)
+        dict.clear(self)
+        for key in keys:
+            for listener in self.listeners:
+                listener(key)
+
+    def touch(self, key):
+        """Reports that the object for 'key' was changed in place."""
+        for listener in self.listeners:
+            listener(key)
+
+    def peek(self, key, default=None):
+        """Returns the object for 'key' like get(), for code that reads
+        every object, such as saving the fish; with a lazily loaded
+        fish (see fishem_lazyfish.py), objects that have not been
+        read yet are not kept in memory."""
+        return dict.get(self, key, default)
+
+
 # fish data dictionary
-fish = {}
+fish = FishDict()
 
 # fishem configuration dictionary (set by fishem.py)
 fishem_config = {}
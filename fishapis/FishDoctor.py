@@ -11,7 +11,7 @@ Based upone Singleton template version 0.9.0
 """
 
 # Standard library module imports
-# None
+import os                               # Snapshot file names
 
 # Third party module imports
 from flask_restful import Resource      # REST operations
@@ -22,6 +22,13 @@ from flask import make_response         # Allow header handling
 from fish_data import fish              # Fish data
 from fish_data import fishem_config     # fishem config parameters
 import fishem_httpcodes as HTTP         # HTTP status codes
+import fishem_respcache                 # Serialized response cache
+import fishem_etag                      # ETag support
+import fishem_subtree                   # Subtree index
+import fishem_members                   # Collection membership index
+import fishem_links                     # Reverse-link index
+import fishem_snapshot                  # Background fish snapshots
+import fishem_fishpatch                 # Fish patches
 
 # Constants
 # None
@@ -63,7 +70,6 @@ class FishDoctor(Resource):
             ):
         """Defines GET behavior. Called by flask_restful."""
         # TODO: Add FishDoctor enabled check
-        # TODO: Add ETag support
         #
         # Handle GET request
         root_key = '/redfish/v1'
@@ -76,7 +82,7 @@ class FishDoctor(Resource):
         if inst_key not in fish:
             return 'Object not found', HTTP.NOT_FOUND
         # Return the requested object
-        return fish[inst_key], HTTP.OK
+        return fishem_respcache.get_response(inst_key)
         # End of get()
 
     def put(
@@ -86,7 +92,6 @@ class FishDoctor(Resource):
         """Defines PUT behavior. Called by flask_restful."""
         # When not empty, arguments hold values from the URI
         # TODO: Add FishDoctor enabled check
-        # TODO: Add ETag support
         #
         # Handle PUT request
         root_key = '/redfish/v1'
@@ -99,6 +104,10 @@ class FishDoctor(Resource):
         # TODO: Determine if Fishdoctor needs this check
         if inst_key not in fish:
             return 'Object not found', HTTP.NOT_FOUND
+        # Handle If-Match; the client's ETag must be the current one
+        resp = fishem_etag.precondition_failed(inst_key)
+        if resp is not None:
+            return resp
         # Get JSON input, with minimal JSON checking
         json_input = request.get_json(force = True, silent = True)
         if json_input == None:
@@ -117,7 +126,8 @@ class FishDoctor(Resource):
         # Replace the old object with the new object
         fish[inst_key] = json_input
         # Return a copy of the new object
-        return fish[inst_key], HTTP.OK
+        return fish[inst_key], HTTP.OK, \
+            {'ETag': fishem_etag.etag(inst_key)}
         # End of put()
 
     def patch(
@@ -126,7 +136,6 @@ class FishDoctor(Resource):
             ):
         """Defines PATCH behavior. Called by flask_restful."""
         # TODO: Add FishDoctor enabled check
-        # TODO: Add ETag support
         #
         # Handle PATCH request
         root_key = '/redfish/v1'
@@ -138,6 +147,10 @@ class FishDoctor(Resource):
         # Ensure object is in the fish object dictionary
         if inst_key not in fish:
             return 'Object not found', HTTP.NOT_FOUND
+        # Handle If-Match; the client's ETag must be the current one
+        resp = fishem_etag.precondition_failed(inst_key)
+        if resp is not None:
+            return resp
         # Get JSON input, with minimal JSON checking
         json_input = request.get_json(force = True, silent = True)
         if json_input == None:
@@ -151,11 +164,17 @@ class FishDoctor(Resource):
             if new_key != inst_key:
                 return 'Bad @odata.id input', HTTP.BAD_REQUEST
         # TODO: Add more checking of JSON input
-        # Update patch_key items in the fish object
+        # Update patch_key items in the fish object; collection
+        # Members must be up to date before they can be patched
+        fishem_members.sync(inst_key)
         for patch_key, patch_value in json_input.items():
             fish[inst_key][patch_key] = patch_value
+        if 'Members' in json_input:
+            fishem_members.forget(inst_key)
+        fish.touch(inst_key)
         # Return a copy of the updated fish object
-        return fish[inst_key], HTTP.OK
+        return fish[inst_key], HTTP.OK, \
+            {'ETag': fishem_etag.etag(inst_key)}
         # End of patch()
 
     def post(
@@ -182,7 +201,6 @@ class FishDoctor(Resource):
         """Defines DELETE behavior. Called by flask_restful."""
         # When not empty, arguments hold values from the URI
         # TODO: Add FishDoctor enabled check
-        # TODO: Add ETag support
         # TODO: Check for (and handle?) @Redfish.OperationApplyTime
         #
         # Handle DELETE request
@@ -195,6 +213,10 @@ class FishDoctor(Resource):
         # Ensure object is in the fish object dictionary
         if inst_key not in fish:
             return 'Object not found', HTTP.NOT_FOUND
+        # Handle If-Match; the client's ETag must be the current one
+        resp = fishem_etag.precondition_failed(inst_key)
+        if resp is not None:
+            return resp
         # Find the coll_key (assumes object is a collection member)
         inst_key_parts = inst_key.split('/')
         coll_member_id = inst_key_parts[len(inst_key_parts) - 1]
@@ -204,23 +226,17 @@ class FishDoctor(Resource):
         if coll_key not in fish:
             return 'Collection not found', HTTP.NOT_FOUND
         # Ensure object is in the Collection's Members
-        if {'@odata.id': inst_key} not in fish[coll_key]['Members']:
+        if not fishem_members.has_member(coll_key, inst_key):
             return 'Object not in Collection', HTTP.NOT_FOUND
         # Get a copy of the object
         deleted_object = fish[inst_key]
         # Delete the object and its subordinate resources
-        del_keys = []
-        for fish_key in fish:
-            if fish_key.startswith(inst_key):
-                del_keys.append(fish_key)
-        for del_key in del_keys:
-                del fish[del_key]
-        # Remove link from Collection Members
-        fish[coll_key]['Members'].remove(
-            {'@odata.id': inst_key})
-        # Re-evaluate collection Members count
-        fish[coll_key]['Members@odata.count'] = \
-            len(fish[coll_key]['Members'])
+        del_keys = fishem_subtree.delete_subtree(inst_key)
+        # Remove link from Collection Members, and re-evaluate
+        # collection Members count
+        fishem_members.remove_member(coll_key, inst_key)
+        # Remove other links to the deleted objects, if enabled
+        fishem_links.strip_dangling(del_keys)
         # Return a copy of the deleted object
         return deleted_object, HTTP.OK
         # End of delete()
@@ -261,7 +277,7 @@ class FishDoctorActions(Resource):
         #
         # Handle POST request
         root_key = '/redfish/v1'
-        inst_key = root_key + '/' + UriPath
+        inst_key = root_key + '/' + UriPath if UriPath else root_key
         action_name = UriAction
         # Action names do not have trailing slashes
         if action_name.endswith('/'):
@@ -283,6 +299,50 @@ class FishDoctorActions(Resource):
             del fish[inst_key]
             # Return a copy of the deleted object
             return deleted_object, HTTP.OK
+        elif action_name == 'FishDoctor.Links':
+            # Reports the fish objects that link to the object, and
+            # the fish objects that the object links to
+            referrers = fishem_links.referrers(inst_key)
+            references = fishem_links.references(inst_key)
+            return {
+                '@odata.id': inst_key,
+                'ReferencedBy': [{'@odata.id': key} for key in referrers],
+                'ReferencedBy@odata.count': len(referrers),
+                'References': [{'@odata.id': key} for key in references],
+                'References@odata.count': len(references)
+                }, HTTP.OK
+        elif action_name == 'FishDoctor.Snapshot':
+            # Starts saving a background snapshot of the whole fish
+            # to the configured snapshot file, or to the requested
+            # file in the same directory, and reports the snapshot
+            # status
+            json_input = request.get_json(force = True, silent = True)
+            file_name = fishem_config.get('snapshotFile')
+            if not file_name:
+                return 'No snapshot file', HTTP.BAD_REQUEST
+            if isinstance(json_input, dict) and \
+                    json_input.get('FileName'):
+                request_name = json_input['FileName']
+                if not isinstance(request_name, str) or \
+                        os.path.basename(request_name) != request_name \
+                        or request_name in ('.', '..'):
+                    return 'Bad FileName', HTTP.BAD_REQUEST
+                file_name = os.path.join(os.path.dirname(file_name),
+                                         request_name)
+            if fishem_snapshot.save(file_name) is None:
+                return fishem_snapshot.status(), HTTP.CONFLICT
+            return fishem_snapshot.status(), HTTP.ACCEPTED
+        elif action_name == 'FishDoctor.Patch':
+            # Applies a fish patch (see fishem_fishpatch.py) to the
+            # whole fish; nothing is changed if any of it fails
+            json_input = request.get_json(force = True, silent = True)
+            if json_input == None:
+                return 'Bad JSON input', HTTP.BAD_REQUEST
+            try:
+                changed, removed = fishem_fishpatch.apply(json_input)
+            except fishem_fishpatch.PatchError as error:
+                return str(error), HTTP.BAD_REQUEST
+            return {'Changed': changed, 'Removed': removed}, HTTP.OK
         else:
             # Did not find a defined Action or OEM Action
             return 'Unknown Action', HTTP.BAD_REQUEST
@@ -309,7 +369,9 @@ def activate(rest_api):
     rest_api.add_resource(
         FishDoctorActions,
         '/fishdoctor/<path:UriPath>/Actions/<string:UriAction>',
-        '/fishdoctor/<path:UriPath>/Actions/<string:UriAction>/'
+        '/fishdoctor/<path:UriPath>/Actions/<string:UriAction>/',
+        '/fishdoctor/Actions/<string:UriAction>',
+        '/fishdoctor/Actions/<string:UriAction>/'
         )
 
     return
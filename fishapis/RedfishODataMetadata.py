@@ -16,11 +16,12 @@ Based upone Singleton template version 0.9.0
 from flask_restful import Resource      # REST operations
 from flask import request               # JSON input from REST
 from flask import make_response         # XML response handling
-import xmltodict                        # XML response handling
 
 # Local module imports
 from fish_data import fish              # Fish data
 import fishem_httpcodes as HTTP         # HTTP status codes
+import fishem_metadata                  # $metadata XML handling
+import fishem_etag                      # ETag support
 
 # Constants
 # None
@@ -31,7 +32,9 @@ import fishem_httpcodes as HTTP         # HTTP status codes
 # None
 
 # The Redfish $metadata document is stored in the fish object
-# dictionary, using xmltodict to encode and decode the XML.
+# dictionary, using xmltodict to encode and decode the XML; the
+# XML itself is kept by fishem_metadata, so it is not converted
+# again for each request.
 # The key '/redfish/v1/$metadata' should only be defined when a
 # valid $metadata document is present. It can be defined here
 # (see below) or by loading fishem from a mockup or a fish file.
@@ -88,12 +91,23 @@ class RedfishODataMetadata(Resource):
         if not good_accept_header:
             return 'XML not allowed by Accept Headers', \
                     HTTP.NOT_ACCEPTABLE
+        # Return 304 (Not Modified) if the client has the current
+        # document; the compressed document has its own ETag
+        gzip_ok = request.accept_encodings['gzip'] > 0
+        etag = fishem_etag.etag(inst_key, 'gzip' if gzip_ok else '')
+        resp = fishem_etag.not_modified(inst_key, etag)
+        if resp is not None:
+            return resp
+        # Return the XML document, compressed if the client allows it
+        if gzip_ok:
+            resp = make_response(fishem_metadata.gzip_bytes(), HTTP.OK)
+            resp.headers['Content-Encoding'] = 'gzip'
+        else:
+            resp = make_response(fishem_metadata.xml_bytes(), HTTP.OK)
         # Return object with Content-Type set to 'application/xml'
-        resp = make_response(xmltodict.unparse(fish[inst_key], \
-            pretty=True), HTTP.OK)
-        resp.headers.remove('Content-Type')     # Remove default
-        resp.headers.remove('Content-Length')   # Remove default
-        resp.headers.extend({'Content-Type': 'application/xml'})
+        resp.headers['Content-Type'] = 'application/xml'
+        resp.headers['ETag'] = etag
+        resp.headers['Vary'] = 'Accept-Encoding'
         return resp
         # End of get()
 
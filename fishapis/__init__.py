@@ -3,6 +3,35 @@
 """
 __init__ for fishapis directory.
 
-NOTE: Nearly all of the API code modules in the fishapis directory
-are generated using information from Redfish/Swordfish CSDL schema.
+NOTE: The REST API behaviors for the Redfish/Swordfish resource
+types are described by the resource table in 'resources.json',
+which is generated using information from Redfish/Swordfish CSDL
+schema, and are implemented by the generic classes in
+fishem_generic.py.
+
+The API modules in this directory are either special-purpose API
+modules with their own activate() function (such as FishDoctor.py),
+or overrides for individual handlers of a resource type from the
+resource table. An override module has the same name as the resource
+type, and defines a class with the resource type name (and/or the
+Actions class name) that has only the handler methods to override.
+For example, a file named 'Drive.py' with these contents changes
+the GET behavior for Drive instances, and the behavior of one Drive
+Action, while all other behaviors still come from the generic
+classes and the resource table:
+
+    from flask import request
+    from fishem_generic import Singleton, SingletonActions
+    import fishem_httpcodes as HTTP
+
+    class Drive(Singleton):
+        def get(self, **uri_args):
+            print('GET for Drive', uri_args.get('DriveId'))
+            return Singleton.get(self, **uri_args)
+
+    class DriveActions(SingletonActions):
+        def post(self, **uri_args):
+            if request.path.endswith('/Drive.SecureErase'):
+                return 'Drive erased', HTTP.OK
+            return SingletonActions.post(self, **uri_args)
 """
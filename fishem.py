@@ -12,10 +12,10 @@ Run this command to see the available command line parameters:
 
 # Standard library module imports
 import json                     # JSON handling
-import os                       # CLI and file I/O handling
 import signal                   # Control-C handling
 import sys                      # Control-C handling
 import importlib                # API module imports
+import time                     # Startup time reporting
 
 # Third party module imports
 # None
@@ -24,8 +24,17 @@ import importlib                # API module imports
 import fishem_version           # fishem version
 import fishem_configure         # Set up configuration parameters
 import fishem_fishfileio        # Fish file input and output
+import fishem_lazyfish          # Lazily loaded fish file input
 import fishem_mockupio          # Mockup input and output
+import fishem_mockupcache       # Parsed mockup cache
+import fishem_mockupwatch       # Input mockup watch mode
 import fishem_restops           # Set up and start REST operations
+import fishem_lazyapis          # Lazy API module activation
+import fishem_generic           # Generic resource engine
+import fishem_respcache         # Serialized response cache
+import fishem_journal           # Fish change journal
+import fishem_snapshot          # Background fish snapshots
+import fishem_sqlfish           # SQLite fish store
 import fish_data                # Data shared with all API modules
 # Note: API modules are programmatically imported in main()
 
@@ -40,6 +49,18 @@ def signal_handler(sig, frame):
     """
     print('\nfishem stopped with Control-C --------------------------')
 
+    # Report response cache statistics
+    fishem_respcache.report()
+
+    # Stop watching the input mockup
+    fishem_mockupwatch.stop()
+
+    # Finish any snapshot being saved
+    fishem_snapshot.stop()
+
+    # Write any pending journal records
+    fishem_journal.stop()
+
     # Save the current fish in the file 'lastfish.json'
     fishem_fishfileio.output('lastfish.json')
 
@@ -51,6 +72,9 @@ def signal_handler(sig, frame):
     if fishemconfig['omockup']:
         fishem_mockupio.output(fishemconfig['omockup'])
 
+    # Close the SQLite fish store, if it is used
+    fishem_sqlfish.stop()
+
     # End program
     print('fishem ended normally ----------------------------------')
     sys.exit(0)
@@ -74,10 +98,14 @@ def main():
     # it's global to allow access by the signal_handler() above
     global fishemconfig
 
+    # Startup time is reported when REST operations start
+    start_time = time.perf_counter()
+
     # Get fishem configuration parameters, name, and version
     fishemconfig = fishem_configure.getconfig()
     fishemconfig['name'] = __name__
     fishemconfig['version'] = fishem_version.__version__
+    fishemconfig['startTime'] = start_time
 
     # Share fishem configuration parameters with API modules
     fish_data.fishem_config = fishemconfig
@@ -85,21 +113,44 @@ def main():
     # Start fishem initialization
     print('fishem initialization ----------------------------------')
 
-    # Import API modules so they can set up initial data objects
-    for dirpath, dirnames, filenames in os.walk('fishapis'):
-        if dirpath == 'fishapis':
-            for fn in filenames:
-                if fn == '__init__.py': continue
-                api_module = 'fishapis.' + fn.replace('.py', '')
-                importlib.import_module(api_module)
-
-    # Load an input fish, if requested
-    if fishemconfig['ifish']:
-        fishem_fishfileio.input(fishemconfig['ifish'])
-
-    # Load an input mockup, if requested
-    if fishemconfig['imockup']:
-        fishem_mockupio.input(fishemconfig['imockup'])
+    # Import API modules so they can set up initial data objects;
+    # with lazy API module activation, only the API modules that
+    # set up initial data objects are imported here
+    if fishemconfig['lazyApis']:
+        fishem_lazyapis.import_eager_modules()
+    else:
+        for mod_name in fishem_generic.api_module_names():
+            api_module = 'fishapis.' + mod_name
+            importlib.import_module(api_module)
+
+    # Switch to the SQLite fish store, if requested, and recover the
+    # fish from the store or the journal, if there is one
+    if fishem_sqlfish.start(fishemconfig):
+        print('Input fish file and input mockup not loaded')
+    elif fishem_journal.recover(fishemconfig):
+        print('Input fish file and input mockup not loaded')
+    else:
+        # Load an input fish, if requested
+        if fishemconfig['ifish'] and fishemconfig['lazyFish']:
+            fishem_lazyfish.input(fishemconfig['ifish'])
+        elif fishemconfig['ifish']:
+            fishem_fishfileio.input(fishemconfig['ifish'])
+
+        # Load an input mockup, if requested
+        if fishemconfig['imockup']:
+            fishem_mockupcache.input(fishemconfig['imockup'])
+
+    # Commit the loaded fish to the SQLite fish store, if it is used
+    fishem_sqlfish.finish_load()
+
+    # Start journaling fish changes, if requested
+    fishem_journal.start(fishemconfig)
+
+    # Start saving background snapshots, if requested
+    fishem_snapshot.start(fishemconfig)
+
+    # Start watching the input mockup for changes, if requested
+    fishem_mockupwatch.start(fishemconfig)
 
     # Start normal REST operations
     print('fishem starting ----------------------------------------')
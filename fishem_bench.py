@@ -0,0 +1,934 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Microbenchmarks for fishem.
+
+Run this command to see the available benchmarks:
+    python fishem_bench.py --help
+
+Benchmarks:
+    uri     URI match latency, Werkzeug URL map vs. trie dispatcher
+    startup Startup time and resident memory, with and without
+            lazy API module activation
+    cache   GET latency with and without the response cache, and
+            for conditional GETs (ETag / If-None-Match)
+    mockup  Mockup load time with different numbers of loader
+            threads, checking that each load gives the same fish
+    archive Mockup archive save and load time, against unpacking the
+            archive and loading the mockup directory
+    mockupcache Mockup load time without the parsed mockup cache, and
+            with it, for an unchanged mockup and a partly changed one
+    journal PATCH latency and throughput with and without the
+            journal, and journal recovery time
+    snapshot Server time held up by saving the fish directly, and
+            by a background snapshot
+    fishfile Fish file save and load time and peak memory, for each
+            fish file format
+    lazyfish Startup time, memory, and first read latency for a JSON
+            Lines fish file, loaded normally and lazily
+    sqlstore Load time, PATCH latency, $filter time, and restart time
+            and memory, for the dict and SQLite fish stores
+"""
+
+# Standard library module imports
+import argparse                 # CLI handling
+import contextlib               # Output redirection
+import io                       # Output redirection
+import os                       # File I/O handling
+import json                     # JSON handling
+import re                       # URI pattern handling
+import shutil                   # Benchmark file cleanup
+import subprocess               # Startup measurements
+import sys                      # Startup measurements
+import tarfile                  # Mockup archive unpacking
+import tempfile                 # Benchmark files
+import threading                # Concurrent clients
+import time                     # Timing
+
+# Third party module imports
+from flask import Flask, make_response  # REST operations
+from flask_restful import Api   # REST operations
+
+# Local module imports
+import fish_data                # Data shared with all API modules
+import fishem_generic           # Generic resource engine
+import fishem_respcache         # Serialized response cache
+import fishem_etag              # ETag support
+import fishem_uritrie           # Trie-based URI dispatcher
+import fishem_mockupio          # Mockup input
+import fishem_fishfileio        # Fish file input and output
+import fishem_journal           # Fish change journal
+import fishem_snapshot          # Background fish snapshots
+import fishem_lazyfish          # Lazily loaded fish file input
+import fishem_mockupcache       # Parsed mockup cache
+import fishem_filter            # $filter expressions
+import fishem_query             # Query parameter support
+import fishem_sqlfish           # SQLite fish store
+
+# Constants
+URI_VAR_RE = re.compile(r'<(?:[a-z]+:)?(\w+)>')
+
+# Runs fishem.main() in a child process, stopping it where it would
+# start REST operations. Reports the time from process start, the
+# resident memory, and the latency of one first request.
+STARTUP_PROBE = '''
+import json, os, sys, time
+start = time.perf_counter()
+import flask
+import fishem_restops
+def probe_run(flask_app, **kwargs):
+    ready = time.perf_counter()
+    rss = fishem_restops.resident_memory()
+    client = flask_app.test_client()
+    request_start = time.perf_counter()
+    client.get('/redfish/v1/Systems/1/Storage/1/Drives/1')
+    first_request = time.perf_counter() - request_start
+    sys.stdout.flush()
+    print('PROBE ' + json.dumps({'startup': ready - start, 'rss': rss,
+                                 'first_request': first_request}))
+    sys.stdout.flush()
+    os._exit(0)
+flask.Flask.run = probe_run
+import fishem
+sys.argv = ['fishem.py'] + sys.argv[1:]
+fishem.main()
+'''
+
+# Child process function that returns the peak resident memory
+PEAK_RSS_PROBE = '''
+import sys
+try:
+    import resource
+except ImportError:
+    resource = None
+def peak_rss():
+    try:
+        # Linux; unlike ru_maxrss, not carried over from the parent
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+'''
+
+# Loads a fish file in a child process. Reports the load time, and
+# the peak resident memory before and after the load.
+FISHFILE_PROBE = PEAK_RSS_PROBE + '''
+import json, sys, time
+import fish_data, fishem_fishfileio
+base = peak_rss()
+start = time.perf_counter()
+fishem_fishfileio.input(sys.argv[1])
+load = time.perf_counter() - start
+print('PROBE ' + json.dumps({'load': load, 'base': base,
+                             'peak': peak_rss(),
+                             'objects': len(fish_data.fish)}))
+'''
+
+# Loads a JSON Lines fish file in a child process, normally or lazily,
+# with the fish indexes that fishem uses. Reports the load time, the
+# peak resident memory, and the time for the first read of an object
+# and of its subtree keys.
+LAZYFISH_PROBE = PEAK_RSS_PROBE + '''
+import json, sys, time
+import fish_data, fishem_fishfileio, fishem_lazyfish
+import fishem_subtree, fishem_links, fishem_members, fishem_propindex
+fish_file, mode, key = sys.argv[1:4]
+base = peak_rss()
+start = time.perf_counter()
+if mode == 'lazy':
+    fishem_lazyfish.input(fish_file)
+else:
+    fishem_fishfileio.input(fish_file)
+load = time.perf_counter() - start
+start = time.perf_counter()
+read = fish_data.fish[key]['Id']
+subtree = fishem_subtree.subtree_keys(key)
+first_read = time.perf_counter() - start
+print('PROBE ' + json.dumps({'load': load, 'base': base,
+                             'peak': peak_rss(), 'first_read': first_read,
+                             'objects': len(fish_data.fish)}))
+'''
+
+# Restores the fish from a SQLite fish store in a child process, then
+# reads every object once. Reports the restore time, the time to read
+# every object, and the peak resident memory.
+SQLSTORE_PROBE = PEAK_RSS_PROBE + '''
+import json, sys, time
+import fish_data, fishem_sqlfish
+base = peak_rss()
+start = time.perf_counter()
+fishem_sqlfish.start({'fishStore': 'sqlite', 'fishStoreFile': sys.argv[1],
+                      'fishStoreCacheObjects': int(sys.argv[2])})
+load = time.perf_counter() - start
+start = time.perf_counter()
+for key in list(fish_data.fish):
+    fish_data.fish[key]['@odata.id']
+read_all = time.perf_counter() - start
+print('PROBE ' + json.dumps({'load': load, 'base': base,
+                             'peak': peak_rss(), 'read_all': read_all,
+                             'objects': len(fish_data.fish)}))
+'''
+
+
+# Function: activate_all()
+
+def activate_all(uri_registry):
+    """Activates all APIs so they register their URIs with
+    'uri_registry'. Returns the number of APIs."""
+    api_count = 0
+    for api_name in fishem_generic.api_names():
+        fishem_generic.activate_api(api_name, uri_registry)
+        api_count += 1
+    return api_count
+
+    # End of activate_all()
+
+
+# Function: time_calls()
+
+def time_calls(func, args_list, repeat):
+    """Calls func(args) for every args in 'args_list', 'repeat'
+    times over. Returns the best average time per call in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for args in args_list:
+            func(args)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best / len(args_list)
+
+    # End of time_calls()
+
+
+# Function: bench_uri()
+
+def bench_uri(args):
+    """Compares URI match latency of the Werkzeug URL map that
+    flask_restful builds against the trie dispatcher."""
+
+    # FishDoctor only registers its URIs when it is enabled
+    fish_data.fishem_config = {'fishdoctorEnabled': True,
+                               'uriDispatcher': 'werkzeug'}
+
+    # Werkzeug URL map, exactly as fishem_restops.startup() builds it
+    wz_app = Flask('fishem_bench_werkzeug')
+    wz_api = Api(wz_app)
+    api_count = activate_all(wz_api)
+    wz_adapter = wz_app.url_map.bind('localhost')
+
+    # Trie dispatcher with the same API modules
+    trie_app = Flask('fishem_bench_trie')
+    trie_registry = fishem_uritrie.TrieDispatcher(Api(trie_app))
+    trie_registry.install(trie_app)
+    activate_all(trie_registry)
+    trie = trie_registry.trie
+
+    # Build request paths (and a method each rule accepts) from
+    # the registered URI patterns
+    paths = []
+    for rule in wz_app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        path = URI_VAR_RE.sub(lambda m: m.group(1) + '1', rule.rule)
+        method = 'GET' if 'GET' in rule.methods else 'POST'
+        paths.append((path, method))
+    paths.sort()
+    misses = [(path + '/NoSuchThing', method)
+              for path, method in paths[::10]]
+
+    print('APIs:              ', api_count)
+    print('Werkzeug rules:    ', len(paths))
+    print('Trie patterns:     ', trie.pattern_count)
+    print('Request paths:     ', len(paths), 'hits,', len(misses), 'misses')
+
+    # Both matchers should route every path to the same Resource;
+    # report any path where they disagree
+    for path, method in paths:
+        endpoint, _ = wz_adapter.match(path, method=method)
+        target, _ = trie.match(path)
+        trie_endpoint = target[0].endpoint if target else None
+        if trie_endpoint != endpoint:
+            print('Routed differently:', path)
+            print('    werkzeug:', endpoint, '  trie:', trie_endpoint)
+
+    def wz_match(path_method):
+        try:
+            wz_adapter.match(path_method[0], method=path_method[1])
+        except Exception:
+            pass
+
+    def trie_match(path_method):
+        trie.match(path_method[0])
+
+    for label, path_list in (('hit', paths), ('miss', misses)):
+        wz_time = time_calls(wz_match, path_list, args.repeat)
+        trie_time = time_calls(trie_match, path_list, args.repeat)
+        print('%-4s  werkzeug %8.2f us   trie %6.2f us   speedup %6.1fx'
+              % (label, wz_time * 1e6, trie_time * 1e6, wz_time / trie_time))
+    return
+
+    # End of bench_uri()
+
+
+# Function: bench_startup()
+
+def bench_startup(args):
+    """Measures fishem startup time, resident memory, and first
+    request latency, with and without lazy API module activation."""
+
+    modes = (('eager, werkzeug', ['--uriDispatcher', 'werkzeug']),
+             ('eager, trie', ['--uriDispatcher', 'trie']),
+             ('lazy', ['--lazyApis']))
+    for label, mode_args in modes:
+        runs = []
+        for _ in range(args.repeat):
+            proc = subprocess.run(
+                [sys.executable, '-c', STARTUP_PROBE] + mode_args,
+                stdout=subprocess.PIPE, universal_newlines=True)
+            for line in proc.stdout.splitlines():
+                if line.startswith('PROBE '):
+                    runs.append(json.loads(line[len('PROBE '):]))
+        if not runs:
+            print('%-16s  failed to start' % label)
+            continue
+        best = min(runs, key=lambda run: run['startup'])
+        rss = '%7.1f MB' % (best['rss'] / (1024 * 1024)) \
+            if best['rss'] else '      n/a'
+        print('%-16s  startup %7.3f s   rss %s   first request %7.2f ms'
+              % (label, best['startup'], rss,
+                 best['first_request'] * 1000))
+    return
+
+    # End of bench_startup()
+
+
+# Function: sensor_fish()
+
+def sensor_fish(count):
+    """Adds 'count' Sensor objects to the fish. Returns their keys."""
+    fish = fish_data.fish
+    coll_key = '/redfish/v1/Chassis/1/Sensors'
+    keys = []
+    for index in range(count):
+        key = coll_key + '/Sensor' + str(index)
+        fish[key] = {'@odata.id': key, '@odata.type': '#Sensor.v1_5_0.Sensor',
+                     'Id': 'Sensor' + str(index), 'Name': 'Sensor',
+                     'Reading': 20.5 + index, 'ReadingUnits': 'Cel',
+                     'Status': {'State': 'Enabled', 'Health': 'OK'},
+                     'Thresholds': {name: {'Reading': 80.0 + index}
+                                    for name in ('UpperCaution',
+                                                 'UpperCritical',
+                                                 'UpperFatal')}}
+        keys.append(key)
+    return keys
+
+    # End of sensor_fish()
+
+
+# Function: sensor_app()
+
+def sensor_app(name):
+    """Returns a Flask app that serves the Sensor API through the full
+    Flask request path."""
+    app = Flask(name)
+    rest_api = Api(app)
+
+    @rest_api.representation('application/json')
+    def output_json(data, code, headers=None):
+        resp = make_response(json.dumps(data, indent=4), code)
+        resp.headers.extend(headers or {})
+        return resp
+
+    fishem_generic.activate_api('Sensor', rest_api)
+    fishem_etag.setup()
+    app.teardown_request(fishem_sqlfish.teardown_request)
+    return app
+
+    # End of sensor_app()
+
+
+# Function: bench_cache()
+
+def bench_cache(args):
+    """Measures GET latency for a set of Sensor objects through the
+    full Flask request path, with and without the response cache,
+    and for conditional GETs answered with 304 (Not Modified)."""
+
+    fish = fish_data.fish
+    fish_data.fishem_config = {'fishdoctorEnabled': False}
+    keys = sensor_fish(args.sensors)
+    client = sensor_app('fishem_bench_cache').test_client()
+
+    def get(key):
+        client.get(key)
+
+    for label, cache_mb in (('no cache', 0), ('cache', 64)):
+        if fishem_respcache.cache is not None:
+            fish.listeners.remove(fishem_respcache.cache.invalidate)
+            fishem_respcache.cache = None
+        fishem_respcache.setup({'responseCacheMB': cache_mb})
+        get_time = time_calls(get, keys, args.repeat)
+        print('%-8s  GET %8.1f us' % (label, get_time * 1e6))
+
+    # Conditional GETs of unchanged objects
+    etags = {key: client.get(key).headers['ETag'] for key in keys}
+
+    def conditional_get(key):
+        client.get(key, headers={'If-None-Match': etags[key]})
+
+    get_time = time_calls(conditional_get, keys, args.repeat)
+    print('%-8s  GET %8.1f us' % ('304', get_time * 1e6))
+    fishem_respcache.report()
+    return
+
+    # End of bench_cache()
+
+
+# Function: bench_mockup()
+
+def bench_mockup(args):
+    """Measures the time to load a mockup with each requested number
+    of loader threads (1 loads files one at a time), and checks that
+    each load gives exactly the same fish as the first one."""
+
+    fish = fish_data.fish
+    first_fish = None
+    for workers in args.workers:
+        fish_data.fishem_config = {'mockupLoadWorkers': workers}
+        times = []
+        for _ in range(args.repeat):
+            fish.clear()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                fishem_mockupio.input(args.mockup)
+            times.append(time.perf_counter() - start)
+        loaded_fish = json.dumps(list(fish.items()))
+        if first_fish is None:
+            first_fish = loaded_fish
+        best = min(times)
+        print('%3d threads  load %7.3f s  %8.0f files/s  same fish: %s'
+              % (workers, best, len(fish) / best,
+                 'yes' if loaded_fish == first_fish else 'NO'))
+    return
+
+    # End of bench_mockup()
+
+
+# Function: bench_archive()
+
+def bench_archive(args):
+    """Measures the time to save a mockup as an archive, and to load
+    it directly from the archive, against unpacking a tar.gz archive
+    and loading the mockup directory; checks that each load gives
+    exactly the same fish."""
+
+    fish = fish_data.fish
+    fish_data.fishem_config = {}
+    sensor_fish(args.sensors)
+    # The service root marks the top of the mockup in an archive
+    fish['/redfish/v1'] = {'@odata.id': '/redfish/v1',
+                           '@odata.type': '#ServiceRoot.v1_5_0.ServiceRoot',
+                           'Id': 'RootService', 'Name': 'Root Service'}
+    temp_dir = tempfile.mkdtemp()
+    archives = []
+    for file_name in ('mockup.tar.gz', 'mockup.zip'):
+        archive_path = os.path.join(temp_dir, file_name)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fishem_mockupio.output(archive_path)
+        archives.append((archive_path, time.perf_counter() - start))
+        print('%-14s %7.1f MB   save %6.2f s' %
+              (file_name, os.path.getsize(archive_path) / (1024 * 1024),
+               archives[-1][1]))
+    # Directory walk order may differ from archive order
+    saved_fish = json.dumps(fish, sort_keys=True)
+
+    def unpack_and_load():
+        mockup_dir = os.path.join(temp_dir, 'mockup')
+        with tarfile.open(archives[0][0]) as archive:
+            archive.extractall(mockup_dir)
+        fishem_mockupio.input(mockup_dir)
+        shutil.rmtree(mockup_dir)
+
+    for label, load in (
+            ('unpack tar.gz and load', unpack_and_load),
+            ('load tar.gz', lambda: fishem_mockupio.input(archives[0][0])),
+            ('load zip', lambda: fishem_mockupio.input(archives[1][0]))):
+        times = []
+        for _ in range(args.repeat):
+            fish.clear()
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                load()
+            times.append(time.perf_counter() - start)
+        print('%-24s %7.2f s   %8.0f files/s   same fish: %s'
+              % (label, min(times), len(fish) / min(times),
+                 'yes' if json.dumps(fish, sort_keys=True) == saved_fish
+                 else 'NO'))
+    shutil.rmtree(temp_dir)
+    return
+
+    # End of bench_archive()
+
+
+# Function: bench_mockupcache()
+
+def bench_mockupcache(args):
+    """Measures mockup load time without the parsed mockup cache, and
+    with it: when the cache is made, when the mockup is unchanged, and
+    when some of the mockup files changed. Checks that each load gives
+    the same fish as parsing the whole mockup."""
+
+    fish = fish_data.fish
+    fish_data.fishem_config = {}
+    keys = sensor_fish(args.sensors)
+    fish['/redfish/v1'] = {'@odata.id': '/redfish/v1',
+                           '@odata.type': '#ServiceRoot.v1_5_0.ServiceRoot',
+                           'Id': 'RootService', 'Name': 'Root Service'}
+    temp_dir = tempfile.mkdtemp()
+    mockup_dir = os.path.join(temp_dir, 'mockup')
+    with contextlib.redirect_stdout(io.StringIO()):
+        fishem_mockupio.output(mockup_dir)
+
+    def load(cache):
+        fish.clear()
+        fish_data.fishem_config = {'mockupCache': cache}
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fishem_mockupcache.input(mockup_dir)
+        return time.perf_counter() - start, json.dumps(fish, sort_keys=True)
+
+    def change_files():
+        for key in keys[::max(len(keys) // args.changed, 1)][:args.changed]:
+            file_path = os.path.join(
+                fishem_mockupio.mockup_dir_path(mockup_dir, key),
+                'index.json')
+            with open(file_path, 'r+') as mockup_file:
+                obj = json.load(mockup_file)
+                obj['Reading'] += 1
+                mockup_file.seek(0)
+                json.dump(obj, mockup_file, indent=4)
+        return
+
+    parse_time, parsed_fish = load('off')
+    print('%d files, %d changed for the partly changed mockup' %
+          (len(fish), args.changed))
+    print('%-28s %7.2f s' % ('no cache', parse_time))
+    for cache in ('stat', 'content'):
+        for label, prepare in (('make cache', None),
+                               ('unchanged', None),
+                               ('partly changed', change_files)):
+            if prepare is not None:
+                prepare()
+                parsed_fish = load('off')[1]
+            load_time, loaded_fish = load(cache)
+            print('%-28s %7.2f s   same fish: %s'
+                  % (cache + ', ' + label, load_time,
+                     'yes' if loaded_fish == parsed_fish else 'NO'))
+    shutil.rmtree(temp_dir)
+    return
+
+    # End of bench_mockupcache()
+
+
+# Function: bench_journal()
+
+def bench_journal(args):
+    """Measures PATCH latency and throughput for a set of Sensor
+    objects through the full Flask request path, with and without
+    the journal, then the time to recover the fish from the journal."""
+
+    fish = fish_data.fish
+    fish_data.fishem_config = {'fishdoctorEnabled': False}
+    keys = sensor_fish(args.sensors)
+    app = sensor_app('fishem_bench_journal')
+    app.after_request(fishem_journal.after_request)
+    client = app.test_client()
+    journal_file = os.path.join(tempfile.mkdtemp(), 'bench.journal')
+
+    def patch(key):
+        client.patch(key, json={'Reading': time.perf_counter()})
+
+    def patch_all(thread_keys):
+        thread_client = app.test_client()
+        for key in thread_keys:
+            thread_client.patch(key, json={'Reading': 1.0})
+
+    for label, sync_ms in (('no journal', None), ('sync 0 ms', 0),
+                           ('sync 10 ms', 10)):
+        if sync_ms is not None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fishem_journal.start({'journalFile': journal_file,
+                                      'journalSyncMs': sync_ms})
+        patch_time = time_calls(patch, keys, args.repeat)
+        # Several clients at once share journal flushes
+        threads = [threading.Thread(target=patch_all,
+                                    args=(keys[index::args.threads],))
+                   for index in range(args.threads)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        rate = len(keys) / (time.perf_counter() - start)
+        fishem_journal.stop()
+        print('%-10s  PATCH %8.1f us   %d clients %8.0f PATCH/s'
+              % (label, patch_time * 1e6, args.threads, rate))
+
+    # Recover the fish from the last journal
+    saved_fish = json.dumps(fish)
+    segments, snapshots = fishem_journal.journal_files(journal_file)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fishem_journal.recover({'journalFile': journal_file})
+    recover_time = time.perf_counter() - start
+    records = sum(fishem_journal.replay(
+        fishem_journal.segment_path(journal_file, number))[0]
+        for number in segments)
+    print('recovery    %d objects + %d journal records in %.3f s, '
+          'same fish: %s' % (len(fish), records, recover_time,
+                             'yes' if json.dumps(fish) == saved_fish
+                             else 'NO'))
+    return
+
+    # End of bench_journal()
+
+
+# Function: bench_snapshot()
+
+def bench_snapshot(args):
+    """Measures how long saving the fish holds up the server, for a
+    fish file written directly and for a background snapshot, and
+    checks that both files hold the same fish."""
+
+    fish_data.fishem_config = {}
+    sensor_fish(args.sensors)
+    temp_dir = tempfile.mkdtemp()
+    fish_file = os.path.join(temp_dir, 'direct.json')
+    snapshot_file = os.path.join(temp_dir, 'snapshot.json')
+
+    start = time.perf_counter()
+    fishem_fishfileio.write_fish(fish_file)
+    direct_time = time.perf_counter() - start
+    print('direct      blocked %8.1f ms   saved in %8.1f ms'
+          % (direct_time * 1e3, direct_time * 1e3))
+
+    start = time.perf_counter()
+    fishem_snapshot.save(snapshot_file)
+    blocked_time = time.perf_counter() - start
+    fishem_snapshot.wait()
+    saved_time = time.perf_counter() - start
+    print('background  blocked %8.1f ms   saved in %8.1f ms'
+          % (blocked_time * 1e3, saved_time * 1e3))
+    with open(fish_file) as direct_in, open(snapshot_file) as snapshot_in:
+        same = direct_in.read() == snapshot_in.read()
+    print('%d objects, same fish: %s' % (len(fish_data.fish),
+                                         'yes' if same else 'NO'))
+    return
+
+    # End of bench_snapshot()
+
+
+# Function: bench_fishfile()
+
+def bench_fishfile(args):
+    """Measures save time, load time, and peak resident memory for a
+    large fish in each fish file format."""
+
+    fish = fish_data.fish
+    fish_data.fishem_config = {}
+    sensor_fish(args.sensors)
+    temp_dir = tempfile.mkdtemp()
+    print('%d objects' % len(fish))
+    fish_files = []
+    for label, file_name in (('JSON', 'fish.json'),
+                             ('JSON Lines', 'fish.jsonl'),
+                             ('gzip', 'fish.fishz'),
+                             ('xz', 'fish.fishxz')):
+        fish_file = os.path.join(temp_dir, file_name)
+        start = time.perf_counter()
+        fishem_fishfileio.write_fish(fish_file)
+        fish_files.append((label, fish_file, time.perf_counter() - start))
+    fish.clear()
+
+    for label, fish_file, save_time in fish_files:
+        proc = subprocess.run(
+            [sys.executable, '-c', FISHFILE_PROBE, fish_file],
+            stdout=subprocess.PIPE, universal_newlines=True)
+        runs = [json.loads(line[len('PROBE '):])
+                for line in proc.stdout.splitlines()
+                if line.startswith('PROBE ')]
+        size = os.path.getsize(fish_file) / (1024 * 1024)
+        os.remove(fish_file)
+        if not runs or runs[0]['objects'] != args.sensors:
+            print('%-10s  failed to load' % label)
+            continue
+        run = runs[0]
+        peak = '%7.1f MB (+%7.1f MB)' % (
+            run['peak'] / (1024 * 1024),
+            (run['peak'] - run['base']) / (1024 * 1024)) \
+            if run['peak'] else 'n/a'
+        print('%-10s  %7.1f MB   save %6.2f s   load %6.2f s   peak rss %s'
+              % (label, size, save_time, run['load'], peak))
+    return
+
+    # End of bench_fishfile()
+
+
+# Function: bench_lazyfish()
+
+def bench_lazyfish(args):
+    """Measures startup time, peak resident memory, and first read
+    latency for a large JSON Lines fish file, loaded normally and
+    lazily (the first lazy load also makes the key index)."""
+
+    fish = fish_data.fish
+    fish_data.fishem_config = {}
+    keys = sensor_fish(args.sensors)
+    key = keys[len(keys) // 2]
+    temp_dir = tempfile.mkdtemp()
+    fish_file = os.path.join(temp_dir, 'fish.jsonl')
+    fishem_fishfileio.write_fish(fish_file)
+    fish.clear()
+    print('%d objects, %.1f MB' % (args.sensors,
+                                   os.path.getsize(fish_file) / (1024 * 1024)))
+
+    for label, mode in (('normal', 'eager'),
+                        ('lazy, new index', 'lazy'),
+                        ('lazy', 'lazy')):
+        proc = subprocess.run(
+            [sys.executable, '-c', LAZYFISH_PROBE, fish_file, mode, key],
+            stdout=subprocess.PIPE, universal_newlines=True)
+        runs = [json.loads(line[len('PROBE '):])
+                for line in proc.stdout.splitlines()
+                if line.startswith('PROBE ')]
+        if not runs or runs[0]['objects'] != args.sensors:
+            print('%-16s  failed to load' % label)
+            continue
+        run = runs[0]
+        peak = '%7.1f MB (+%7.1f MB)' % (
+            run['peak'] / (1024 * 1024),
+            (run['peak'] - run['base']) / (1024 * 1024)) \
+            if run['peak'] else 'n/a'
+        print('%-16s  load %6.2f s   first read %8.3f ms   peak rss %s'
+              % (label, run['load'], run['first_read'] * 1000, peak))
+    for file_name in (fish_file, fish_file + fishem_lazyfish.INDEX_SUFFIX):
+        if os.path.exists(file_name):
+            os.remove(file_name)
+    return
+
+    # End of bench_lazyfish()
+
+
+# Function: bench_sqlstore()
+
+def bench_sqlstore(args):
+    """Measures load time, PATCH latency, and $filter time for a
+    collection of Sensor objects in the dict fish store and in the
+    SQLite fish store, with the $filter run in Python and in SQL, and
+    the time and peak resident memory to start again from a JSON fish
+    file and from the SQLite fish store."""
+
+    fish = fish_data.fish
+    fish_data.fishem_config = {'fishdoctorEnabled': False}
+    temp_dir = tempfile.mkdtemp()
+    fish_file = os.path.join(temp_dir, 'fish.json')
+    store_file = os.path.join(temp_dir, 'fish.db')
+    coll_key = '/redfish/v1/Chassis/1/Sensors'
+    filter_text = "Status/Health eq 'Warning' and Reading gt 100"
+    compiled = fishem_filter.get_filter(filter_text)
+
+    def load():
+        keys = sensor_fish(args.sensors)
+        for key in keys[::100]:
+            fish[key]['Status']['Health'] = 'Warning'
+            fish.touch(key)
+        fish[coll_key] = {'@odata.id': coll_key,
+                          'Members': [{'@odata.id': key} for key in keys],
+                          'Members@odata.count': len(keys)}
+        return keys
+
+    def python_filter():
+        return [member for member in fish[coll_key]['Members']
+                if compiled.predicate(fish[member['@odata.id']])]
+
+    def sql_filter():
+        return fishem_query.filter_members(
+            coll_key, fish[coll_key], filter_text)['Members']
+
+    for label in ('dict', 'sqlite'):
+        if label == 'sqlite':
+            fish.clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                fishem_sqlfish.start({'fishStore': 'sqlite',
+                                      'fishStoreFile': store_file,
+                                      'fishStoreCacheObjects':
+                                      args.cache_objects})
+        start = time.perf_counter()
+        keys = load()
+        fishem_sqlfish.finish_load()
+        load_time = time.perf_counter() - start
+        client = sensor_app('fishem_bench_sqlstore_' + label).test_client()
+
+        def patch(key):
+            client.patch(key, json={'Reading': time.perf_counter()})
+
+        patch_time = time_calls(patch, keys[:args.patches], args.repeat)
+        start = time.perf_counter()
+        matched = python_filter()
+        python_time = time.perf_counter() - start
+        print('%-7s  load %6.2f s   PATCH %8.1f us   $filter in Python '
+              '%8.1f ms (%d matched)'
+              % (label, load_time, patch_time * 1e6, python_time * 1e3,
+                 len(matched)))
+        if label == 'dict':
+            fishem_fishfileio.write_fish(fish_file)
+            continue
+        start = time.perf_counter()
+        sql_matched = sql_filter()
+        sql_time = time.perf_counter() - start
+        print('%-7s  $filter in SQL %8.1f ms (%d matched), same members: %s'
+              % (label, sql_time * 1e3, len(sql_matched),
+                 'yes' if sql_matched == matched else 'NO'))
+    fishem_sqlfish.stop()
+
+    # Start again from each store in a child process
+    for label, probe, probe_args in (
+            ('dict', FISHFILE_PROBE, [fish_file]),
+            ('sqlite', SQLSTORE_PROBE, [store_file,
+                                        str(args.cache_objects)])):
+        proc = subprocess.run([sys.executable, '-c', probe] + probe_args,
+                              stdout=subprocess.PIPE,
+                              universal_newlines=True)
+        runs = [json.loads(line[len('PROBE '):])
+                for line in proc.stdout.splitlines()
+                if line.startswith('PROBE ')]
+        if not runs or runs[0]['objects'] != len(keys) + 1:
+            print('%-7s  failed to start again' % label)
+            continue
+        run = runs[0]
+        peak = '%7.1f MB (+%7.1f MB)' % (
+            run['peak'] / (1024 * 1024),
+            (run['peak'] - run['base']) / (1024 * 1024)) \
+            if run['peak'] else 'n/a'
+        read_all = '   read all %6.2f s' % run['read_all'] \
+            if 'read_all' in run else ''
+        print('%-7s  restart %6.2f s%s   peak rss %s'
+              % (label, run['load'], read_all, peak))
+    shutil.rmtree(temp_dir)
+    return
+
+    # End of bench_sqlstore()
+
+
+# main()
+
+def main():
+    """main()
+
+    Runs the requested benchmark.
+    """
+    parser = argparse.ArgumentParser(
+        description = 'Fish Emulator microbenchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    uri_parser = subparsers.add_parser('uri',
+        help='URI match latency, Werkzeug URL map vs. trie dispatcher')
+    uri_parser.add_argument('--repeat', type=int, default=3,
+        help='Number of timing runs (best run is reported)')
+    uri_parser.set_defaults(func=bench_uri)
+    startup_parser = subparsers.add_parser('startup',
+        help='Startup time and resident memory, with and without '
+             'lazy API module activation')
+    startup_parser.add_argument('--repeat', type=int, default=3,
+        help='Number of fishem starts per mode (best run is reported)')
+    startup_parser.set_defaults(func=bench_startup)
+    cache_parser = subparsers.add_parser('cache',
+        help='GET latency with and without the response cache')
+    cache_parser.add_argument('--sensors', type=int, default=2000,
+        help='Number of Sensor objects to GET')
+    cache_parser.add_argument('--repeat', type=int, default=3,
+        help='Number of timing runs (best run is reported)')
+    cache_parser.set_defaults(func=bench_cache)
+    journal_parser = subparsers.add_parser('journal',
+        help='PATCH latency with and without the journal, and '
+             'journal recovery time')
+    journal_parser.add_argument('--sensors', type=int, default=2000,
+        help='Number of Sensor objects to PATCH')
+    journal_parser.add_argument('--threads', type=int, default=8,
+        help='Number of concurrent clients for the throughput test')
+    journal_parser.add_argument('--repeat', type=int, default=3,
+        help='Number of timing runs (best run is reported)')
+    journal_parser.set_defaults(func=bench_journal)
+    snapshot_parser = subparsers.add_parser('snapshot',
+        help='Server time held up by saving the fish, directly and '
+             'with a background snapshot')
+    snapshot_parser.add_argument('--sensors', type=int, default=100000,
+        help='Number of Sensor objects in the fish')
+    snapshot_parser.set_defaults(func=bench_snapshot)
+    fishfile_parser = subparsers.add_parser('fishfile',
+        help='Fish file save and load time and peak memory, for each '
+             'fish file format')
+    fishfile_parser.add_argument('--sensors', type=int, default=1000000,
+        help='Number of Sensor objects in the fish')
+    fishfile_parser.set_defaults(func=bench_fishfile)
+    lazyfish_parser = subparsers.add_parser('lazyfish',
+        help='Startup time, memory, and first read latency for a JSON '
+             'Lines fish file, loaded normally and lazily')
+    lazyfish_parser.add_argument('--sensors', type=int, default=1000000,
+        help='Number of Sensor objects in the fish')
+    lazyfish_parser.set_defaults(func=bench_lazyfish)
+    sqlstore_parser = subparsers.add_parser('sqlstore',
+        help='Load time, PATCH latency, $filter time, and restart time '
+             'and memory, for the dict and SQLite fish stores')
+    sqlstore_parser.add_argument('--sensors', type=int, default=100000,
+        help='Number of Sensor objects in the fish')
+    sqlstore_parser.add_argument('--cache-objects', type=int,
+        default=10000,
+        help='Fish objects kept in memory with the SQLite fish store')
+    sqlstore_parser.add_argument('--patches', type=int, default=500,
+        help='Number of Sensor objects to PATCH')
+    sqlstore_parser.add_argument('--repeat', type=int, default=3,
+        help='Number of timing runs (best run is reported)')
+    sqlstore_parser.set_defaults(func=bench_sqlstore)
+    mockup_parser = subparsers.add_parser('mockup',
+        help='Mockup load time with different numbers of loader threads')
+    mockup_parser.add_argument('mockup',
+        help='Mockup directory to load')
+    mockup_parser.add_argument('--workers', type=int, nargs='+',
+        default=[1, 8], help='Numbers of loader threads to compare')
+    mockup_parser.add_argument('--repeat', type=int, default=3,
+        help='Number of loads per setting (best run is reported)')
+    mockup_parser.set_defaults(func=bench_mockup)
+    archive_parser = subparsers.add_parser('archive',
+        help='Mockup archive save and load time, against unpacking '
+             'the archive and loading the mockup directory')
+    archive_parser.add_argument('--sensors', type=int, default=100000,
+        help='Number of Sensor objects in the mockup')
+    archive_parser.add_argument('--repeat', type=int, default=3,
+        help='Number of loads per setting (best run is reported)')
+    archive_parser.set_defaults(func=bench_archive)
+    mockupcache_parser = subparsers.add_parser('mockupcache',
+        help='Mockup load time without and with the parsed mockup cache')
+    mockupcache_parser.add_argument('--sensors', type=int, default=100000,
+        help='Number of Sensor objects in the mockup')
+    mockupcache_parser.add_argument('--changed', type=int, default=100,
+        help='Number of files changed for the partly changed mockup')
+    mockupcache_parser.set_defaults(func=bench_mockupcache)
+    args = parser.parse_args()
+    args.func(args)
+
+    # End of main()
+
+
+if __name__ == '__main__':
+    main()      # If this is the main module, run main()
+else:
+    pass        # If this module is imported, do nothing
@@ -32,7 +32,29 @@ def getconfig():
                     'omockup': None,
                     'port': 5000,
                     'https': False,
-                    'fishdoctorEnabled': False}
+                    'fishdoctorEnabled': False,
+                    'uriDispatcher': 'werkzeug',
+                    'lazyApis': False,
+                    'responseCacheMB': 64,
+                    'expandMaxLevels': 6,
+                    'expandMaxObjects': 10000,
+                    'collectionPageSize': 0,
+                    'filterIndexes': [],
+                    'stripDanglingLinks': False,
+                    'mockupLoadWorkers': 8,
+                    'mockupCache': 'off',
+                    'mockupCacheFile': '',
+                    'mockupWatchSec': 0,
+                    'journalFile': '',
+                    'journalSyncMs': 10,
+                    'journalSnapshotRecords': 100000,
+                    'snapshotFile': '',
+                    'snapshotIntervalSec': 0,
+                    'snapshotChanges': 0,
+                    'lazyFish': False,
+                    'fishStore': 'dict',
+                    'fishStoreFile': 'fishstore.db',
+                    'fishStoreCacheObjects': 10000}
 
     # Read in an optional fishem config file containing one or more
     # arguments. Arguments in this file override the default values.
@@ -72,6 +94,65 @@ def getconfig():
         help='Use HTTPS for the API')
     parser.add_argument('--fishdoctorEnabled', action='store_true',
         help='Enable fishdoctor API')
+    parser.add_argument('--uriDispatcher', '-ud',
+        choices=['werkzeug', 'trie'],
+        help='URI dispatcher for the API (default werkzeug)')
+    parser.add_argument('--lazyApis', action='store_true', default=None,
+        help='Import API modules on demand (uses the trie dispatcher)')
+    parser.add_argument('--responseCacheMB', '-rc', type = float,
+        help='Response cache size in MB, 0 to disable (default 64)')
+    parser.add_argument('--expandMaxLevels', type = int,
+        help='Maximum $levels for $expand queries (default 6)')
+    parser.add_argument('--expandMaxObjects', type = int,
+        help='Maximum objects expanded by one $expand query '
+             '(default 10000)')
+    parser.add_argument('--collectionPageSize', type = int,
+        help='Default page size for collection Members, 0 for no '
+             'paging (default 0)')
+    parser.add_argument('--filterIndexes', nargs='+', metavar='PATH',
+        help='Property paths to index for $filter queries, '
+             'such as Status/Health')
+    parser.add_argument('--stripDanglingLinks', action='store_true',
+        default=None,
+        help='Remove links to resources removed by DELETE requests')
+    parser.add_argument('--mockupLoadWorkers', type = int,
+        help='Number of threads that read input mockup files, 1 to '
+             'read them one at a time (default 8)')
+    parser.add_argument('--mockupCache',
+        choices=['off', 'stat', 'content'],
+        help='Cache the parsed input mockup, checking mockup files for '
+             'changes by size and mtime (stat) or by content '
+             '(default off)')
+    parser.add_argument('--mockupCacheFile',
+        help='Input mockup cache file (default: next to the mockup)')
+    parser.add_argument('--mockupWatchSec', type = float,
+        help='Seconds between checks of the input mockup for changes, '
+             '0 for none (default 0)')
+    parser.add_argument('--journalFile', '-jf',
+        help='Journal fish changes to JOURNALFILE, and recover from it')
+    parser.add_argument('--journalSyncMs', type = float,
+        help='Milliseconds of changes written to the journal '
+             'together (default 10)')
+    parser.add_argument('--journalSnapshotRecords', type = int,
+        help='Journal records between fish snapshots '
+             '(default 100000)')
+    parser.add_argument('--snapshotFile', '-sf',
+        help='Save background snapshots of the fish to SNAPSHOTFILE')
+    parser.add_argument('--snapshotIntervalSec', type = float,
+        help='Seconds between fish snapshots, 0 for none (default 0)')
+    parser.add_argument('--snapshotChanges', type = int,
+        help='Fish changes between fish snapshots, 0 for none '
+             '(default 0)')
+    parser.add_argument('--lazyFish', action='store_true', default=None,
+        help='Load JSON Lines input fish file objects on first use')
+    parser.add_argument('--fishStore', choices=['dict', 'sqlite'],
+        help='Keep the fish in memory (dict) or in a SQLite database '
+             '(default dict)')
+    parser.add_argument('--fishStoreFile',
+        help='SQLite fish store database file (default fishstore.db)')
+    parser.add_argument('--fishStoreCacheObjects', type = int,
+        help='Fish objects kept in memory with the SQLite fish store '
+             '(default 10000)')
     args = parser.parse_args()
     if args.version:            # Show version and exit
             print('fishem version', __version__)
@@ -84,6 +165,49 @@ def getconfig():
     if not(args.https==None): fishemconfig['https'] = args.https
     if not(args.fishdoctorEnabled==None):
         fishemconfig['fishdoctorEnabled'] = args.fishdoctorEnabled
+    if not(args.uriDispatcher==None):
+        fishemconfig['uriDispatcher'] = args.uriDispatcher
+    if not(args.lazyApis==None): fishemconfig['lazyApis'] = args.lazyApis
+    if not(args.responseCacheMB==None):
+        fishemconfig['responseCacheMB'] = args.responseCacheMB
+    if not(args.expandMaxLevels==None):
+        fishemconfig['expandMaxLevels'] = args.expandMaxLevels
+    if not(args.expandMaxObjects==None):
+        fishemconfig['expandMaxObjects'] = args.expandMaxObjects
+    if not(args.collectionPageSize==None):
+        fishemconfig['collectionPageSize'] = args.collectionPageSize
+    if not(args.filterIndexes==None):
+        fishemconfig['filterIndexes'] = args.filterIndexes
+    if not(args.stripDanglingLinks==None):
+        fishemconfig['stripDanglingLinks'] = args.stripDanglingLinks
+    if not(args.mockupLoadWorkers==None):
+        fishemconfig['mockupLoadWorkers'] = args.mockupLoadWorkers
+    if not(args.mockupCache==None):
+        fishemconfig['mockupCache'] = args.mockupCache
+    if not(args.mockupCacheFile==None):
+        fishemconfig['mockupCacheFile'] = args.mockupCacheFile
+    if not(args.mockupWatchSec==None):
+        fishemconfig['mockupWatchSec'] = args.mockupWatchSec
+    if not(args.journalFile==None):
+        fishemconfig['journalFile'] = args.journalFile
+    if not(args.journalSyncMs==None):
+        fishemconfig['journalSyncMs'] = args.journalSyncMs
+    if not(args.journalSnapshotRecords==None):
+        fishemconfig['journalSnapshotRecords'] = \
+            args.journalSnapshotRecords
+    if not(args.snapshotFile==None):
+        fishemconfig['snapshotFile'] = args.snapshotFile
+    if not(args.snapshotIntervalSec==None):
+        fishemconfig['snapshotIntervalSec'] = args.snapshotIntervalSec
+    if not(args.snapshotChanges==None):
+        fishemconfig['snapshotChanges'] = args.snapshotChanges
+    if not(args.lazyFish==None): fishemconfig['lazyFish'] = args.lazyFish
+    if not(args.fishStore==None):
+        fishemconfig['fishStore'] = args.fishStore
+    if not(args.fishStoreFile==None):
+        fishemconfig['fishStoreFile'] = args.fishStoreFile
+    if not(args.fishStoreCacheObjects==None):
+        fishemconfig['fishStoreCacheObjects'] = args.fishStoreCacheObjects
 
     # Return configuration parameters as a dictionary
     return fishemconfig
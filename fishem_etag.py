@@ -0,0 +1,127 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+ETag support for fishem.
+
+Each fish object has a version number. Versions come from a single
+counter that only increases, and an object gets a new version each
+time it is set, replaced, deleted, or changed in place (see FishDict
+in fish_data.py), so a version is never reused for a fish key while
+fishem is running. The ETag of an object is made from its version
+and the fishem start time, so ETags from an earlier fishem run do
+not match either. Responses made from more than one fish object
+(such as $expand responses) get weak ETags made from their contents.
+
+GET requests with an If-None-Match header that matches the current
+ETag get a 304 (Not Modified) response without a body. PUT, PATCH,
+and DELETE requests with an If-Match header that does not match the
+current ETag get a 412 (Precondition Failed) response.
+"""
+
+# Standard library module imports
+import hashlib                  # Response contents ETags
+import itertools                # Version counter
+import time                     # ETag run prefix
+
+# Third party module imports
+from flask import request               # Conditional request headers
+from flask import make_response         # Conditional responses
+
+# Local module imports
+from fish_data import fish              # Fish data
+import fishem_httpcodes as HTTP         # HTTP status codes
+
+# Constants
+ETAG_RUN = '%x' % int(time.time())      # Differs for each fishem run
+
+# Version counter, and current version of each fish key
+_counter = itertools.count(1)
+versions = {}
+
+
+# Function: fish_changed()
+
+def fish_changed(key):
+    """fish listener; gives a changed object a new version."""
+    if key in fish:
+        versions[key] = next(_counter)
+    else:
+        versions.pop(key, None)
+    return
+
+    # End of fish_changed()
+
+
+# Function: etag()
+
+def etag(key, variant=''):
+    """Returns the current ETag of the fish object for 'key'. Each
+    'variant' of the response for an object (such as a $select
+    response) gets its own ETag."""
+    version = versions.get(key)
+    if version is None:
+        version = versions.setdefault(key, next(_counter))
+    if variant:
+        variant = '-' + hashlib.sha1(variant.encode()).hexdigest()[:8]
+    return '"' + ETAG_RUN + '-' + str(version) + variant + '"'
+
+    # End of etag()
+
+
+# Function: body_etag()
+
+def body_etag(body):
+    """Returns a weak ETag made from the response contents 'body'
+    (bytes), for responses made from more than one fish object."""
+    return 'W/"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+    # End of body_etag()
+
+
+# Function: not_modified()
+
+def not_modified(key, current=None):
+    """Handles If-None-Match for a GET of 'key'. Returns a 304 (Not
+    Modified) response if the client already has the current object,
+    or None if the object must be returned. 'current' is the ETag to
+    compare, if it is not the ETag of 'key'."""
+    if 'If-None-Match' not in request.headers:
+        return None
+    if current is None:
+        current = etag(key)
+    if not request.if_none_match.contains_weak(
+            current.replace('W/', '').strip('"')):
+        return None
+    resp = make_response('', HTTP.NOT_MODIFIED)
+    resp.headers['ETag'] = current
+    return resp
+
+    # End of not_modified()
+
+
+# Function: precondition_failed()
+
+def precondition_failed(key):
+    """Handles If-Match for a PUT, PATCH, or DELETE of 'key'. Returns
+    a 412 (Precondition Failed) response if the client's ETag is not
+    the current one, or None if the request can proceed."""
+    if 'If-Match' not in request.headers:
+        return None
+    current = etag(key)
+    if request.if_match.contains(current.strip('"')):
+        return None
+    return 'ETag does not match', HTTP.PRECONDITION_FAILED, \
+        {'ETag': current}
+
+    # End of precondition_failed()
+
+
+# Function: setup()
+
+def setup():
+    """Starts tracking fish object versions."""
+    if fish_changed not in fish.listeners:
+        fish.listeners.append(fish_changed)
+    return
+
+    # End of setup()
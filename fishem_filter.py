@@ -0,0 +1,293 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+$filter expression support for fishem.
+
+A $filter expression selects the members of a collection that a GET
+request returns, for example:
+
+    $filter=Status/Health eq 'Critical'
+    $filter=Severity ne 'OK' and not (MessageId eq 'Base.1.0.Success')
+    $filter=CapacityBytes gt 1000000000000 or Protocol eq 'NVMe'
+
+Operands are property paths (nested properties are given as paths,
+like "Status/Health") and literals: strings in single quotes (with
+'' for a quote), numbers, true, false, and null. Comparisons are
+eq, ne, gt, ge, lt, and le; they can be combined with and, or, not,
+and parentheses. A property that is not present compares as null,
+and ordering comparisons of values that cannot be ordered (such as
+a string and a number) are false.
+
+Each expression is parsed once and compiled into a Python predicate
+function; compiled filters are kept by expression text, so a filter
+that clients ask for repeatedly is not parsed again.
+"""
+
+# Standard library module imports
+import collections              # Compiled filter cache
+import operator                 # Comparison functions
+import re                       # Expression parsing
+import threading                # Compiled filter cache lock
+
+# Third party module imports
+# None
+
+# Local module imports
+# None
+
+# Constants
+TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<paren>[()])
+    | '(?P<string>(?:[^']|'')*)'
+    | (?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    | (?P<word>[A-Za-z_@\#][\w.@\#]*(?:/[A-Za-z_@\#][\w.@\#]*)*)
+    )""", re.VERBOSE)
+COMPARISONS = {'eq': operator.eq, 'ne': operator.ne,
+               'gt': operator.gt, 'ge': operator.ge,
+               'lt': operator.lt, 'le': operator.le}
+LITERALS = {'true': True, 'false': False, 'null': None}
+KEYWORDS = ('and', 'or', 'not')
+FILTER_CACHE_SIZE = 256
+
+# Compiled filters, by expression text, least recently used first
+_compiled = collections.OrderedDict()
+_lock = threading.Lock()
+
+
+# Class: FilterError
+
+class FilterError(Exception):
+    """Raised for $filter expressions that cannot be parsed."""
+
+
+# Class: Filter
+
+class Filter:
+    """A compiled $filter expression.
+
+    'predicate' is a function that returns True for the fish objects
+    the expression selects. 'index_terms' lists the (property path,
+    value) pairs that every selected object must be equal to, which
+    a property index can use to find candidate objects (see
+    fishem_propindex.py) instead of testing every object. 'expr' is
+    the expression tree (see Parser), for code that evaluates the
+    expression another way, such as in SQL (see fishem_sqlfish.py).
+    """
+
+    def __init__(self, text, predicate, index_terms, expr):
+        self.text = text
+        self.predicate = predicate
+        self.index_terms = index_terms
+        self.expr = expr
+
+
+# Function: tokenize()
+
+def tokenize(text):
+    """Returns the list of (kind, value) tokens in $filter 'text'."""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = TOKEN_RE.match(text, pos)
+        if match is None or match.end() == pos:
+            raise FilterError('unexpected input at position ' + str(pos))
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'string':
+            tokens.append(('literal', value.replace("''", "'")))
+        elif kind == 'number':
+            number = float(value)
+            if number.is_integer() and re.fullmatch(r'-?\d+', value):
+                number = int(value)
+            tokens.append(('literal', number))
+        elif kind == 'word' and value in LITERALS:
+            tokens.append(('literal', LITERALS[value]))
+        elif kind == 'word' and (value in COMPARISONS or
+                                 value in KEYWORDS):
+            tokens.append(('keyword', value))
+        elif kind == 'word':
+            tokens.append(('path', tuple(value.split('/'))))
+        else:
+            tokens.append(('paren', value))
+    return tokens
+
+    # End of tokenize()
+
+
+# Class: Parser
+
+class Parser:
+    """Recursive descent parser for a list of $filter tokens. The
+    expression tree is made of tuples:
+
+        ('or', [expr, ...])         ('and', [expr, ...])
+        ('not', expr)               ('cmp', op, operand, operand)
+        ('path', (name, ...))       ('literal', value)
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self):
+        """Returns the next token, or (None, None) at the end."""
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return None, None
+        # End of peek()
+
+    def take(self):
+        """Returns the next token and moves past it."""
+        token = self.peek()
+        if token[0] is None:
+            raise FilterError('unexpected end of expression')
+        self.pos += 1
+        return token
+        # End of take()
+
+    def parse(self):
+        """Returns the expression tree for all of the tokens."""
+        expr = self.parse_bool('or')
+        if self.pos != len(self.tokens):
+            raise FilterError('unexpected ' + str(self.peek()[1]))
+        return expr
+        # End of parse()
+
+    def parse_bool(self, word):
+        """Parses terms joined by 'word' ('or' or 'and'); 'and' binds
+        more tightly than 'or'."""
+        terms = [self.parse_bool('and') if word == 'or'
+                 else self.parse_not()]
+        while self.peek() == ('keyword', word):
+            self.take()
+            terms.append(self.parse_bool('and') if word == 'or'
+                         else self.parse_not())
+        return terms[0] if len(terms) == 1 else (word, terms)
+        # End of parse_bool()
+
+    def parse_not(self):
+        """Parses a 'not' expression, parentheses, or a comparison."""
+        token = self.peek()
+        if token == ('keyword', 'not'):
+            self.take()
+            return ('not', self.parse_not())
+        if token == ('paren', '('):
+            self.take()
+            expr = self.parse_bool('or')
+            if self.take() != ('paren', ')'):
+                raise FilterError('missing )')
+            return expr
+        left = self.parse_operand()
+        kind, op = self.take()
+        if kind != 'keyword' or op not in COMPARISONS:
+            raise FilterError('expected a comparison, not ' + str(op))
+        return ('cmp', op, left, self.parse_operand())
+        # End of parse_not()
+
+    def parse_operand(self):
+        """Parses a property path or a literal."""
+        kind, value = self.take()
+        if kind not in ('path', 'literal'):
+            raise FilterError('expected a property or value, not ' +
+                              str(value))
+        return (kind, value)
+        # End of parse_operand()
+
+
+# Function: get_path()
+
+def get_path(obj, names):
+    """Returns the property of 'obj' at path 'names', or None if it
+    is not present."""
+    for name in names:
+        if not isinstance(obj, dict):
+            return None
+        obj = obj.get(name)
+    return obj
+
+    # End of get_path()
+
+
+# Function: compile_operand()
+
+def compile_operand(operand):
+    """Returns a function of a fish object that gives the value of
+    'operand'."""
+    kind, value = operand
+    if kind == 'literal':
+        return lambda obj: value
+    return lambda obj: get_path(obj, value)
+
+    # End of compile_operand()
+
+
+# Function: compile_expr()
+
+def compile_expr(expr):
+    """Returns a predicate function for expression tree 'expr'."""
+    kind = expr[0]
+    if kind == 'or':
+        terms = [compile_expr(term) for term in expr[1]]
+        return lambda obj: any(term(obj) for term in terms)
+    if kind == 'and':
+        terms = [compile_expr(term) for term in expr[1]]
+        return lambda obj: all(term(obj) for term in terms)
+    if kind == 'not':
+        term = compile_expr(expr[1])
+        return lambda obj: not term(obj)
+    compare = COMPARISONS[expr[1]]
+    left = compile_operand(expr[2])
+    right = compile_operand(expr[3])
+    if expr[1] in ('eq', 'ne'):
+        return lambda obj: compare(left(obj), right(obj))
+
+    def ordered(obj):
+        try:
+            return compare(left(obj), right(obj))
+        except TypeError:
+            # Values that cannot be ordered
+            return False
+    return ordered
+
+    # End of compile_expr()
+
+
+# Function: index_terms()
+
+def index_terms(expr):
+    """Returns the (property path, value) equality terms that all
+    objects selected by expression tree 'expr' must match."""
+    terms = expr[1] if expr[0] == 'and' else [expr]
+    found = []
+    for term in terms:
+        if term[0] != 'cmp' or term[1] != 'eq':
+            continue
+        for path, literal in ((term[2], term[3]), (term[3], term[2])):
+            if path[0] == 'path' and literal[0] == 'literal':
+                found.append(('/'.join(path[1]), literal[1]))
+    return found
+
+    # End of index_terms()
+
+
+# Function: get_filter()
+
+def get_filter(text):
+    """Returns the compiled Filter for $filter expression 'text'.
+    Raises FilterError if it cannot be parsed."""
+    with _lock:
+        compiled = _compiled.get(text)
+        if compiled is not None:
+            _compiled.move_to_end(text)
+            return compiled
+    expr = Parser(tokenize(text)).parse()
+    compiled = Filter(text, compile_expr(expr), index_terms(expr), expr)
+    with _lock:
+        _compiled[text] = compiled
+        while len(_compiled) > FILTER_CACHE_SIZE:
+            _compiled.popitem(last=False)
+    return compiled
+
+    # End of get_filter()
@@ -2,20 +2,268 @@
 
 """
 Handle fish file I/O for fishem.
+
+Fish files are saved and loaded in one of two formats, chosen by the
+file name extension:
+
+    .jsonl, .ndjson     JSON Lines; one {"key": ..., "value": ...}
+                        record per line for each fish object
+    .fishz, .fishxz     Binary; gzip or xz compressed marshal data
+    anything else       One JSON object holding the whole fish
+
+JSON Lines fish files are read one record at a time, so loading one
+does not need memory for more than the fish itself.
+
+Binary fish files hold a header line, then chunks of fish objects,
+each a 4-byte little-endian length followed by a marshal encoded list
+of (key, value) pairs. Property names are interned when they are
+saved, so marshal stores each name once per chunk and the loaded
+objects share one copy of each name. They load several times faster
+than JSON fish files and are much smaller, but can only be loaded by
+the same or a newer version of Python. The fishem_fishtool.py
+convert command converts fish files between the formats.
 """
 
 # Standard library module imports
+import gc                       # Garbage collector pause
+import gzip                     # Binary fish file compression
+import itertools                # Fish file chunks
 import json                     # JSON handling
+import lzma                     # Binary fish file compression
+import marshal                  # Binary fish file encoding
 import os                       # File I/O handling
+import struct                   # Binary fish file chunk lengths
+import sys                      # Property name interning
 
 # Third party module imports
 # None
 
 # Local moduleimports
 from fish_data import fish      # Fish data
+import fishem_members           # Collection membership index
 
 # Constants
-# None
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+JSONL_CHUNK_LINES = 1000
+BINARY_EXTENSIONS = ('.fishz', '.fishxz')
+BINARY_MAGIC = b'fishem marshal fish '
+BINARY_CHUNK_OBJECTS = 1000
+GZIP_LEVEL = 6
+XZ_PRESET = 3
+MISSING = object()
+
+
+# Function: is_jsonl()
+
+def is_jsonl(fish_file):
+    """Returns True if 'fish_file' is named as a JSON Lines fish file.
+    """
+    return os.path.splitext(fish_file)[1].lower() in JSONL_EXTENSIONS
+
+    # End of is_jsonl()
+
+
+# Function: jsonl_record()
+
+def jsonl_record(line, line_number):
+    """Returns the (key, value) pair in JSON Lines fish file record
+    'line'. Raises ValueError if it is not a valid record."""
+    try:
+        record = json.loads(line)
+        return record['key'], record['value']
+    except (ValueError, TypeError, KeyError) as error:
+        raise ValueError('Bad record on line ' + str(line_number) +
+                         ': ' + repr(error))
+
+    # End of jsonl_record()
+
+
+# Function: read_jsonl()
+
+def read_jsonl(ifish_file):
+    """Loads the JSON Lines fish file 'ifish_file' into the current
+    fish, a chunk of lines at a time. Raises an exception if the file
+    cannot be read or a record is not valid.
+    """
+    line_number = 0
+    with open(ifish_file, encoding='utf-8') as fish_in:
+        while True:
+            lines = list(itertools.islice(fish_in, JSONL_CHUNK_LINES))
+            if not lines:
+                break
+            # Decode the chunk in one call, which is faster and shares
+            # repeated property name strings between records; decode
+            # line by line to find a bad record
+            text_lines = [line for line in lines if line.strip()]
+            try:
+                records = json.loads('[' + ','.join(text_lines) + ']')
+                pairs = [(record['key'], record['value'])
+                         for record in records]
+                if len(pairs) != len(text_lines):
+                    pairs = None
+            except (ValueError, TypeError, KeyError):
+                pairs = None
+            if pairs is None:
+                pairs = [jsonl_record(line, line_number + index)
+                         for index, line in enumerate(lines, 1)
+                         if line.strip()]
+            for key, value in pairs:
+                fish[key] = value
+            line_number += len(lines)
+    return
+
+    # End of read_jsonl()
+
+
+# Function: is_binary()
+
+def is_binary(fish_file):
+    """Returns True if 'fish_file' is named as a binary fish file.
+    """
+    return os.path.splitext(fish_file)[1].lower() in BINARY_EXTENSIONS
+
+    # End of is_binary()
+
+
+# Function: binary_stream()
+
+def binary_stream(fish_file, raw_file, mode):
+    """Returns a compressed stream for binary fish file 'fish_file'
+    over the open file 'raw_file': xz for .fishxz, otherwise gzip."""
+    if os.path.splitext(fish_file)[1].lower() == '.fishxz':
+        return lzma.LZMAFile(raw_file, mode,
+                             preset=XZ_PRESET if 'w' in mode else None)
+    return gzip.GzipFile(fileobj=raw_file, mode=mode,
+                         compresslevel=GZIP_LEVEL)
+
+    # End of binary_stream()
+
+
+# Function: intern_names()
+
+def intern_names(value):
+    """Returns a copy of fish object 'value' with its property names
+    interned."""
+    if isinstance(value, dict):
+        return {sys.intern(name): intern_names(item)
+                for name, item in value.items()}
+    if isinstance(value, list):
+        return [intern_names(item) for item in value]
+    return value
+
+    # End of intern_names()
+
+
+# Function: read_binary()
+
+def read_binary(ifish_file):
+    """Loads the binary fish file 'ifish_file' into the current fish,
+    a chunk at a time. Raises an exception if the file cannot be read
+    or is not a binary fish file.
+    """
+    with open(ifish_file, 'rb') as raw_file, \
+            binary_stream(ifish_file, raw_file, 'rb') as fish_in:
+        header = fish_in.readline()
+        if not header.startswith(BINARY_MAGIC):
+            raise ValueError('Not a binary fish file')
+        # marshal reads data written by its own and older versions
+        version = header[len(BINARY_MAGIC):].strip()
+        if not version.isdigit() or int(version) > marshal.version:
+            raise ValueError('Binary fish file was written by '
+                             'incompatible marshal version ' +
+                             version.decode(errors='replace') +
+                             ' (this Python has version ' +
+                             str(marshal.version) + '); use '
+                             'fishem_fishtool.py convert with the Python '
+                             'that wrote it to convert it to a JSON or '
+                             'JSON Lines fish file')
+        while True:
+            length = fish_in.read(4)
+            if not length:
+                break
+            data_length = struct.unpack('<I', length)[0] \
+                if len(length) == 4 else None
+            data = fish_in.read(data_length) if data_length else b''
+            if not data or len(data) != data_length:
+                raise ValueError('Binary fish file is truncated')
+            for key, value in marshal.loads(data):
+                fish[key] = value
+    return
+
+    # End of read_binary()
+
+
+# Function: fish_items()
+
+def fish_items(keys=None):
+    """Yields the (key, object) pairs of the keys in the current fish
+    when it is called, or of the keys in 'keys' that are in the fish.
+    Uses fish.peek(), so objects of a lazily loaded fish (see
+    fishem_lazyfish.py) that have not been read are decoded one at a
+    time, and are not kept."""
+    for key in list(fish) if keys is None else list(keys):
+        value = fish.peek(key, MISSING)
+        if value is not MISSING:
+            yield key, value
+    return
+
+    # End of fish_items()
+
+
+# Function: write_binary()
+
+def write_binary(ofish_file, raw_file, keys=None):
+    """Writes the current fish (or the objects for 'keys') to the open
+    file 'raw_file' as binary fish file 'ofish_file'."""
+    with binary_stream(ofish_file, raw_file, 'wb') as fish_out:
+        fish_out.write(BINARY_MAGIC + str(marshal.version).encode() +
+                       b'\n')
+        items = fish_items(keys)
+        while True:
+            chunk = []
+            for key, value in itertools.islice(items, BINARY_CHUNK_OBJECTS):
+                try:
+                    chunk.append((key, intern_names(value)))
+                except RuntimeError:
+                    # Changed by another thread while it was copied;
+                    # copy it in one step first
+                    chunk.append((key, intern_names(
+                        marshal.loads(marshal.dumps(value)))))
+            if not chunk:
+                break
+            data = marshal.dumps(chunk)
+            fish_out.write(struct.pack('<I', len(data)) + data)
+    return
+
+    # End of write_binary()
+
+
+# Function: read_fish()
+
+def read_fish(ifish_file):
+    """Loads the fish file 'ifish_file' into the current fish, in the
+    format for its extension. Raises an exception if the file cannot
+    be read."""
+
+    # Loading makes many objects but no reference cycles, so the
+    # garbage collector would only slow it down by scanning them
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        if is_jsonl(ifish_file):
+            read_jsonl(ifish_file)
+        elif is_binary(ifish_file):
+            read_binary(ifish_file)
+        else:
+            input_dict = json.load(open(ifish_file))
+            for key in input_dict:
+                fish[key] = input_dict[key]
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return
+
+    # End of read_fish()
 
 
 # Function: input()
@@ -32,7 +280,7 @@ def input(ifish_file):
         exit(1)
 
     try:
-        input_dict = json.load(open(ifish_file))
+        read_fish(ifish_file)
     except Exception as error:
         print('Failed to read the fish file "', ifish_file,
               '":', sep='')
@@ -41,9 +289,6 @@ def input(ifish_file):
         print('Input fish file not loaded, fishem ending')
         exit(1)
 
-    for key in input_dict:
-        fish[key] = input_dict[key]
-
     # Success return
     print('Loaded the fish file "', ifish_file, '"', sep='')
     return
@@ -51,6 +296,59 @@ def input(ifish_file):
     # End of input()
 
 
+# Function: write_fish()
+
+def write_fish(ofish_file, keys=None):
+    """Writes the current fish (or only the objects for 'keys') to the
+    fish file 'ofish_file', in the format for its extension. The fish
+    is written one object at a time to a temporary file, which is then
+    flushed to disk and renamed, so 'ofish_file' always holds a
+    complete fish. Raises an exception if the file cannot be written.
+    """
+
+    # Bring collection Members up to date
+    fishem_members.sync_all()
+
+    temp_file = ofish_file + '.tmp'
+    with open(temp_file, 'wb' if is_binary(ofish_file) else 'w') \
+            as fish_file:
+        # Encode each object in one step, so the fish can be saved
+        # while other threads are changing it
+        if is_binary(ofish_file):
+            write_binary(ofish_file, fish_file, keys)
+        elif is_jsonl(ofish_file):
+            for key, value in fish_items(keys):
+                fish_file.write('{"key": ' + json.dumps(key) +
+                                ', "value": ' + json.dumps(value) + '}\n')
+        else:
+            fish_file.write('{')
+            separator = ''
+            for key, value in fish_items(keys):
+                fish_file.write(separator + json.dumps(key) + ': ' +
+                                json.dumps(value))
+                separator = ', '
+            fish_file.write('}')
+        fish_file.flush()
+        os.fsync(fish_file.fileno())
+    os.replace(temp_file, ofish_file)
+    return
+
+    # End of write_fish()
+
+
+# Function: file_format()
+
+def file_format(fish_file):
+    """Returns the name of the format of fish file 'fish_file'."""
+    if is_jsonl(fish_file):
+        return 'JSON Lines'
+    if is_binary(fish_file):
+        return 'binary'
+    return 'JSON'
+
+    # End of file_format()
+
+
 # Function: output()
 
 def output(ofish_file):
@@ -58,7 +356,7 @@ def output(ofish_file):
     """
 
     try:
-        json.dump(fish, open(ofish_file, 'w'))
+        write_fish(ofish_file)
     except Exception as error:
         print('Failed to save the current fish in "',
               ofish_file, '":', sep='')
@@ -67,8 +365,8 @@ def output(ofish_file):
         exit(1)
 
     # Success return
-    print('Saved the current fish as a JSON file in "',
-        ofish_file, '"', sep='')
+    print('Saved the current fish as a ', file_format(ofish_file),
+        ' file in "', ofish_file, '"', sep='')
     return
 
     # End of output()
@@ -0,0 +1,382 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Fish diffs and patches for fishem.
+
+A fish patch holds the changes that turn one fish into another, as a
+JSON object with a JSON Patch (RFC 6902) operation list for each fish
+key that differs. Operation paths are JSON Pointers (RFC 6901) into
+the fish object for the key, so the path "" is the whole object:
+
+    {
+    "/redfish/v1/Chassis/1": [{"op": "replace", "path": "/Name", ...}],
+    "/redfish/v1/Chassis/2": [{"op": "add", "path": "", "value": {...}}],
+    "/redfish/v1/Chassis/3": [{"op": "remove", "path": ""}]
+    }
+
+diff() compares two fish. Most objects are usually unchanged, so each
+object is compared by its marshal encoding first, which is one C
+level serialization and a byte comparison, and only the objects that
+differ are walked. Inside a changed object, each subtree (a property
+value, or a list entry) is compared the same way before it is walked,
+so the operations only touch the parts that changed. Values are
+compared as JSON values (1, 1.0, and true all differ).
+
+apply() applies a patch to the fish. Every operation is checked
+before any fish object is changed, so a patch that does not apply
+cleanly changes nothing. Patches are applied with the fishem_fishtool
+patch tool, or to a running fishem with a POST of the patch to
+/fishdoctor/Actions/FishDoctor.Patch when fishdoctor is enabled.
+"""
+
+# Standard library module imports
+import json                     # Patch files
+import marshal                  # Object comparison and copies
+
+# Third party module imports
+# None
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_members           # Collection membership index
+
+# Constants
+MISSING = object()
+
+
+# Class: PatchError
+
+class PatchError(ValueError):
+    """A fish patch that is not well formed or does not apply to the
+    fish."""
+    pass
+
+
+# Function: encoding()
+
+def encoding(value):
+    """Returns the marshal encoding of 'value', which is equal for two
+    values only if they are the same JSON value (it may also differ
+    for two equal dictionaries whose keys are in different orders)."""
+    try:
+        return marshal.dumps(value)
+    except ValueError:
+        # Changed by another thread while it was encoded
+        return marshal.dumps(marshal.loads(marshal.dumps(value)))
+
+    # End of encoding()
+
+
+# Function: pointer()
+
+def pointer(path, token):
+    """Returns JSON Pointer 'path' extended by reference 'token'."""
+    token = str(token)
+    if '~' in token or '/' in token:
+        token = token.replace('~', '~0').replace('/', '~1')
+    return path + '/' + token
+
+    # End of pointer()
+
+
+# Function: diff_value()
+
+def diff_value(old, new, path, ops):
+    """Appends to 'ops' the JSON Patch operations that change value
+    'old' at JSON Pointer 'path' into value 'new'."""
+    if type(old) is dict and type(new) is dict:
+        for name in old:
+            if name not in new:
+                ops.append({'op': 'remove', 'path': pointer(path, name)})
+        for name, new_value in new.items():
+            old_value = old.get(name, MISSING)
+            if old_value is MISSING:
+                ops.append({'op': 'add', 'path': pointer(path, name),
+                            'value': new_value})
+            elif not same_value(old_value, new_value):
+                diff_value(old_value, new_value, pointer(path, name), ops)
+    elif type(old) is list and type(new) is list:
+        for index in range(min(len(old), len(new))):
+            if not same_value(old[index], new[index]):
+                diff_value(old[index], new[index], pointer(path, index), ops)
+        for index in range(len(old), len(new)):
+            ops.append({'op': 'add', 'path': pointer(path, index),
+                        'value': new[index]})
+        for index in range(len(old) - 1, len(new) - 1, -1):
+            ops.append({'op': 'remove', 'path': pointer(path, index)})
+    elif not same_value(old, new):
+        ops.append({'op': 'replace', 'path': path, 'value': new})
+    return
+
+    # End of diff_value()
+
+
+# Function: same_value()
+
+def same_value(old, new):
+    """Returns True if JSON values 'old' and 'new' are the same. Two
+    dictionaries with their keys in different orders are only found
+    the same by diff_value(), which then adds no operations."""
+    if type(old) is not type(new):
+        return False
+    if type(old) is dict or type(old) is list:
+        return encoding(old) == encoding(new)
+    return old == new
+
+    # End of same_value()
+
+
+# Function: diff()
+
+def diff(old_encodings, new_items):
+    """Returns the fish patch that changes the fish whose objects have
+    marshal encodings 'old_encodings' (a dictionary by fish key, as
+    made with encoding()) into the fish with the (key, object) pairs
+    'new_items', and a count of the keys added, removed, changed, and
+    unchanged."""
+    patch = {}
+    counts = {'added': 0, 'removed': 0, 'changed': 0, 'unchanged': 0}
+    new_keys = set()
+    for key, new_obj in new_items:
+        new_keys.add(key)
+        old_encoding = old_encodings.get(key)
+        if old_encoding is None:
+            patch[key] = [{'op': 'add', 'path': '', 'value': new_obj}]
+            counts['added'] += 1
+            continue
+        if old_encoding == encoding(new_obj):
+            counts['unchanged'] += 1
+            continue
+        ops = []
+        diff_value(marshal.loads(old_encoding), new_obj, '', ops)
+        if ops:
+            patch[key] = ops
+            counts['changed'] += 1
+        else:
+            counts['unchanged'] += 1
+    for key in old_encodings:
+        if key not in new_keys:
+            patch[key] = [{'op': 'remove', 'path': ''}]
+            counts['removed'] += 1
+    return patch, counts
+
+    # End of diff()
+
+
+# Function: parse_pointer()
+
+def parse_pointer(path):
+    """Returns the reference tokens of JSON Pointer 'path'."""
+    if type(path) is not str or (path and not path.startswith('/')):
+        raise PatchError('Bad JSON Pointer: ' + repr(path))
+    return [token.replace('~1', '/').replace('~0', '~')
+            for token in path.split('/')[1:]]
+
+    # End of parse_pointer()
+
+
+# Function: list_index()
+
+def list_index(container, token, path, adding=False):
+    """Returns the list index for reference 'token' in list
+    'container'; "-" (the end of the list) and the list length are
+    only allowed when 'adding'."""
+    if adding and token == '-':
+        return len(container)
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise PatchError('Bad list index in ' + path)
+    index = int(token)
+    if index > len(container) or (index == len(container) and not adding):
+        raise PatchError('List index out of range in ' + path)
+    return index
+
+    # End of list_index()
+
+
+# Function: resolve()
+
+def resolve(doc, tokens, path):
+    """Returns the value at reference 'tokens' in 'doc'."""
+    for token in tokens:
+        if type(doc) is dict:
+            if token not in doc:
+                raise PatchError('No value at ' + path)
+            doc = doc[token]
+        elif type(doc) is list:
+            doc = doc[list_index(doc, token, path)]
+        else:
+            raise PatchError('No value at ' + path)
+    return doc
+
+    # End of resolve()
+
+
+# Function: apply_op()
+
+def apply_op(doc, op):
+    """Applies JSON Patch operation 'op' to value 'doc' (which may be
+    MISSING, for a fish key with no object). Returns the new value;
+    containers in 'doc' are changed in place."""
+    if type(op) is not dict or 'path' not in op:
+        raise PatchError('Bad patch operation: ' + repr(op))
+    name = op.get('op')
+    path = op['path']
+    tokens = parse_pointer(path)
+
+    # Operations that read a value before changing the document
+    if name == 'test':
+        if doc is MISSING or not same_json(resolve(doc, tokens, path),
+                                           op.get('value', MISSING)):
+            raise PatchError('Test failed at ' + path)
+        return doc
+    if name in ('move', 'copy'):
+        from_path = op.get('from')
+        from_tokens = parse_pointer(from_path)
+        if doc is MISSING:
+            raise PatchError('No value at ' + from_path)
+        value = resolve(doc, from_tokens, from_path)
+        if name == 'move':
+            if tokens[:len(from_tokens)] == from_tokens and \
+                    tokens != from_tokens:
+                raise PatchError('Cannot move ' + from_path +
+                                 ' into itself')
+            doc = apply_op(doc, {'op': 'remove', 'path': from_path})
+        else:
+            value = marshal.loads(marshal.dumps(value))
+        return apply_op(doc, {'op': 'add', 'path': path, 'value': value})
+    if name not in ('add', 'remove', 'replace'):
+        raise PatchError('Bad patch operation: ' + repr(name))
+    if name != 'remove' and 'value' not in op:
+        raise PatchError('No value for ' + path)
+
+    # The whole document
+    if not tokens:
+        if name == 'remove':
+            if doc is MISSING:
+                raise PatchError('No value at ' + path)
+            return MISSING
+        if name == 'replace' and doc is MISSING:
+            raise PatchError('No value at ' + path)
+        return op['value']
+
+    # A member of a container in the document
+    if doc is MISSING:
+        raise PatchError('No value at ' + path)
+    container = resolve(doc, tokens[:-1], path)
+    token = tokens[-1]
+    if type(container) is dict:
+        if name != 'add' and token not in container:
+            raise PatchError('No value at ' + path)
+        if name == 'remove':
+            del container[token]
+        else:
+            container[token] = op['value']
+    elif type(container) is list:
+        index = list_index(container, token, path, name == 'add')
+        if name == 'add':
+            container.insert(index, op['value'])
+        elif name == 'remove':
+            del container[index]
+        else:
+            container[index] = op['value']
+    else:
+        raise PatchError('No value at ' + path)
+    return doc
+
+    # End of apply_op()
+
+
+# Function: same_json()
+
+def same_json(old, new):
+    """Returns True if JSON values 'old' and 'new' are the same,
+    whatever order their dictionary keys are in."""
+    if type(old) is not type(new):
+        return False
+    if type(old) is dict:
+        return old.keys() == new.keys() and \
+            all(same_json(value, new[name]) for name, value in old.items())
+    if type(old) is list:
+        return len(old) == len(new) and \
+            all(same_json(value, new[index])
+                for index, value in enumerate(old))
+    return old == new
+
+    # End of same_json()
+
+
+# Function: patched_objects()
+
+def patched_objects(patch):
+    """Returns the new fish objects (or MISSING, for deleted ones) made
+    by applying 'patch' to copies of the current fish objects. Raises
+    PatchError if the patch is not well formed or does not apply."""
+    if type(patch) is not dict:
+        raise PatchError('A fish patch must be a JSON object')
+    objects = {}
+    for key, ops in patch.items():
+        if type(ops) is not list:
+            raise PatchError('Bad operation list for ' + key)
+        fishem_members.sync(key)
+        doc = fish.get(key, MISSING)
+        if doc is not MISSING:
+            doc = marshal.loads(encoding(doc))
+        for op in ops:
+            try:
+                doc = apply_op(doc, op)
+            except PatchError as error:
+                raise PatchError(key + ': ' + str(error)) from None
+        if doc is not MISSING and type(doc) is not dict:
+            raise PatchError(key + ': a fish object must be a JSON object')
+        objects[key] = doc
+    return objects
+
+    # End of patched_objects()
+
+
+# Function: apply()
+
+def apply(patch):
+    """Applies fish patch 'patch' to the current fish, all at once.
+    Returns the number of fish objects changed and deleted. Raises
+    PatchError, and changes nothing, if the patch is not well formed
+    or does not apply."""
+    changed = removed = 0
+    with fishem_members.lock:
+        objects = patched_objects(patch)
+        for key, obj in objects.items():
+            if obj is MISSING:
+                if fish.pop(key, MISSING) is not MISSING:
+                    removed += 1
+            else:
+                fish[key] = obj
+                changed += 1
+    return changed, removed
+
+    # End of apply()
+
+
+# Function: read_patch()
+
+def read_patch(patch_file):
+    """Returns the fish patch in 'patch_file'. Raises an exception if
+    the file cannot be read."""
+    with open(patch_file, 'rb') as patch_in:
+        return json.load(patch_in)
+
+    # End of read_patch()
+
+
+# Function: write_patch()
+
+def write_patch(patch_file, patch):
+    """Saves fish patch 'patch' in 'patch_file', one fish key to a
+    line."""
+    with open(patch_file, 'w') as patch_out:
+        patch_out.write('{\n')
+        patch_out.write(',\n'.join(json.dumps(key) + ': ' + json.dumps(ops)
+                                   for key, ops in patch.items()))
+        patch_out.write('\n}\n' if patch else '}\n')
+    return
+
+    # End of write_patch()
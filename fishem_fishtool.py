@@ -0,0 +1,245 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Fish file tools for fishem.
+
+Run this command to see the available tools:
+    python fishem_fishtool.py --help
+
+Tools:
+    convert Loads a fish file, mockup, or mockup archive and saves it
+            as a fish file, in the format given by the output file
+            name extension (see fishem_fishfileio.py), for example:
+
+            python fishem_fishtool.py convert lastfish.json ci.fishz
+            python fishem_fishtool.py convert ci.fishz lastfish.json
+            python fishem_fishtool.py convert mockups/big big.fishxz
+            python fishem_fishtool.py convert big.tar.gz big.fishz
+
+    diff    Compares two fish sources (fish files, mockups, or mockup
+            archives) and saves the changes from the first to the
+            second as a fish patch (see fishem_fishpatch.py), for
+            example:
+
+            python fishem_fishtool.py diff mockups/golden lastfish.json
+            python fishem_fishtool.py diff golden.fishz lastfish.json \
+                changes.json
+
+    patch   Applies a fish patch to a fish source, and saves the result
+            in the source or in another fish file or mockup; or applies
+            it to a running fishem with fishdoctor enabled, for example:
+
+            python fishem_fishtool.py patch lastfish.json changes.json
+            python fishem_fishtool.py patch mockups/golden changes.json \
+                -o new.fishz
+            python fishem_fishtool.py patch http://localhost:5000 \
+                changes.json
+"""
+
+# Standard library module imports
+import argparse                 # CLI handling
+import json                     # Patch requests
+import os                       # File I/O handling
+import time                     # Timing
+import urllib.error             # Patch request errors
+import urllib.request           # Patch requests
+
+# Third party module imports
+# None
+
+# Local module imports
+import fish_data                # Fish data and fishem config
+import fishem_fishfileio        # Fish file input and output
+import fishem_fishpatch         # Fish diffs and patches
+import fishem_mockupio          # Mockup input
+
+# Constants
+PATCH_ACTION = '/fishdoctor/Actions/FishDoctor.Patch'
+
+
+# Function: load_source()
+
+def load_source(source):
+    """Loads 'source', a mockup directory or archive or a fish file,
+    into the fish. Returns the load time in seconds."""
+    start = time.perf_counter()
+    if os.path.isdir(source) or fishem_mockupio.archive_type(source):
+        fishem_mockupio.input(source)
+    else:
+        fishem_fishfileio.input(source)
+    return time.perf_counter() - start
+
+    # End of load_source()
+
+
+# Function: source_size()
+
+def source_size(source):
+    """Returns the size in bytes of 'source', a mockup directory or
+    archive or a fish file."""
+    if not os.path.isdir(source):
+        return os.path.getsize(source)
+    size = 0
+    for dir_path, dir_names, file_names in os.walk(source):
+        for file_name in file_names:
+            size += os.path.getsize(os.path.join(dir_path, file_name))
+    return size
+
+    # End of source_size()
+
+
+# Function: convert()
+
+def convert(args):
+    """Converts a fish file, mockup, or mockup archive to a fish
+    file."""
+    fish_data.fishem_config = {}
+    load_time = load_source(args.source)
+    fishem_fishfileio.output(args.output)
+    print('%d objects, loaded in %.2f seconds' %
+          (len(fish_data.fish), load_time))
+    print('%s: %.1f MB, %s: %.1f MB' %
+          (args.source, source_size(args.source) / (1024 * 1024),
+           args.output, os.path.getsize(args.output) / (1024 * 1024)))
+    return
+
+    # End of convert()
+
+
+# Function: diff()
+
+def diff(args):
+    """Compares two fish sources, and saves the changes as a fish
+    patch."""
+    fish_data.fishem_config = {}
+    start = time.perf_counter()
+    load_source(args.source)
+    old_encodings = {key: fishem_fishpatch.encoding(obj)
+                     for key, obj in fish_data.fish.items()}
+    fish_data.fish.clear()
+    load_source(args.target)
+    load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    patch, counts = fishem_fishpatch.diff(old_encodings,
+                                          fish_data.fish.items())
+    diff_time = time.perf_counter() - start
+    if args.patch:
+        fishem_fishpatch.write_patch(args.patch, patch)
+        print('Saved the changes as a fish patch in "', args.patch, '"',
+              sep='')
+    print('%(added)d objects added, %(removed)d removed, %(changed)d '
+          'changed, %(unchanged)d unchanged' % counts)
+    print('loaded in %.2f seconds, compared in %.2f seconds' %
+          (load_time, diff_time))
+    return
+
+    # End of diff()
+
+
+# Function: patch()
+
+def patch(args):
+    """Applies a fish patch to a fish source or a running fishem."""
+    fish_data.fishem_config = {}
+    try:
+        fish_patch = fishem_fishpatch.read_patch(args.patch)
+    except Exception as error:
+        print('Failed to read the fish patch "', args.patch, '":', sep='')
+        print(error)
+        exit(1)
+
+    # Apply the patch to a running fishem
+    if args.target.startswith(('http://', 'https://')):
+        url = args.target.rstrip('/') + PATCH_ACTION
+        patch_request = urllib.request.Request(
+            url, data=json.dumps(fish_patch).encode(), method='POST',
+            headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(patch_request) as response:
+                result = json.load(response)
+        except urllib.error.HTTPError as error:
+            print('Failed to apply the fish patch at "', url, '": ',
+                  error.code, ' ', error.read().decode(errors='replace'),
+                  sep='')
+            exit(1)
+        except Exception as error:
+            print('Failed to apply the fish patch at "', url, '":', sep='')
+            print(error)
+            exit(1)
+        print('%d objects changed, %d removed' %
+              (result['Changed'], result['Removed']))
+        return
+
+    # Apply the patch to a fish source and save it
+    load_source(args.target)
+    try:
+        changed, removed = fishem_fishpatch.apply(fish_patch)
+    except fishem_fishpatch.PatchError as error:
+        print('Failed to apply the fish patch "', args.patch, '":', sep='')
+        print(error)
+        exit(1)
+    output = args.output or args.target
+    if os.path.isdir(output) or fishem_mockupio.archive_type(output):
+        fishem_mockupio.output(output)
+    else:
+        fishem_fishfileio.output(output)
+    print('%d objects changed, %d removed' % (changed, removed))
+    return
+
+    # End of patch()
+
+
+# main()
+
+def main():
+    """main()
+
+    Runs the requested tool.
+    """
+    parser = argparse.ArgumentParser(
+        description = 'Fish Emulator fish file tools')
+    subparsers = parser.add_subparsers(dest='tool', required=True)
+    convert_parser = subparsers.add_parser('convert',
+        help='Convert a fish file or mockup to a fish file')
+    convert_parser.add_argument('source',
+        help='Input fish file, mockup directory, or mockup archive')
+    convert_parser.add_argument('output',
+        help='Output fish file; .jsonl or .ndjson for JSON Lines, '
+             '.fishz or .fishxz for binary, otherwise JSON')
+    convert_parser.set_defaults(func=convert)
+    diff_parser = subparsers.add_parser('diff',
+        help='Compare two fish files or mockups, and save the changes '
+             'as a fish patch')
+    diff_parser.add_argument('source',
+        help='Fish file, mockup directory, or mockup archive to compare '
+             'from')
+    diff_parser.add_argument('target',
+        help='Fish file, mockup directory, or mockup archive to compare '
+             'to')
+    diff_parser.add_argument('patch', nargs='?',
+        help='Output fish patch file; if not given, only the number of '
+             'changes is reported')
+    diff_parser.set_defaults(func=diff)
+    patch_parser = subparsers.add_parser('patch',
+        help='Apply a fish patch to a fish file, mockup, or running '
+             'fishem')
+    patch_parser.add_argument('target',
+        help='Fish file, mockup directory, or mockup archive, or the '
+             'URL of a running fishem with fishdoctor enabled')
+    patch_parser.add_argument('patch',
+        help='Fish patch file')
+    patch_parser.add_argument('-o', '--output',
+        help='Output fish file, or existing mockup directory, or mockup '
+             'archive; the target is updated if not given')
+    patch_parser.set_defaults(func=patch)
+    args = parser.parse_args()
+    args.func(args)
+    return
+
+    # End of main()
+
+
+if __name__ == '__main__':
+    main()      # If this is the main module, run main()
+else:
+    pass        # If this module is imported, do nothing
@@ -0,0 +1,512 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Generic resource engine for fishem.
+
+Nearly all Redfish and Swordfish resource types behave the same way
+in fishem; they only differ in their Capabilities (Insertable,
+Updatable, Deletable), in the Actions they define, and in the URIs
+they respond to. Instead of one generated API module per resource
+type, these differences are kept in a compact table,
+'fishapis/resources.json', and the generic classes in this module
+implement the REST behaviors for all of them:
+
+    Singleton           GET, PUT, PATCH, POST, DELETE for singletons
+    SingletonActions    POST for singleton Actions
+    Collection          GET, POST for collections
+
+For each resource type in the table, activate_api() creates Resource
+classes named after the resource type (for example, 'Drive' and
+'DriveActions') with the table information set as class attributes,
+and registers the resource type URIs with flask_restful. The same
+URIs are registered with and without trailing slashes, and Action
+URIs are derived from the singleton URIs, exactly as the generated
+API modules did.
+
+Individual handlers can still be overridden by an API module in the
+'fishapis' directory that has the same name as the resource type.
+Such a module defines a class with the resource type name (and/or
+the Actions class name) containing only the handler methods to
+override; see fishapis/__init__.py for an example. An API module
+that defines its own activate() function (such as FishDoctor.py)
+is activated exactly as before, and the table is not used for it.
+"""
+
+# Standard library module imports
+import importlib                # API module imports
+import json                     # JSON handling
+import os                       # File I/O handling
+
+# Third party module imports
+from flask_restful import Resource      # REST operations
+from flask import request               # JSON and URI input from REST
+from flask import make_response         # Allow header handling
+
+# Local module imports
+from fish_data import fish              # Fish data
+import fishem_httpcodes as HTTP         # HTTP status codes
+import fishem_respcache                 # Serialized response cache
+import fishem_etag                      # ETag support
+import fishem_subtree                   # Subtree index
+import fishem_members                   # Collection membership index
+import fishem_links                     # Reverse-link index
+
+# Constants
+API_DIR = 'fishapis'
+RESOURCE_TABLE_FILE = os.path.join(API_DIR, 'resources.json')
+
+# The resource table, once loaded by get_resource_table()
+_resource_table = None
+
+
+# Function: allow_verbs()
+
+def allow_verbs(insertable, updatable, deletable):
+    """Generates an Allow HTTP Verbs string from Capabilities."""
+    allow_http_verbs = 'GET'
+    if insertable: allow_http_verbs += ', POST'
+    if updatable:  allow_http_verbs += ', PUT, PATCH'
+    if deletable:  allow_http_verbs += ', DELETE'
+    return allow_http_verbs
+
+    # End of allow_verbs()
+
+
+# Function: uri_to_key()
+
+def uri_to_key(path):
+    """Returns the fish key for a request path; fish keys do not
+    have trailing slashes."""
+    if path.endswith('/'):
+        path += '/'
+        path = path.replace('//', '')
+    return path
+
+    # End of uri_to_key()
+
+
+# Function: method_not_allowed()
+
+def method_not_allowed(allow_http_verbs):
+    """Returns a 405 (Method Not Allowed) response with an Allow
+    header."""
+    resp = make_response('', HTTP.METHOD_NOT_ALLOWED)
+    resp.headers.extend({'Allow': allow_http_verbs})
+    return resp
+
+    # End of method_not_allowed()
+
+
+class Singleton(Resource):
+    """Defines generic API behaviors for Singleton instances.
+
+    Defined: GET, PUT, PATCH, DELETE.
+
+    flask_restful provides default support for HEAD and OPTIONS.
+    It also provides a default 405 (Method Not Allowed) response
+    for any RESTful service requests that are not defined.
+
+    Capabilities Restrictions are class attributes, set from the
+    resource table (these items are read-only within the class).
+    """
+
+    res_cap_insertable = False
+    res_cap_updatable = False
+    res_cap_deletable = False
+    allow_http_verbs = 'GET'
+
+    def get(self, **uri_args):
+        """Defines GET behavior. Called by flask_restful."""
+        # When not empty, uri_args hold values from the URI
+        # TODO: Add privilege check
+        #
+        # Handle GET request
+        inst_key = uri_to_key(request.path)
+        # Ensure object is in the fish object dictionary
+        if inst_key not in fish:
+            return 'Object not found', HTTP.NOT_FOUND
+        # Return the requested object
+        return fishem_respcache.get_response(inst_key)
+        # End of get()
+
+    def put(self, **uri_args):
+        """Defines PUT behavior. Called by flask_restful."""
+        # When not empty, uri_args hold values from the URI
+        # TODO: Add privilege check
+        #
+        # Handle Resource Capability restriction
+        if not self.res_cap_updatable:
+            return method_not_allowed(self.allow_http_verbs)
+        #
+        # Handle PUT request
+        inst_key = uri_to_key(request.path)
+        # Ensure object is in the fish object dictionary
+        if inst_key not in fish:
+            return 'Object not found', HTTP.NOT_FOUND
+        # Handle If-Match; the client's ETag must be the current one
+        resp = fishem_etag.precondition_failed(inst_key)
+        if resp is not None:
+            return resp
+        # Get JSON input, with minimal JSON checking
+        json_input = request.get_json(force = True, silent = True)
+        if json_input == None:
+            return 'Bad JSON input', HTTP.BAD_REQUEST
+        # Ensure @odata.id is in the new object
+        if '@odata.id' not in json_input:
+            return '@odata.id not in input', HTTP.BAD_REQUEST
+        # Ensure @odata.id is not being changed
+        if fish[inst_key]['@odata.id'] != json_input['@odata.id']:
+            return 'Bad @odata.id input', HTTP.BAD_REQUEST
+        # TODO: Add more checking of JSON input
+        # Replace the old object with the new object
+        fish[inst_key] = json_input
+        # Return a copy of the new object
+        return fish[inst_key], HTTP.OK, \
+            {'ETag': fishem_etag.etag(inst_key)}
+        # End of put()
+
+    def patch(self, **uri_args):
+        """Defines PATCH behavior. Called by flask_restful."""
+        # When not empty, uri_args hold values from the URI
+        # TODO: Add privilege check
+        #
+        # Handle Resource Capability restriction
+        if not self.res_cap_updatable:
+            return method_not_allowed(self.allow_http_verbs)
+        #
+        # Handle PATCH request
+        inst_key = uri_to_key(request.path)
+        # Ensure object is in the fish object dictionary
+        if inst_key not in fish:
+            return 'Object not found', HTTP.NOT_FOUND
+        # Handle If-Match; the client's ETag must be the current one
+        resp = fishem_etag.precondition_failed(inst_key)
+        if resp is not None:
+            return resp
+        # Get JSON input, with minimal JSON checking
+        json_input = request.get_json(force = True, silent = True)
+        if json_input == None:
+            return 'Bad JSON input', HTTP.BAD_REQUEST
+        # Ensure @odata.id is not a PATCH target
+        if '@odata.id' in json_input:
+            return 'Attempted to PATCH @odata.id', HTTP.BAD_REQUEST
+        # TODO: Add more checking of JSON input
+        # Update patch_key items in the object
+        for patch_key, patch_value in json_input.items():
+            # TODO: Add Writeability check for each patch_key item
+            fish[inst_key][patch_key] = patch_value
+        fish.touch(inst_key)
+        # Return a copy of the updated object
+        return fish[inst_key], HTTP.OK, \
+            {'ETag': fishem_etag.etag(inst_key)}
+        # End of patch()
+
+    def post(self, **uri_args):
+        """Defines POST behavior. Called by flask_restful."""
+        # When not empty, uri_args hold values from the URI
+        #
+        # Handle POST request
+        # POST is not allowed as a CRUD operation on a singleton
+        # resource (except for Actions, which are handled in a
+        # separate class), but is defined here so a proper Allow
+        # header will be returned if a POST request is received.
+        return method_not_allowed(self.allow_http_verbs)
+        # End of post()
+
+    def delete(self, **uri_args):
+        """Defines DELETE behavior. Called by flask_restful."""
+        # When not empty, uri_args hold values from the URI
+        # TODO: Add privilege check
+        # TODO: Check for (and handle?) @Redfish.OperationApplyTime
+        #
+        # Handle Resource Capability restriction
+        if not self.res_cap_deletable:
+            return method_not_allowed(self.allow_http_verbs)
+        #
+        # Handle DELETE request
+        inst_key = uri_to_key(request.path)
+        # Ensure the object is in the fish object dictionary
+        if inst_key not in fish:
+            return 'Object not found', HTTP.NOT_FOUND
+        # Handle If-Match; the client's ETag must be the current one
+        resp = fishem_etag.precondition_failed(inst_key)
+        if resp is not None:
+            return resp
+        # Find the coll_key (assumes object is a collection member)
+        inst_key_parts = inst_key.split('/')
+        coll_member_id = inst_key_parts[len(inst_key_parts) - 1]
+        coll_key = inst_key + '//'
+        coll_key = coll_key.replace('/' + coll_member_id + '//', '')
+        # Ensure the collection is in the fish object dictionary
+        if coll_key not in fish:
+            return 'Collection not found', HTTP.NOT_FOUND
+        # Ensure the object is in the Collection's Members
+        if not fishem_members.has_member(coll_key, inst_key):
+            return 'Object not in Collection', HTTP.NOT_FOUND
+        # Get a copy of the object
+        deleted_object = fish[inst_key]
+        # Delete the object and its subordinate resources
+        del_keys = fishem_subtree.delete_subtree(inst_key)
+        # Remove link from Collection Members, and re-evaluate
+        # collection Members count
+        fishem_members.remove_member(coll_key, inst_key)
+        # Remove other links to the deleted objects, if enabled
+        fishem_links.strip_dangling(del_keys)
+        # Return a copy of the deleted object
+        return deleted_object, HTTP.OK
+        # End of delete()
+
+
+class SingletonActions(Resource):
+    """Defines generic API behaviors for Singleton Actions.
+
+    Defined: POST.
+
+    flask_restful provides default support for HEAD and OPTIONS.
+    It also provides a 405 (Method Not Allowed) response for any
+    RESTful service requests that are not defined.
+
+    The Actions defined for the resource type are a class attribute,
+    set from the resource table. An Actions class is registered for
+    all Singleton resource types, even when there are no Actions
+    currently defined, to allow new Actions and OEM Actions to be
+    created for experimental purposes.
+    """
+
+    actions = frozenset()
+
+    def post(self, **uri_args):
+        """Defines POST behavior. Called by flask_restful."""
+        # When not empty, uri_args hold values from the URI
+        # TODO: Add privilege check
+        #
+        # Handle POST request
+        action_uri_parts = request.path.split('/Actions/')
+        if len(action_uri_parts) != 2:
+            return 'Bad input', HTTP.BAD_REQUEST
+        inst_key = action_uri_parts[0]
+        action_name = action_uri_parts[1]
+        # Action names do not have trailing slashes
+        if action_name.endswith('/'):
+            action_name += '/'
+            action_name = action_name.replace('//', '')
+        # Ensure object is in the fish object dictionary
+        if inst_key not in fish:
+            return 'Object not found', HTTP.NOT_FOUND
+        # Look up the requested Action; OEM Actions will have
+        # action_name = 'Oem/<Oem>.<ActionName>'
+        if action_name in self.actions:
+            action_string = action_name + ' action for ' + inst_key
+            print(action_string)
+            return action_string, HTTP.OK
+        # Did not find a defined Action or OEM Action
+        return 'Unknown Action for ' + inst_key, HTTP.BAD_REQUEST
+        # End of post()
+
+
+class Collection(Resource):
+    """Defines generic API behaviors for Collections.
+
+    Defined: GET, POST.
+
+    flask_restful provides default support for HEAD and OPTIONS.
+    It also provides a 405 (Method Not Allowed) response for any
+    RESTful service requests that are not defined.
+
+    Capabilities Restrictions are class attributes, set from the
+    resource table (these items are read-only within the class).
+    """
+
+    res_cap_insertable = False
+    res_cap_updatable = False
+    res_cap_deletable = False
+    allow_http_verbs = 'GET'
+
+    def get(self, **uri_args):
+        """Defines GET behavior. Called by flask_restful."""
+        # When not empty, uri_args hold values from the URI
+        # TODO: Add privilege check
+        #
+        # Handle GET request
+        coll_key = uri_to_key(request.path)
+        # Ensure object is in the fish object dictionary
+        if coll_key not in fish:
+            return 'Object not found', HTTP.NOT_FOUND
+        # Return the requested object
+        return fishem_respcache.get_response(coll_key)
+        # End of get()
+
+    def post(self, **uri_args):
+        """Defines POST behavior. Called by flask_restful."""
+        # When not empty, uri_args hold values from the URI
+        # TODO: Add privilege check
+        #
+        # Handle Resource Capability restriction
+        if not self.res_cap_insertable:
+            return method_not_allowed(self.allow_http_verbs)
+        #
+        # Handle POST request
+        coll_key = uri_to_key(request.path)
+        # Get JSON input, with minimal JSON checking
+        json_input = request.get_json(force = True, silent = True)
+        if json_input == None:
+            return 'Bad JSON input', HTTP.BAD_REQUEST
+        # Ensure Id is in the new object
+        if 'Id' not in json_input:
+            return 'Id not in input', HTTP.BAD_REQUEST
+        inst_key = coll_key + '/' + json_input['Id']
+        # Ensure @odata.id (if present) is in sync with Id
+        if '@odata.id' in json_input:
+            # Remove any trailing '/' from @odata.id
+            odata_id = uri_to_key(json_input['@odata.id'])
+            # Check if @odata.id is in sync with Id
+            if odata_id != inst_key:
+                return '@odata.id out of sync with Id', HTTP.BAD_REQUEST
+        else:
+            # set @odata.id to be in sync with Id
+            json_input['@odata.id'] = inst_key
+        # TODO: Add more checking of JSON input
+        # Check if object is already in the fish object dictionary
+        if inst_key in fish:
+            return 'Object already exists', HTTP.BAD_REQUEST
+        # Add new object to fish
+        fish[inst_key] = json_input
+        # Add new link to collection Members, and re-evaluate
+        # collection Members count
+        fishem_members.add_member(coll_key, inst_key)
+        return json_input, HTTP.CREATED, \
+            {'ETag': fishem_etag.etag(inst_key)}
+        # End of post()
+
+
+# Function: get_resource_table()
+
+def get_resource_table():
+    """Returns the resource table, loading it the first time it is
+    needed. The table maps resource type names to their kind
+    ('Singleton' or 'Collection'), Capabilities ('I', 'U', and/or
+    'D' for Insertable, Updatable, and Deletable), Actions (for
+    singletons), and URIs (without trailing slashes)."""
+    global _resource_table
+    if _resource_table is None:
+        try:
+            with open(RESOURCE_TABLE_FILE) as table_file:
+                _resource_table = json.load(table_file)['resources']
+        except Exception as error:
+            print('Failed to read the resource table "',
+                  RESOURCE_TABLE_FILE, '":', sep='')
+            print(error)
+            # Failure exit; cannot continue
+            print('Resource table not loaded, fishem ending')
+            exit(1)
+    return _resource_table
+
+    # End of get_resource_table()
+
+
+# Function: api_module_names()
+
+def api_module_names():
+    """Returns a sorted list of the API module names in 'fishapis'."""
+    return sorted(fn[:-3] for fn in os.listdir(API_DIR)
+                  if fn.endswith('.py') and fn != '__init__.py')
+
+    # End of api_module_names()
+
+
+# Function: api_names()
+
+def api_names():
+    """Returns a sorted list of all API names: the resource types in
+    the resource table, plus any other API modules in 'fishapis'."""
+    return sorted(set(get_resource_table()) | set(api_module_names()))
+
+    # End of api_names()
+
+
+# Function: resource_classes()
+
+def resource_classes(name, entry, api_mod):
+    """Creates the Resource classes for resource type 'name' from its
+    resource table 'entry'. Handler methods defined by classes with
+    the same names in 'api_mod' (if any) override the generic ones.
+    Returns a list of (class, URIs) tuples to register."""
+
+    caps = entry['capabilities']
+    attrs = {'res_cap_insertable': 'I' in caps,
+             'res_cap_updatable': 'U' in caps,
+             'res_cap_deletable': 'D' in caps}
+
+    uris = []
+    for uri in entry['uris']:
+        uris.extend((uri, uri + '/'))
+
+    if entry['kind'] == 'Singleton':
+        # Action URIs are derived from the singleton URIs
+        action_uris = []
+        for uri in entry['uris']:
+            action_uris.extend((
+                uri + '/Actions/<string:UriAction>',
+                uri + '/Actions/Oem/<string:UriOemAction>',
+                uri + '/Actions/<string:UriAction>/',
+                uri + '/Actions/Oem/<string:UriOemAction>/'))
+        classes = [(name, Singleton, attrs, uris),
+                   (name + 'Actions', SingletonActions,
+                    {'actions': frozenset(entry.get('actions', ()))},
+                    action_uris)]
+    else:
+        classes = [(name, Collection, attrs, uris)]
+
+    resources = []
+    for class_name, generic_class, class_attrs, class_uris in classes:
+        bases = (generic_class,)
+        override = getattr(api_mod, class_name, None)
+        if override is not None:
+            # Methods and attributes of the override class win
+            if issubclass(override, generic_class):
+                bases = (override,)
+            else:
+                bases = (override, generic_class)
+            class_attrs = {key: value for key, value in class_attrs.items()
+                           if key not in vars(override)}
+        class_attrs['__doc__'] = 'Defines API behaviors for ' + \
+            class_name + '.'
+        class_attrs['__module__'] = __name__
+        resource = type(class_name, bases, class_attrs)
+        # Generate Allow HTTP Verbs string from Capabilities
+        if generic_class is not SingletonActions and (override is None
+                or 'allow_http_verbs' not in vars(override)):
+            resource.allow_http_verbs = allow_verbs(
+                resource.res_cap_insertable, resource.res_cap_updatable,
+                resource.res_cap_deletable)
+        resources.append((resource, class_uris))
+    return resources
+
+    # End of resource_classes()
+
+
+# Function: activate_api()
+
+def activate_api(name, rest_api):
+    """Activates API 'name', registering its URIs with 'rest_api'.
+    API modules with their own activate() function are activated as
+    they always were; resource types from the resource table are
+    activated using the generic classes in this module."""
+
+    api_mod = None
+    if os.path.exists(os.path.join(API_DIR, name + '.py')):
+        api_mod = importlib.import_module(API_DIR + '.' + name)
+        if hasattr(api_mod, 'activate'):
+            api_mod.activate(rest_api)
+            return
+
+    entry = get_resource_table().get(name)
+    if entry is None:
+        print('API module', name, 'has no activate() function and no',
+              'resource table entry')
+        return
+    for resource, uris in resource_classes(name, entry, api_mod):
+        rest_api.add_resource(resource, *uris)
+    return
+
+    # End of activate_api()
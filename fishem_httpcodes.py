@@ -19,6 +19,7 @@ METHOD_NOT_ALLOWED = 405
 NOT_ACCEPTABLE = 406
 CONFLICT = 409
 GONE = 410
+PRECONDITION_FAILED = 412
 EXPECTATION_FAILED = 417
 UPGRADE_REQUIRED = 426
 INTERNAL_SERVER_ERROR = 500
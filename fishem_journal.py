@@ -0,0 +1,477 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Write-ahead journal of fish changes for fishem.
+
+When the "journalFile" configuration parameter names a journal file,
+every change to the fish made after startup is appended to the
+journal and flushed to disk before the request that made it (PUT,
+PATCH, POST, DELETE, or an Action) gets its response. Changes from
+all requests within "journalSyncMs" milliseconds are written and
+flushed together, so many concurrent requests share one disk flush.
+The objects a request changed are recorded when it ends, and written
+together ahead of one commit record, so recovery never replays part
+of a request (such as a DELETE without the change to its collection).
+Changes made outside of requests (such as mockup reloads) are
+recorded when they are written.
+
+The journal is kept as numbered segment files next to the journal
+file, each with a snapshot of the fish (saved in the background by
+fishem_snapshot) at the point where the segment starts:
+
+    <journalFile>.000007.snapshot   fish at the start of segment 7
+    <journalFile>.000007            changes since then
+
+After "journalSnapshotRecords" changes, a new segment and snapshot
+are started, and the older ones are deleted. A journal record holds
+the whole fish object for a changed key (or notes that it was
+deleted), so records can be replayed over a snapshot that was saved
+while the fish was changing.
+
+If a journal is found at startup (after a crash, SIGKILL, or a
+normal stop), the fish is recovered from the last snapshot and the
+journal records after it, instead of loading the input fish file
+and input mockup; delete the journal files to start from the inputs
+again.
+
+If the journal cannot be written (for example, when the disk is
+full), the requests waiting for it get a 500 (Internal Server Error)
+response and fishem is stopped, as with Control-C, since later
+changes could not be recovered.
+"""
+
+# Standard library module imports
+import json                     # Journal records
+import marshal                  # Object copies
+import os                       # Journal file handling
+import re                       # Journal file names
+import signal                   # Stopping after a journal failure
+import threading                # Journal flusher thread
+import time                     # Flush timing, recovery time
+
+# Third party module imports
+from flask import g             # Keys changed by a request
+from flask import has_request_context   # Keys changed by a request
+from flask import request       # Request method
+from flask import make_response         # Journal failure responses
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_fishfileio        # Fish snapshots
+import fishem_httpcodes as HTTP         # HTTP status codes
+import fishem_members           # Collection membership index
+import fishem_snapshot          # Background fish snapshots
+
+# Constants
+DEFAULT_SYNC_MS = 10
+DEFAULT_SNAPSHOT_RECORDS = 100000
+MUTATING_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+# The running journal, if any
+journal = None
+
+# True once fishem is being stopped after a journal failure
+stopping = False
+
+
+# Function: segment_path()
+
+def segment_path(journal_file, number):
+    """Returns the path of journal segment 'number'."""
+    return '%s.%06d' % (journal_file, number)
+
+    # End of segment_path()
+
+
+# Function: snapshot_path()
+
+def snapshot_path(journal_file, number):
+    """Returns the path of the snapshot for journal segment 'number'."""
+    return segment_path(journal_file, number) + '.snapshot'
+
+    # End of snapshot_path()
+
+
+# Function: journal_files()
+
+def journal_files(journal_file):
+    """Returns two sorted lists, of the numbers of the journal segments
+    and of the snapshots that exist for 'journal_file'."""
+    dir_name = os.path.dirname(journal_file) or '.'
+    file_re = re.compile(re.escape(os.path.basename(journal_file)) +
+                         r'\.(\d{6})(\.snapshot)?')
+    segments = []
+    snapshots = []
+    if not os.path.isdir(dir_name):
+        return segments, snapshots
+    for file_name in os.listdir(dir_name):
+        match = file_re.fullmatch(file_name)
+        if match is None:
+            continue
+        if match.group(2):
+            snapshots.append(int(match.group(1)))
+        else:
+            segments.append(int(match.group(1)))
+    return sorted(segments), sorted(snapshots)
+
+    # End of journal_files()
+
+
+# Function: encode()
+
+def encode(value):
+    """Returns the JSON encoding of fish object 'value'."""
+    try:
+        return json.dumps(value)
+    except RuntimeError:
+        # Changed by another thread while it was encoded; copy it
+        # in one step first
+        return json.dumps(marshal.loads(marshal.dumps(value)))
+
+    # End of encode()
+
+
+# Function: replay()
+
+def replay(segment_file):
+    """Applies the journal records in 'segment_file' to the fish, up
+    to the last complete batch. Returns the number of records
+    applied, and whether the whole segment was applied."""
+    applied = 0
+    batch = []
+    with open(segment_file, 'rb') as journal_in:
+        for line in journal_in:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Partly written batch at the end of the journal
+                return applied, False
+            if 'commit' not in record:
+                batch.append(record)
+                continue
+            for change in batch:
+                if 'v' in change:
+                    fish[change['k']] = change['v']
+                else:
+                    fish.pop(change['k'], None)
+            applied += len(batch)
+            batch = []
+    return applied, not batch
+
+    # End of replay()
+
+
+# Function: recover()
+
+def recover(config):
+    """Restores the fish from the journal named by configuration
+    parameter "journalFile", if there is one. Returns True if the
+    fish was restored."""
+    journal_file = config.get('journalFile')
+    if not journal_file:
+        return False
+    segments, snapshots = journal_files(journal_file)
+    if not snapshots:
+        return False
+
+    # Load the last snapshot, then replay the segments after it
+    start_time = time.perf_counter()
+    number = snapshots[-1]
+    fish.clear()
+    fishem_fishfileio.input(snapshot_path(journal_file, number))
+    applied = 0
+    for seg_number in segments:
+        if seg_number < number:
+            continue
+        seg_applied, complete = replay(segment_path(journal_file,
+                                                    seg_number))
+        applied += seg_applied
+        if not complete:
+            print('Journal segment', segment_path(journal_file, seg_number),
+                  'ends with an incomplete batch, which was ignored')
+            break
+    print('Recovered the fish from journal "', journal_file, '" (',
+          applied, ' changes replayed) in %.3f seconds' %
+          (time.perf_counter() - start_time), sep='')
+    return True
+
+    # End of recover()
+
+
+# Class: Journal
+
+class Journal:
+    """A running journal.
+
+    Journal records for the fish changes since the last flush are
+    collected in batch number 'batch': 'pending' holds the records of
+    the requests that have ended, and 'loose' holds the fish keys
+    changed outside of requests. The flusher thread writes each batch
+    to the current segment, followed by a commit record, and flushes
+    it to disk; 'flushed' is the number of the last batch flushed.
+    Requests wait on 'cond' until their batch is flushed. 'error' is
+    the error that stopped the flusher thread, if any.
+
+    Code that holds the collection membership index lock may change
+    the fish, so 'cond' is never held while taking that lock.
+    """
+
+    def __init__(self, journal_file, number, sync_ms, snapshot_records):
+        self.journal_file = journal_file
+        self.number = number
+        self.sync_time = sync_ms / 1000.0
+        self.snapshot_records = snapshot_records
+        self.pending = []
+        self.loose = {}
+        self.batch = 1
+        self.flushed = 0
+        self.records = 0
+        self.stopping = False
+        self.error = None
+        self.cond = threading.Condition()
+        self.segment = open(segment_path(journal_file, number), 'ab')
+        self.thread = threading.Thread(target=self.run,
+                                       name='fishem journal', daemon=True)
+
+    def fish_changed(self, key):
+        """fish listener; adds 'key' to the keys changed by the
+        current request, or to the pending batch outside of
+        requests."""
+        if has_request_context():
+            g.setdefault('journal_keys', {})[key] = None
+            return
+        with self.cond:
+            if self.error is None:
+                self.loose[key] = None
+                self.cond.notify_all()
+        return
+        # End of fish_changed()
+
+    def record(self, key):
+        """Returns the journal record for the current object for fish
+        'key'. The caller must hold the membership index lock."""
+        fishem_members.sync(key)
+        value = fish.get(key)
+        if value is None:
+            return '{"k": ' + json.dumps(key) + '}\n'
+        return '{"k": ' + json.dumps(key) + ', "v": ' + encode(value) + \
+            '}\n'
+        # End of record()
+
+    def submit(self, keys):
+        """Adds the records for the fish 'keys' changed by a request
+        to the pending batch, as they are now. Returns the number of
+        the batch."""
+        # Records are made and added in one step, so the records of
+        # two requests that change the same key stay in order
+        with fishem_members.lock, self.cond:
+            if self.error is None:
+                self.pending.extend(self.record(key) for key in keys)
+                self.cond.notify_all()
+            return self.batch
+        # End of submit()
+
+    def wait_durable(self, target=None):
+        """Waits until batch 'target' (by default, all fish changes
+        made so far) is on disk. Returns False if it could not be
+        written."""
+        with self.cond:
+            if target is None:
+                target = self.batch if self.pending or self.loose \
+                    else self.batch - 1
+            while self.flushed < target and self.error is None and \
+                    self.thread.is_alive():
+                self.cond.wait(1.0)
+            return self.flushed >= target
+        # End of wait_durable()
+
+    def run(self):
+        """Flusher thread; writes and flushes batches of changes."""
+        try:
+            self.flush_batches()
+        except Exception as error:
+            print('Journal stopped with this error:')
+            print(error)
+            with self.cond:
+                self.error = error
+                self.pending = []
+                self.loose = {}
+                self.cond.notify_all()
+        self.segment.close()
+        return
+        # End of run()
+
+    def flush_batches(self):
+        """Writes and flushes batches of changes until stopped."""
+        while True:
+            with self.cond:
+                while not self.pending and not self.loose and \
+                        not self.stopping:
+                    self.cond.wait()
+                if not self.pending and not self.loose:
+                    break
+            # Let other requests add their changes to this batch
+            if self.sync_time and not self.stopping:
+                time.sleep(self.sync_time)
+            with self.cond:
+                lines = self.pending
+                keys = list(self.loose)
+                self.pending = []
+                self.loose = {}
+                number = self.batch
+                self.batch += 1
+            self.write_batch(lines, keys, number)
+            with self.cond:
+                self.flushed = number
+                self.cond.notify_all()
+            if self.records >= self.snapshot_records:
+                self.snapshot()
+        return
+        # End of flush_batches()
+
+    def write_batch(self, lines, keys, number):
+        """Writes the journal records 'lines' and the current objects
+        for fish 'keys' to the journal, with a commit record, and
+        flushes them to disk."""
+        if keys:
+            # Changes made outside of requests (see fishem_mockupwatch)
+            # hold the membership index lock, so this sees all of
+            # them or none of them
+            with fishem_members.lock:
+                lines = lines + [self.record(key) for key in keys]
+        self.segment.write((''.join(lines) + '{"commit": %d}\n' %
+                            number).encode())
+        self.segment.flush()
+        os.fsync(self.segment.fileno())
+        self.records += len(lines)
+        return
+        # End of write_batch()
+
+    def snapshot(self):
+        """Starts a new journal segment, and saves a snapshot of the
+        fish for it in the background (see fishem_snapshot.py). The
+        older segments and snapshots are deleted once it is saved."""
+        if fishem_snapshot.in_progress():
+            # Try again after the next batch
+            return
+        self.segment.close()
+        self.number += 1
+        self.segment = open(segment_path(self.journal_file, self.number),
+                            'ab')
+        # Changes made after the new segment was started are in it,
+        # so replaying it brings the snapshot up to date; if the
+        # snapshot is not saved, the segments before it are replayed
+        number = self.number
+
+        def saved(ok):
+            if ok:
+                remove_old_files(self.journal_file, number)
+            else:
+                print('Failed to save journal snapshot', number)
+        if fishem_snapshot.save(snapshot_path(self.journal_file, number),
+                                saved) is not None:
+            self.records = 0
+        # Otherwise another snapshot was started since the check
+        # above; keep the record count, to try again after the next
+        # batch
+        return
+        # End of snapshot()
+
+    def stop(self):
+        """Writes any pending changes and stops the flusher thread."""
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        self.thread.join()
+        return
+        # End of stop()
+
+
+# Function: remove_old_files()
+
+def remove_old_files(journal_file, number):
+    """Deletes the journal segments and snapshots before 'number'."""
+    segments, snapshots = journal_files(journal_file)
+    for old_number in segments:
+        if old_number < number:
+            os.remove(segment_path(journal_file, old_number))
+    for old_number in snapshots:
+        if old_number < number:
+            os.remove(snapshot_path(journal_file, old_number))
+    return
+
+    # End of remove_old_files()
+
+
+# Function: start()
+
+def start(config):
+    """Starts journaling fish changes, if configuration parameter
+    "journalFile" names a journal file. The current fish is saved as
+    the snapshot for a new journal segment first."""
+    global journal
+    journal_file = config.get('journalFile')
+    if not journal_file:
+        return
+    segments, snapshots = journal_files(journal_file)
+    number = max(segments + snapshots + [0]) + 1
+    try:
+        fishem_fishfileio.write_fish(snapshot_path(journal_file, number))
+        remove_old_files(journal_file, number)
+        journal = Journal(journal_file, number,
+                          config.get('journalSyncMs', DEFAULT_SYNC_MS),
+                          config.get('journalSnapshotRecords',
+                                     DEFAULT_SNAPSHOT_RECORDS))
+    except Exception as error:
+        print('Failed to start the journal "', journal_file,
+              '" with this error:', sep='')
+        print(error)
+        # Failure exit; cannot continue
+        print('fishem ending')
+        exit(1)
+    fish.listeners.append(journal.fish_changed)
+    journal.thread.start()
+    print('Journaling fish changes in "', journal_file, '"', sep='')
+    return
+
+    # End of start()
+
+
+# Function: after_request()
+
+def after_request(response):
+    """Flask after_request handler; holds the response to a request
+    that may have changed the fish until the changes are on disk. If
+    they could not be written, the response is a 500 (Internal Server
+    Error) and fishem is stopped."""
+    global stopping
+    if journal is None:
+        return response
+    keys = g.pop('journal_keys', None)
+    if keys or request.method in MUTATING_METHODS:
+        target = journal.submit(keys) if keys else None
+        if not journal.wait_durable(target):
+            if not stopping:
+                stopping = True
+                print('Stopping fishem; the journal could not be written')
+                os.kill(os.getpid(), signal.SIGINT)
+            return make_response('Journal could not be written',
+                                 HTTP.INTERNAL_SERVER_ERROR)
+    return response
+
+    # End of after_request()
+
+
+# Function: stop()
+
+def stop():
+    """Writes any pending changes and stops journaling."""
+    global journal
+    if journal is None:
+        return
+    fish.listeners.remove(journal.fish_changed)
+    journal.stop()
+    journal = None
+    return
+
+    # End of stop()
@@ -0,0 +1,249 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Lazy, on-demand activation of API modules for fishem.
+
+Normally fishem activates every API (each resource type in the
+resource table, and each API module in the 'fishapis' directory)
+before it answers a single request. When the "lazyApis"
+configuration parameter is set, fishem instead uses a small
+prebuilt manifest that maps the URIs of each API to the API name.
+An API is activated, and its Resource classes are registered with
+the trie dispatcher, the first time a request arrives for one of
+its URIs.
+
+The manifest is kept in 'fishapis/manifest.json'. It is rebuilt
+automatically when it is missing, or when the fingerprint of the
+resource table and API module files no longer matches the one
+recorded in the manifest (for example, when an API module has been
+added or removed, or its activate() function or initial fish data
+changed). Only the parts of an API module that can change the URIs
+it registers are fingerprinted, so changing the methods of its
+Resource classes does not make the manifest out of date.
+It can also be rebuilt by hand with this command:
+    python fishem_lazyapis.py
+
+Action URIs are not listed in the manifest; a request for an Action
+activates the API for the URI that precedes '/Actions/'.
+
+APIs that set initial data in the fish, and APIs that register no
+URIs while the manifest is built (such as FishDoctor when it is
+disabled), are always activated at startup.
+"""
+
+# Standard library module imports
+import ast                      # API module fingerprint
+import hashlib                  # API module fingerprint
+import importlib                # API module imports
+import json                     # JSON handling
+import os                       # File I/O handling
+import threading                # Activation lock
+
+# Third party module imports
+from flask import request       # Request path
+
+# Local module imports
+import fish_data                # Data shared with all API modules
+import fishem_generic           # Generic resource engine
+import fishem_uritrie           # Trie-based URI dispatcher
+from fishem_version import __version__      # fishem version
+
+# Constants
+MANIFEST_FILE = os.path.join(fishem_generic.API_DIR, 'manifest.json')
+
+# The manifest, once loaded by get_manifest()
+_manifest = None
+
+
+# Class: RecordingApi
+
+class RecordingApi:
+    """Stands in for the flask_restful Api object when building the
+    manifest; it only records the URIs passed to add_resource()."""
+
+    def __init__(self):
+        self.uris = []
+
+    def add_resource(self, resource, *urls, **kwargs):
+        self.uris.extend(urls)
+
+
+# Function: module_outline()
+
+def module_outline(file_path):
+    """Returns the source of API module file 'file_path' without the
+    bodies of its classes; that is, the parts that can change the
+    URIs it registers and the fish data it sets on import."""
+    with open(file_path) as api_file:
+        source = api_file.read()
+    parts = []
+    for node in ast.parse(source, file_path).body:
+        if isinstance(node, ast.ClassDef):
+            parts.append('class ' + node.name)
+        else:
+            parts.append(ast.get_source_segment(source, node))
+    return '\n'.join(parts)
+
+    # End of module_outline()
+
+
+# Function: api_fingerprint()
+
+def api_fingerprint():
+    """Returns a fingerprint of the resource table and of the names
+    and outlines (see module_outline()) of all the API module
+    files."""
+    digest = hashlib.sha1()
+    with open(fishem_generic.RESOURCE_TABLE_FILE, 'rb') as table_file:
+        digest.update(table_file.read())
+    for mod_name in fishem_generic.api_module_names():
+        digest.update(mod_name.encode())
+        digest.update(module_outline(os.path.join(
+            fishem_generic.API_DIR, mod_name + '.py')).encode())
+    return digest.hexdigest()
+
+    # End of api_fingerprint()
+
+
+# Function: build_manifest()
+
+def build_manifest():
+    """Activates all APIs, records the URIs each one registers, and
+    saves the result as the manifest. Returns the manifest."""
+
+    manifest = {'fishemVersion': __version__,
+                'fingerprint': api_fingerprint(),
+                'eager': [],
+                'uris': {}}
+    for api_name in fishem_generic.api_names():
+        # Detect API modules that set initial fish data on import
+        fish_keys = len(fish_data.fish)
+        recorder = RecordingApi()
+        fishem_generic.activate_api(api_name, recorder)
+        # Keep one copy of each URI, without Actions or trailing slashes
+        uris = []
+        for uri in recorder.uris:
+            uri = uri.rstrip('/') or '/'
+            if '/Actions/' not in uri and uri not in uris:
+                uris.append(uri)
+        if len(fish_data.fish) != fish_keys or not uris:
+            manifest['eager'].append(api_name)
+        if uris:
+            manifest['uris'][api_name] = uris
+
+    try:
+        with open(MANIFEST_FILE, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=1)
+    except Exception as error:
+        # Not fatal; the manifest is rebuilt on the next startup
+        print('Failed to save the API module manifest "',
+              MANIFEST_FILE, '":', sep='')
+        print(error)
+    print('Built the API module manifest for', len(manifest['uris']),
+          'APIs')
+    return manifest
+
+    # End of build_manifest()
+
+
+# Function: manifest_is_current()
+
+def manifest_is_current(manifest):
+    """Returns True if 'manifest' matches the API modules on disk."""
+    return (manifest.get('fishemVersion') == __version__ and
+            manifest.get('fingerprint') == api_fingerprint())
+
+    # End of manifest_is_current()
+
+
+# Function: get_manifest()
+
+def get_manifest():
+    """Returns the manifest, loading it (or rebuilding it, if it is
+    missing or out of date) the first time it is needed."""
+    global _manifest
+    if _manifest is not None:
+        return _manifest
+
+    if os.path.exists(MANIFEST_FILE):
+        try:
+            with open(MANIFEST_FILE) as manifest_file:
+                _manifest = json.load(manifest_file)
+            if not manifest_is_current(_manifest):
+                print('API module manifest is out of date')
+                _manifest = None
+        except Exception as error:
+            print('Failed to read the API module manifest "',
+                  MANIFEST_FILE, '":', sep='')
+            print(error)
+            _manifest = None
+    if _manifest is None:
+        _manifest = build_manifest()
+    return _manifest
+
+    # End of get_manifest()
+
+
+# Function: import_eager_modules()
+
+def import_eager_modules():
+    """Imports the API modules for APIs that must be activated at
+    startup. Returns the list of their names."""
+    eager = get_manifest()['eager']
+    for api_name in eager:
+        if api_name in fishem_generic.api_module_names():
+            importlib.import_module(fishem_generic.API_DIR + '.' + api_name)
+    return eager
+
+    # End of import_eager_modules()
+
+
+# Class: LazyDispatcher
+
+class LazyDispatcher(fishem_uritrie.TrieDispatcher):
+    """Trie dispatcher that activates APIs on demand.
+
+    Requests whose URIs are not yet in the trie are looked up in the
+    manifest; the matching API is activated, and the request is then
+    dispatched normally.
+    """
+
+    def __init__(self, rest_api):
+        fishem_uritrie.TrieDispatcher.__init__(self, rest_api)
+        manifest = get_manifest()
+        self.module_trie = fishem_uritrie.UriTrie()
+        for api_name, uris in manifest['uris'].items():
+            for uri in uris:
+                self.module_trie.add(uri, api_name)
+        self.activated = set()
+        self.activate_lock = threading.Lock()
+
+    def activate_api(self, api_name):
+        """Activates API 'api_name' so it registers its URIs, unless
+        this has already been done."""
+        with self.activate_lock:
+            if api_name in self.activated:
+                return
+            fishem_generic.activate_api(api_name, self)
+            self.activated.add(api_name)
+        return
+        # End of activate_api()
+
+    def dispatch(self, uri_path=''):
+        """Flask view function for all URIs. Activates the API for
+        the request path if needed, then dispatches it."""
+        target, uri_vars = self.trie.match(request.path)
+        if target is None:
+            api_path = request.path.split('/Actions/')[0]
+            api_name, uri_vars = self.module_trie.match(api_path)
+            if api_name is not None:
+                self.activate_api(api_name)
+        return fishem_uritrie.TrieDispatcher.dispatch(self, uri_path)
+        # End of dispatch()
+
+
+if __name__ == '__main__':
+    # Rebuild the manifest; FishDoctor only registers its URIs when
+    # it is enabled, so enable it while the manifest is built
+    fish_data.fishem_config = {'fishdoctorEnabled': True}
+    build_manifest()
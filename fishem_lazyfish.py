@@ -0,0 +1,311 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Lazily loaded fish for fishem.
+
+With the "lazyFish" configuration parameter, a JSON Lines input fish
+file (see fishem_fishfileio.py) is not loaded at startup. Instead,
+the file is memory-mapped, and the fish gets one entry for each key
+that holds the position and length of its object in the file. Each
+object is decoded from the file when it is first read, and is kept in
+the fish as a normal object from then on. Startup takes time in
+proportion to the number of keys rather than the size of the fish,
+and memory grows with the objects that are actually used.
+
+The key index (the position and length of each object) is made by
+scanning the file the first time, and is saved next to the file as
+"<fish file>.index", so later startups only read the index. The index
+is made again if the fish file changes. Records that are not laid out
+the way fishem saves them are loaded right away.
+
+Code that reads every object, such as saving the fish as a fish file
+or a mockup, uses fish.peek(), which decodes objects that have not
+been read without keeping them. The subtree index (fishem_subtree.py)
+and the reverse-link index (fishem_links.py) are told about all of
+the keys at once, rather than with a listener call for each key.
+
+The input fish file must not be changed or removed while fishem is
+running.
+"""
+
+# Standard library module imports
+import array                    # Key index positions
+import json                     # Object decoding
+import marshal                  # Key index file
+import mmap                     # Fish file mapping
+import os                       # File I/O handling
+import re                       # Record layout
+import threading                # Object loading lock
+import time                     # Startup timing
+
+# Third party module imports
+# None
+
+# Local module imports
+from fish_data import fish      # Fish data
+from fish_data import FishDict  # Fish dictionary type
+import fishem_fishfileio        # Fish file input
+import fishem_subtree           # Subtree index
+import fishem_links             # Reverse-link index
+
+# Constants
+INDEX_SUFFIX = '.index'
+INDEX_VERSION = 1
+RECORD_RE = re.compile(rb'\{"key": ("(?:[^"\\]|\\.)*"), "value": ')
+MISSING = object()
+
+
+# Class: LazyFishDict
+
+class LazyFishDict(FishDict):
+    """FishDict for a lazily loaded fish. The value for a key whose
+    object has not been read yet is an (offset, length) tuple for the
+    object in the mapped fish file 'fish_map'; tuples are never JSON
+    values, so they cannot be mistaken for fish objects."""
+
+    def decode(self, value):
+        """Returns the object for stored value 'value', decoding it
+        from the fish file if it has not been read yet."""
+        if type(value) is not tuple:
+            return value
+        offset, length = value
+        return json.loads(self.fish_map[offset:offset + length])
+        # End of decode()
+
+    def load(self, key, value):
+        """Returns the object for 'key', whose stored value is 'value',
+        keeping it in the fish if it had not been read yet."""
+        obj = self.decode(value)
+        with self.load_lock:
+            current = dict.get(self, key, MISSING)
+            if current is value:
+                dict.__setitem__(self, key, obj)
+                return obj
+        # Another thread loaded, replaced, or deleted the object
+        return obj if current is MISSING else self.decode(current)
+        # End of load()
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if type(value) is tuple:
+            return self.load(key, value)
+        return value
+
+    def get(self, key, default=None):
+        value = dict.get(self, key, MISSING)
+        if value is MISSING:
+            return default
+        if type(value) is tuple:
+            return self.load(key, value)
+        return value
+
+    def peek(self, key, default=None):
+        value = dict.get(self, key, MISSING)
+        if value is MISSING:
+            return default
+        return self.decode(value)
+
+    def pop(self, key, *default):
+        return self.decode(FishDict.pop(self, key, *default))
+
+    def popitem(self):
+        key, value = FishDict.popitem(self)
+        return key, self.decode(value)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def items(self):
+        return [(key, self.decode(value))
+                for key, value in dict.items(self)]
+
+    def values(self):
+        return [self.decode(value) for value in dict.values(self)]
+
+    def copy(self):
+        return dict(self.items())
+
+
+# Function: make_index()
+
+def make_index(fish_map):
+    """Scans the mapped JSON Lines fish file 'fish_map'. Returns the
+    keys of the records laid out the way fishem saves them, with the
+    offset and length of each value (as arrays), and the offset and
+    length of each other record."""
+    keys = []
+    offsets = array.array('Q')
+    lengths = array.array('Q')
+    records = []
+    size = len(fish_map)
+    pos = 0
+    while pos < size:
+        end = fish_map.find(b'\n', pos)
+        if end < 0:
+            end = size
+        line_end = end
+        while line_end > pos and fish_map[line_end - 1] in b' \t\r':
+            line_end -= 1
+        match = RECORD_RE.match(fish_map, pos, line_end)
+        if match is not None and fish_map[line_end - 1] == ord('}'):
+            key = match.group(1)
+            keys.append(key[1:-1].decode() if b'\\' not in key
+                        else json.loads(key))
+            offsets.append(match.end())
+            lengths.append(line_end - 1 - match.end())
+        elif line_end > pos:
+            records.append((pos, line_end - pos))
+        pos = end + 1
+    return keys, offsets, lengths, records
+
+    # End of make_index()
+
+
+# Function: merge_records()
+
+def merge_records(fish_map, entries, records):
+    """Returns a list of the fish entries (key, stored value) in the
+    mapped fish file 'fish_map', in file order, from 'entries' for the
+    records laid out the way fishem saves them, and from the position
+    and length of each other record in 'records', which are decoded
+    now."""
+    merged = []
+    records = iter(records)
+    record = next(records, None)
+    for key, value in entries:
+        while record is not None and record[0] < value[0]:
+            merged.append(decode_record(fish_map, record))
+            record = next(records, None)
+        merged.append((key, value))
+    while record is not None:
+        merged.append(decode_record(fish_map, record))
+        record = next(records, None)
+    return merged
+
+    # End of merge_records()
+
+
+# Function: decode_record()
+
+def decode_record(fish_map, record):
+    """Returns the fish entry (key, object) for the record at position
+    and length 'record' in the mapped fish file 'fish_map'."""
+    offset, length = record
+    line = fish_map[offset:offset + length]
+    try:
+        return fishem_fishfileio.jsonl_record(line, None)
+    except ValueError:
+        # Find the line number for the error message
+        return fishem_fishfileio.jsonl_record(
+            line, fish_map[:offset].count(b'\n') + 1)
+
+    # End of decode_record()
+
+
+# Function: read_index()
+
+def read_index(ifish_file, fish_map):
+    """Returns the saved key index for 'ifish_file' (as make_index()
+    does), or None if there is none for the current fish file."""
+    stat = os.stat(ifish_file)
+    try:
+        with open(ifish_file + INDEX_SUFFIX, 'rb') as index_file:
+            saved = marshal.load(index_file)
+        version, size, mtime_ns, keys, offsets, lengths, records = saved
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != INDEX_VERSION or size != stat.st_size or \
+            mtime_ns != stat.st_mtime_ns or size != len(fish_map):
+        return None
+    return (keys, array.array('Q', offsets), array.array('Q', lengths),
+            records)
+
+    # End of read_index()
+
+
+# Function: save_index()
+
+def save_index(ifish_file, index):
+    """Saves key index 'index' for 'ifish_file', if it can."""
+    stat = os.stat(ifish_file)
+    keys, offsets, lengths, records = index
+    index_path = ifish_file + INDEX_SUFFIX
+    temp_path = index_path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as index_file:
+            marshal.dump((INDEX_VERSION, stat.st_size, stat.st_mtime_ns,
+                          keys, offsets.tobytes(), lengths.tobytes(),
+                          records), index_file)
+        os.replace(temp_path, index_path)
+    except OSError as error:
+        print('Could not save the fish file index "', index_path,
+              '": ', error, sep='')
+    return
+
+    # End of save_index()
+
+
+# Function: input()
+
+def input(ifish_file):
+    """Maps the JSON Lines fish file 'ifish_file' into the current
+    fish, to be loaded lazily. Other fish files are loaded normally.
+    """
+
+    if not fishem_fishfileio.is_jsonl(ifish_file):
+        print('Only JSON Lines fish files can be loaded lazily')
+        fishem_fishfileio.input(ifish_file)
+        return
+
+    if not os.path.exists(ifish_file):
+        print('Failed to find the fish file "',
+              ifish_file, '"', sep='')
+        # Failure exit; cannot continue
+        print('Input fish file not loaded, fishem ending')
+        exit(1)
+
+    start_time = time.perf_counter()
+    try:
+        with open(ifish_file, 'rb') as fish_file:
+            fish_map = mmap.mmap(fish_file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        index = read_index(ifish_file, fish_map)
+        if index is None:
+            index = make_index(fish_map)
+            save_index(ifish_file, index)
+        keys, offsets, lengths, records = index
+        entries = zip(keys, zip(offsets, lengths))
+        if records:
+            entries = merge_records(fish_map, entries, records)
+            keys = None
+    except Exception as error:
+        print('Failed to read the fish file "', ifish_file,
+              '":', sep='')
+        print(error)
+        # Failure exit; cannot continue
+        print('Input fish file not loaded, fishem ending')
+        exit(1)
+
+    # Switch the fish to lazy loading; both classes keep their state
+    # in the same dictionary, so the fish object itself is unchanged
+    # for every module that has imported it
+    if type(fish) is not LazyFishDict:
+        fish.load_lock = threading.Lock()
+        fish.__class__ = LazyFishDict
+    fish.fish_map = fish_map
+    old_keys = set(fish)
+    dict.update(fish, entries)
+    if keys is None or old_keys:
+        keys = [key for key in fish if key not in old_keys]
+    fishem_subtree.add_keys(sorted(keys))
+    fishem_links.add_keys(keys)
+
+    # Success return
+    print('Mapped the fish file "', ifish_file, '" (', len(keys),
+          ' objects in %.3f seconds)' % (time.perf_counter() - start_time),
+          sep='')
+    return
+
+    # End of input()
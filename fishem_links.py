@@ -0,0 +1,276 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Reverse-link index for the fish.
+
+fish objects refer to each other with hyperlinks (objects with an
+'@odata.id' property) in Links, Related items, and other properties.
+This module keeps an index of those references in both directions,
+updated whenever an object is added to, changed in, or deleted from
+the fish (see FishDict in fish_data.py), so finding the objects that
+link to a resource takes time proportional to the number of links
+found, rather than to the size of the fish.
+
+Collection Members are not kept in this index, since they can be
+very long lists that change with every POST and DELETE; members are
+found through the collection membership index (fishem_members.py)
+instead.
+
+For a lazily loaded fish (see fishem_lazyfish.py), the objects that
+were mapped from the input fish file are indexed all at once, the
+first time the index is used, rather than at startup.
+
+Any module can use these functions:
+    referrers(key)          Keys of the objects that link to 'key'
+    references(key)         Keys that the object for 'key' links to
+    strip_links(keys)       Removes links to deleted objects
+    strip_dangling(keys)    Same, if "stripDanglingLinks" is enabled
+    add_keys(keys)          Notes keys added without being indexed
+
+The FishDoctor API provides the same information to clients with
+the FishDoctor.Links action.
+"""
+
+# Standard library module imports
+import threading                # Index lock
+
+# Third party module imports
+# None
+
+# Local module imports
+import fish_data                # fish data and fishem config
+from fish_data import fish      # Fish data
+import fishem_members           # Collection membership index
+
+# Constants
+MISSING = object()
+
+# Links from each fish key, by target key, with the paths to the
+# links within the object; and the fish keys that link to each key.
+# 'complete' is False if some fish objects have not been indexed.
+links_from = {}
+links_to = {}
+complete = True
+lock = threading.RLock()
+
+
+# Function: link_target()
+
+def link_target(value):
+    """Returns the fish key that the '@odata.id' string 'value'
+    refers to, without any fragment or trailing slash."""
+    target = value.split('#')[0]
+    if target.endswith('/'):
+        target = target.rstrip('/')
+    return target
+
+    # End of link_target()
+
+
+# Function: find_links()
+
+def find_links(source, obj):
+    """Returns a dictionary of the links in fish object 'obj' (for
+    fish key 'source'), by target key, with the path to each link
+    within the object. Members and links back to the object itself
+    are not included."""
+    found = {}
+    stack = [((), obj)]
+    while stack:
+        path, value = stack.pop()
+        if isinstance(value, dict):
+            if path:
+                target = value.get('@odata.id')
+                if isinstance(target, str):
+                    target = link_target(target)
+                    if target != source:
+                        found.setdefault(target, []).append(path)
+            for name, item in value.items():
+                if isinstance(item, (dict, list)) and \
+                        not (name == 'Members' and not path):
+                    stack.append((path + (name,), item))
+        else:
+            for index, item in enumerate(value):
+                if isinstance(item, (dict, list)):
+                    stack.append((path + (index,), item))
+    return found
+
+    # End of find_links()
+
+
+# Function: fish_changed()
+
+def fish_changed(key):
+    """fish listener; keeps the reverse-link index up to date."""
+    found = find_links(key, fish[key]) if key in fish else {}
+    with lock:
+        set_links(key, found)
+    return
+
+    # End of fish_changed()
+
+
+# Function: set_links()
+
+def set_links(key, found):
+    """Replaces the links from 'key' in the index with 'found', as
+    returned by find_links(). The index lock must be held."""
+    for target in links_from.pop(key, ()):
+        sources = links_to[target]
+        del sources[key]
+        if not sources:
+            del links_to[target]
+    if found:
+        links_from[key] = found
+        for target in found:
+            links_to.setdefault(target, {})[key] = None
+    return
+
+    # End of set_links()
+
+
+# Function: add_keys()
+
+def add_keys(keys):
+    """Notes that the objects for 'keys' were added to the fish
+    without calling the fish listeners, by a lazily loaded fish (see
+    fishem_lazyfish.py); they are indexed when the index is next
+    used."""
+    global complete
+    if keys:
+        complete = False
+    return
+
+    # End of add_keys()
+
+
+# Function: index_all()
+
+def index_all():
+    """Indexes every fish object, if some have not been indexed. Uses
+    fish.peek(), so objects that have not been loaded stay that way."""
+    global complete
+    with lock:
+        if complete:
+            return
+        for key in list(fish):
+            obj = fish.peek(key, MISSING)
+            if obj is not MISSING:
+                set_links(key, find_links(key, obj))
+        complete = True
+    return
+
+    # End of index_all()
+
+
+# Function: referrers()
+
+def referrers(key):
+    """Returns a list of the fish keys of the objects that link to
+    'key', including the collection that has it as a member."""
+    index_all()
+    with lock:
+        found = list(links_to.get(key, ()))
+    coll_key = key.rsplit('/', 1)[0]
+    coll_obj = fish.get(coll_key)
+    if isinstance(coll_obj, dict) and \
+            isinstance(coll_obj.get('Members'), list) and \
+            fishem_members.has_member(coll_key, key):
+        found.insert(0, coll_key)
+    return found
+
+    # End of referrers()
+
+
+# Function: references()
+
+def references(key):
+    """Returns a list of the fish keys that the object for 'key'
+    links to, including its collection Members."""
+    index_all()
+    with lock:
+        found = list(links_from.get(key, ()))
+    fishem_members.sync(key)
+    members = fish.get(key, {}).get('Members')
+    if isinstance(members, list):
+        for member in members:
+            if isinstance(member, dict) and \
+                    isinstance(member.get('@odata.id'), str):
+                found.append(link_target(member['@odata.id']))
+    return found
+
+    # End of references()
+
+
+# Function: remove_link()
+
+def remove_link(obj, path):
+    """Removes the link at 'path' within fish object 'obj'. A link in
+    an array is removed from the array (and a matching @odata.count
+    property is updated); any other link property is removed."""
+    parent = obj
+    for name in path[:-1]:
+        parent = parent[name]
+    link = parent[path[-1]]
+    if not isinstance(link, dict) or len(link) != 1:
+        # Not just a link; leave it in place
+        return 0
+    del parent[path[-1]]
+    if isinstance(parent, list) and len(path) > 1:
+        holder = obj
+        for name in path[:-2]:
+            holder = holder[name]
+        count_name = str(path[-2]) + '@odata.count'
+        if isinstance(holder, dict) and count_name in holder:
+            holder[count_name] = len(parent)
+    return 1
+
+    # End of remove_link()
+
+
+# Function: strip_links()
+
+def strip_links(keys):
+    """Removes the links to each key in 'keys' that is no longer in
+    the fish from the objects that refer to it. Takes time in
+    proportion to the number of links removed. Returns the number of
+    links removed."""
+    paths = {}
+    index_all()
+    with lock:
+        for target in keys:
+            if target in fish:
+                continue
+            for source in links_to.get(target, ()):
+                paths.setdefault(source, []).extend(
+                    links_from[source][target])
+    removed = 0
+    for source, source_paths in paths.items():
+        # Remove later array items first, so earlier paths still
+        # lead to their links
+        for path in sorted(source_paths, reverse=True):
+            removed += remove_link(fish[source], path)
+        fish.touch(source)
+    return removed
+
+    # End of strip_links()
+
+
+# Function: strip_dangling()
+
+def strip_dangling(keys):
+    """Calls strip_links() for 'keys' (fish keys just deleted), if
+    the "stripDanglingLinks" configuration parameter is enabled.
+    Returns the number of links removed."""
+    if not fish_data.fishem_config.get('stripDanglingLinks'):
+        return 0
+    return strip_links(keys)
+
+    # End of strip_dangling()
+
+
+# Index any fish objects that are already present, then keep the
+# index up to date
+for fish_key in list(fish):
+    fish_changed(fish_key)
+fish.listeners.append(fish_changed)
@@ -0,0 +1,192 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Collection membership index for fishem.
+
+Collection Members are kept in the fish as a list of links, so
+checking, adding, or removing a member by scanning that list takes
+time proportional to the size of the collection. This module keeps
+an insertion-ordered index of the members of each collection that
+has been changed, so those operations take constant time:
+
+    has_member(coll_key, member_key)
+    add_member(coll_key, member_key)
+    remove_member(coll_key, member_key)
+
+"Members@odata.count" is updated right away. New members are appended
+to the "Members" list right away too, but after a member is removed,
+the list is only rebuilt from the index when the collection is next
+read (see sync()), so a burst of POST and DELETE requests does not
+rebuild it each time. The rebuilt list is exactly what the old list
+would have been.
+
+Code that reads a collection object from the fish directly, rather
+than through a GET request, must call sync() for it (or sync_all())
+first. Code that changes a Members list directly must call sync()
+for the collection before the change, and forget() after it.
+"""
+
+# Standard library module imports
+import threading                # Index lock
+
+# Third party module imports
+# None
+
+# Local module imports
+from fish_data import fish      # Fish data
+
+# Constants
+# None
+
+# Membership index of each indexed collection, and the collections
+# whose Members lists must be rebuilt
+indexes = {}
+dirty = set()
+lock = threading.RLock()
+
+
+# Class: MemberIndex
+
+class MemberIndex:
+    """Insertion-ordered index of the members of one collection.
+
+    'members' maps each member key to its Members list entry. List
+    entries without a usable '@odata.id' (or with a repeated one)
+    are kept under a unique placeholder key, so the rebuilt list
+    still matches the original one.
+    """
+
+    def __init__(self, coll_obj):
+        self.coll_obj = coll_obj
+        self.members = {}
+        for member in coll_obj.get('Members', []):
+            member_key = None
+            if isinstance(member, dict):
+                member_key = member.get('@odata.id')
+            if not isinstance(member_key, str) or \
+                    member_key in self.members:
+                member_key = object()
+            self.members[member_key] = member
+
+
+# Function: _index()
+
+def _index(coll_key):
+    """Returns the index for collection 'coll_key', building it if
+    needed. The caller must hold the lock."""
+    coll_obj = fish[coll_key]
+    index = indexes.get(coll_key)
+    if index is None or index.coll_obj is not coll_obj:
+        # New collection, or the collection object was replaced
+        dirty.discard(coll_key)
+        index = indexes[coll_key] = MemberIndex(coll_obj)
+    return index
+
+    # End of _index()
+
+
+# Function: has_member()
+
+def has_member(coll_key, member_key):
+    """Returns True if 'member_key' is a member of 'coll_key'."""
+    with lock:
+        return member_key in _index(coll_key).members
+
+    # End of has_member()
+
+
+# Function: add_member()
+
+def add_member(coll_key, member_key):
+    """Adds a link to 'member_key' at the end of the Members of
+    collection 'coll_key'."""
+    with lock:
+        index = _index(coll_key)
+        member = {'@odata.id': member_key}
+        index.members[member_key] = member
+        if coll_key not in dirty and \
+                isinstance(index.coll_obj.get('Members'), list):
+            # The Members list is up to date, so appending to it
+            # keeps it up to date
+            index.coll_obj['Members'].append(member)
+        else:
+            dirty.add(coll_key)
+        index.coll_obj['Members@odata.count'] = len(index.members)
+    fish.touch(coll_key)
+    return
+
+    # End of add_member()
+
+
+# Function: remove_member()
+
+def remove_member(coll_key, member_key):
+    """Removes the link to 'member_key' from the Members of
+    collection 'coll_key'."""
+    with lock:
+        index = _index(coll_key)
+        del index.members[member_key]
+        index.coll_obj['Members@odata.count'] = len(index.members)
+        dirty.add(coll_key)
+    fish.touch(coll_key)
+    return
+
+    # End of remove_member()
+
+
+# Function: sync()
+
+def sync(coll_key):
+    """Rebuilds the Members list of collection 'coll_key' if the
+    index has changed since it was last rebuilt."""
+    if coll_key not in dirty:
+        return
+    with lock:
+        if coll_key not in dirty:
+            return
+        dirty.discard(coll_key)
+        index = indexes[coll_key]
+        if fish.get(coll_key) is index.coll_obj:
+            index.coll_obj['Members'] = list(index.members.values())
+    return
+
+    # End of sync()
+
+
+# Function: forget()
+
+def forget(coll_key):
+    """Drops the index of collection 'coll_key', after its Members
+    list was changed directly; it is rebuilt when next needed."""
+    with lock:
+        indexes.pop(coll_key, None)
+        dirty.discard(coll_key)
+    return
+
+    # End of forget()
+
+
+# Function: fish_changed()
+
+def fish_changed(key):
+    """fish listener; drops the index of a deleted collection."""
+    if key in indexes and key not in fish:
+        forget(key)
+    return
+
+    # End of fish_changed()
+
+
+# Function: sync_all()
+
+def sync_all():
+    """Rebuilds the Members lists of all changed collections."""
+    for coll_key in list(dirty):
+        sync(coll_key)
+    return
+
+    # End of sync_all()
+
+
+# Drop the indexes of deleted collections
+fish.listeners.append(fish_changed)
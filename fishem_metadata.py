@@ -0,0 +1,107 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Redfish $metadata document handling for fishem.
+
+The $metadata document is kept in the fish as JSON (converted from
+XML by xmltodict), but clients and output mockups need it as XML.
+Converting it back to XML takes a long time for large documents, so
+this module keeps the XML bytes alongside the fish object: the
+original XML from an input mockup, or else the result of the first
+conversion. A gzip-compressed copy is made the first time a client
+asks for one.
+
+The XML is discarded only when the $metadata object in the fish is
+replaced (or reported as changed with fish.touch()).
+"""
+
+# Standard library module imports
+import gzip                     # Compressed $metadata responses
+
+# Third party module imports
+import xmltodict                # XML handling
+
+# Local module imports
+from fish_data import fish      # Fish data
+
+# Constants
+METADATA_KEY = '/redfish/v1/$metadata'
+
+# Cached XML for the $metadata object: a list holding the fish object
+# it was made from, its XML bytes, and its gzip bytes (or None)
+_cached = None
+
+
+# Function: fish_changed()
+
+def fish_changed(key):
+    """fish listener; discards the XML when $metadata changes."""
+    global _cached
+    if key == METADATA_KEY:
+        _cached = None
+    return
+
+    # End of fish_changed()
+
+
+# Function: remember_xml()
+
+def remember_xml(xml_data):
+    """Keeps 'xml_data' (bytes) as the XML for the $metadata object
+    that is currently in the fish."""
+    global _cached
+    _cached = [fish.get(METADATA_KEY), xml_data, None]
+    return
+
+    # End of remember_xml()
+
+
+# Function: _current()
+
+def _current():
+    """Returns the cache entry for the current $metadata object,
+    converting the object to XML if needed, or None if there is no
+    $metadata object in the fish."""
+    global _cached
+    metadata = fish.get(METADATA_KEY)
+    if metadata is None:
+        return None
+    cached = _cached
+    if cached is None or cached[0] is not metadata:
+        cached = [metadata,
+                  xmltodict.unparse(metadata, pretty=True).encode(),
+                  None]
+        _cached = cached
+    return cached
+
+    # End of _current()
+
+
+# Function: xml_bytes()
+
+def xml_bytes():
+    """Returns the $metadata document as XML bytes, or None if there
+    is no $metadata object in the fish."""
+    cached = _current()
+    return cached[1] if cached is not None else None
+
+    # End of xml_bytes()
+
+
+# Function: gzip_bytes()
+
+def gzip_bytes():
+    """Returns the $metadata document as gzip-compressed XML bytes,
+    or None if there is no $metadata object in the fish."""
+    cached = _current()
+    if cached is None:
+        return None
+    if cached[2] is None:
+        cached[2] = gzip.compress(cached[1], mtime=0)
+    return cached[2]
+
+    # End of gzip_bytes()
+
+
+# Watch for changes to the $metadata object
+fish.listeners.append(fish_changed)
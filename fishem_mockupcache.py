@@ -0,0 +1,233 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Parsed mockup cache for fishem.
+
+Parsing a large input mockup takes most of the startup time, and is
+usually repeated for a mockup that has not changed. When the
+"mockupCache" configuration parameter is set, the fish objects loaded
+from the input mockup are saved in a binary fish file (see
+fishem_fishfileio.py), along with a fingerprint of the mockup files:
+
+    <cache file>                binary fish file of the mockup objects
+    <cache file>.fingerprint    path, size, and mtime of each file
+
+The cache file is named by the "mockupCacheFile" configuration
+parameter, or is put next to the mockup as "<mockup>.cache.fishz".
+
+At the next startup, the mockup directory is walked (without reading
+the files) and compared with the fingerprint. If nothing changed,
+the fish is loaded from the cache file; if some files were changed,
+added, or removed, the fish is loaded from the cache file and only
+those files are parsed, and the cache is saved again. A mockup
+archive is treated as a single file, so if it changed, it is loaded
+again in full.
+
+"mockupCache" chooses how files are compared:
+
+    "off"       no cache (the default)
+    "stat"      a file changed if its size or mtime changed
+    "content"   a file changed if its content changed (each file
+                is read and hashed, but only changed files are parsed)
+"""
+
+# Standard library module imports
+import hashlib                  # File content hashes
+import marshal                  # Fingerprint file
+import os                       # File I/O handling
+import time                     # Load time reporting
+
+# Third party module imports
+# None
+
+# Local module imports
+import fish_data                # fish data and fishem config
+from fish_data import fish      # Fish data
+import fishem_fishfileio        # Cache file input and output
+import fishem_metadata          # $metadata XML handling
+import fishem_mockupio          # Mockup input
+
+# Constants
+FINGERPRINT_SUFFIX = '.fingerprint'
+FINGERPRINT_VERSION = 1
+CACHE_SUFFIX = '.cache.fishz'
+VALIDATIONS = ('off', 'stat', 'content')
+
+
+# Function: cache_path()
+
+def cache_path(imockup_dir):
+    """Returns the path of the cache file for 'imockup_dir'."""
+    cache_file = fish_data.fishem_config.get('mockupCacheFile')
+    if cache_file:
+        return cache_file
+    return os.path.normpath(imockup_dir) + CACHE_SUFFIX
+
+    # End of cache_path()
+
+
+# Function: file_stamp()
+
+def file_stamp(file_path, validation):
+    """Returns the stamp that is compared to see whether the file at
+    'file_path' changed, for 'validation' ("stat" or "content")."""
+    if validation == 'content':
+        with open(file_path, 'rb') as mockup_file:
+            return hashlib.blake2b(mockup_file.read(),
+                                   digest_size=16).digest()
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+    # End of file_stamp()
+
+
+# Function: current_files()
+
+def current_files(imockup_dir, validation):
+    """Returns a list of the mockup files in 'imockup_dir' as they are
+    now, each a list of the file path, fish key, file name, whether it
+    is the $metadata document, and the file stamp. A mockup archive
+    is listed as a single file with no fish key."""
+    if fishem_mockupio.archive_type(imockup_dir):
+        return [[imockup_dir, None, None, False,
+                 file_stamp(imockup_dir, validation)]]
+    return [[file_path, fish_key, file_name, is_metadata,
+             file_stamp(file_path, validation)]
+            for fish_key, file_name, is_metadata, file_path
+            in fishem_mockupio.mockup_files(imockup_dir)]
+
+    # End of current_files()
+
+
+# Function: read_fingerprint()
+
+def read_fingerprint(cache_file, imockup_dir, validation):
+    """Returns the file list (as current_files() does), the fish keys,
+    and the $metadata XML (or None) saved with 'cache_file' for
+    'imockup_dir' and 'validation', or None if there are none, or the
+    cache file does not match them."""
+    try:
+        stat = os.stat(cache_file)
+        with open(cache_file + FINGERPRINT_SUFFIX, 'rb') as print_file:
+            saved = marshal.load(print_file)
+        version, mockup, saved_validation, size, mtime_ns, files, keys, \
+            metadata_xml = saved
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if version != FINGERPRINT_VERSION or \
+            mockup != os.path.abspath(imockup_dir) or \
+            saved_validation != validation or \
+            size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    return files, keys, metadata_xml
+
+    # End of read_fingerprint()
+
+
+# Function: save()
+
+def save(cache_file, imockup_dir, validation, files, keys):
+    """Saves the fish objects for 'keys', loaded from mockup 'files'
+    (as returned by current_files()), in 'cache_file', with the
+    fingerprint of the files and the original $metadata XML. Prints a
+    note if the cache cannot be saved."""
+    metadata_xml = None
+    if fishem_metadata.METADATA_KEY in keys:
+        metadata_xml = fishem_metadata.xml_bytes()
+    try:
+        fishem_fishfileio.write_fish(cache_file, keys)
+        stat = os.stat(cache_file)
+        temp_file = cache_file + FINGERPRINT_SUFFIX + '.tmp'
+        with open(temp_file, 'wb') as print_file:
+            marshal.dump((FINGERPRINT_VERSION, os.path.abspath(imockup_dir),
+                          validation, stat.st_size, stat.st_mtime_ns,
+                          files, list(keys), metadata_xml), print_file)
+        os.replace(temp_file, cache_file + FINGERPRINT_SUFFIX)
+    except Exception as error:
+        print('Could not save the mockup cache "', cache_file, '": ',
+              error, sep='')
+    return
+
+    # End of save()
+
+
+# Function: input()
+
+def input(imockup_dir):
+    """Load the mockup from 'imockup_dir' into the current fish, from
+    the mockup cache if it can, as set by the "mockupCache"
+    configuration parameter."""
+
+    validation = fish_data.fishem_config.get('mockupCache', 'off')
+    if validation not in VALIDATIONS[1:] or \
+            not os.path.exists(imockup_dir):
+        fishem_mockupio.input(imockup_dir)
+        return
+
+    start_time = time.perf_counter()
+    cache_file = cache_path(imockup_dir)
+    is_archive = fishem_mockupio.archive_type(imockup_dir) is not None
+    files = current_files(imockup_dir, validation)
+    saved = read_fingerprint(cache_file, imockup_dir, validation)
+    if saved is not None and is_archive and saved[0] != files:
+        # A changed mockup archive is loaded again in full
+        saved = None
+
+    # Load the fish from the cache file, if it matches the mockup
+    if saved is not None:
+        saved_files, saved_keys, metadata_xml = saved
+        try:
+            fishem_fishfileio.read_fish(cache_file)
+            if metadata_xml is not None:
+                fishem_metadata.remember_xml(metadata_xml)
+        except Exception as error:
+            print('Failed to read the mockup cache "', cache_file,
+                  '":', sep='')
+            print(error)
+            for key in saved_keys:
+                fish.pop(key, None)
+            saved = None
+    if saved is None:
+        keys = fishem_mockupio.input(imockup_dir)
+        save(cache_file, imockup_dir, validation, files, keys)
+        return
+
+    # Parse the files that changed, and delete the objects for files
+    # that were removed
+    saved_stamps = {file_info[0]: file_info[4] for file_info in saved_files}
+    loaded_keys = {key: None for key in saved_keys}
+    changed = removed = 0
+    for file_path, fish_key, file_name, is_metadata, stamp in files:
+        if is_archive:
+            break
+        loaded_keys[fish_key] = None
+        if saved_stamps.pop(file_path, None) != stamp:
+            fishem_mockupio.store_mockup_file(
+                fish_key, file_name, is_metadata,
+                fishem_mockupio.read_mockup_files([file_path])[0])
+            changed += 1
+    if not is_archive:
+        current_keys = {file_info[1] for file_info in files}
+        for key in saved_keys:
+            if key not in current_keys:
+                fish.pop(key, None)
+                del loaded_keys[key]
+                removed += 1
+
+    # Track changes against the mockup, as for a mockup load
+    if is_archive:
+        fishem_mockupio.track_changes(None, set())
+    else:
+        fishem_mockupio.track_changes(imockup_dir,
+                                      set(fish) - loaded_keys.keys())
+    if changed or removed:
+        save(cache_file, imockup_dir, validation, files, loaded_keys)
+
+    # Success return
+    print('Loaded the mockup in "', imockup_dir, '" from the cache "',
+          cache_file, '" (', changed, ' files changed, ', removed,
+          ' removed, in %.3f seconds)' % (time.perf_counter() - start_time),
+          sep='')
+    return
+
+    # End of input()
@@ -2,34 +2,136 @@
 
 """
 Handle mockup I/O for fishem.
+
+A mockup is either a directory tree, or an archive file (.tar,
+.tar.gz, .tgz, .tar.bz2, .tar.xz, or .zip) holding the same tree.
+Archive mockups are read and written as a stream, without unpacking
+them to disk or building the directory tree.
 """
 
 # Standard library module imports
+import collections              # Mockup files being read
+import concurrent.futures       # Mockup loader threads
+import io                       # Archive member contents
 import json                     # JSON handling
 import os                       # File I/O handling
+import posixpath                # Archive member paths
+import tarfile                  # Archive mockups
+import threading                # Change tracking lock
+import time                     # Mockup load time reporting
+import zipfile                  # Archive mockups
 
 # Third party module imports
 import xmltodict                # XML handling for mockups
 
 # Local module imports
+import fish_data                # fish data and fishem config
 from fish_data import fish      # Fish data
+import fishem_members           # Collection membership index
+import fishem_metadata          # $metadata XML handling
 
 # Constants
 FISH_KEY_BASE = '/redfish/v1'
+DEFAULT_LOAD_WORKERS = 8
+LOAD_BATCH_SIZE = 64            # Mockup files read by a thread task
+LOAD_BATCHES_PER_WORKER = 2     # Batches read ahead for each thread
+TAR_EXTENSIONS = {'.tar': 'w', '.tar.gz': 'w:gz', '.tgz': 'w:gz',
+                  '.tar.bz2': 'w:bz2', '.tar.xz': 'w:xz'}
+ZIP_EXTENSIONS = ('.zip',)
 
+# Mockup directory (if any) that matches the fish apart from the fish
+# keys in 'changed', which were changed since it was loaded or saved
+tracked_dir = None
+changed = set()
+changed_lock = threading.Lock()
 
-# Function: input()
 
-def input(imockup_dir):
-    """Load the mockup from 'imockup_dir' into the current fish.
-    """
+# Function: read_mockup_files()
 
-    # Ensure the input mockup directory exists
-    if not os.path.exists(imockup_dir):
-        print('Input mockup not found', imockup_dir)
+def read_mockup_files(file_paths):
+    """Returns a list with the contents (bytes) of each mockup file in
+    'file_paths', or the exception raised while reading it. Runs in
+    the mockup loader threads."""
+    file_data = []
+    for file_path in file_paths:
+        try:
+            with open(file_path, 'rb') as mockup_file:
+                file_data.append(mockup_file.read())
+        except Exception as error:
+            file_data.append(error)
+    return file_data
+
+    # End of read_mockup_files()
+
+
+# Function: decode_mockup_file()
+
+def decode_mockup_file(is_metadata, file_data):
+    """Returns the fish object from the contents 'file_data' of a
+    mockup file (as returned by read_mockup_files()); raises an
+    exception if it cannot be read or decoded."""
+    if isinstance(file_data, Exception):
+        raise file_data
+    if is_metadata:
+        # Convert XML to JSON before storing it in fish
+        return xmltodict.parse(file_data)
+    return json.loads(file_data)
+
+    # End of decode_mockup_file()
+
+
+# Function: parse_mockup_file()
+
+def parse_mockup_file(fish_key, file_name, is_metadata, file_data):
+    """Returns the fish object for 'fish_key' from the contents
+    'file_data' of mockup file 'file_name' (as returned by
+    read_mockup_files())."""
+
+    # Get data from the individual mockup file
+    try:
+        json_data = decode_mockup_file(is_metadata, file_data)
+    except Exception as error:
+        if is_metadata:
+            print('Failed to read input mockup XML data file', \
+                file_name, 'for', fish_key, 'with this error:')
+        else:
+            print('Failed to read input mockup JSON data file', \
+                file_name, 'for', fish_key, 'with this error:')
+        print(error)
         # Failure exit; cannot continue
         print('Input mockup not loaded, fishem ending')
         exit(1)
+    return json_data
+
+    # End of parse_mockup_file()
+
+
+# Function: store_mockup_file()
+
+def store_mockup_file(fish_key, file_name, is_metadata, file_data):
+    """Stores the contents 'file_data' of mockup file 'file_name' (as
+    returned by read_mockup_files()) in the fish at 'fish_key'."""
+
+    # Store the JSON data for a fish object in fish
+    fish[fish_key] = parse_mockup_file(fish_key, file_name, is_metadata,
+                                       file_data)
+
+    # Keep the original $metadata XML, to avoid converting the JSON
+    # back to XML for requests and output mockups
+    if is_metadata:
+        fishem_metadata.remember_xml(file_data)
+    return
+
+    # End of store_mockup_file()
+
+
+# Function: mockup_files()
+
+def mockup_files(imockup_dir):
+    """Yields the fish key, file name, whether it is the $metadata
+    document, and file path of each mockup file (index.json or
+    index.xml) in mockup directory 'imockup_dir', in directory walk
+    order."""
 
     # imockup_dir_norm is imockup_dir with normalized slashes
     imockup_dir_norm = imockup_dir.replace('\\', '/')
@@ -51,48 +153,376 @@ def input(imockup_dir):
                 rel_path = dirpath.replace('\\', '/')
                 rel_path = rel_path.replace(imockup_dir_norm + '/', '')
                 fish_key = FISH_KEY_BASE + '/' + rel_path
+            is_metadata = file_name == 'index.xml' and \
+                rel_path == '$metadata'
+            yield fish_key, file_name, is_metadata, file_path
+    return
 
-            # Get data from individual mockup files
-            if file_name == 'index.xml' and rel_path == '$metadata':
-                # Get the $metadata document (index.xml) file data
-                # Convert XML to JSON before storing it in fish
-                try:
-                    json_data = xmltodict.parse(
-                        open(file_path, 'r').read())
-                except Exception as error:
-                    print('Failed to read input mockup XML data file', \
-                        file_name, 'for', fish_key, 'with this error:')
-                    print(error)
-                    # Failure exit; cannot continue
-                    print('Input mockup not loaded, fishem ending')
-                    exit(1)
-            else:
-                # Get the JSON data for a fish object (index.json)
-                try:
-                    json_data = json.load(open(file_path))
-                except Exception as error:
-                    print('Failed to read input mockup JSON data file', \
-                        file_name, 'for', fish_key, 'with this error:')
-                    print(error)
-                    # Failure exit; cannot continue
-                    print('Input mockup not loaded, fishem ending')
-                    exit(1)
-
-            # Store the JSON data for a fish object in fish
-            fish[fish_key] = json_data
+    # End of mockup_files()
+
+
+# Function: input()
+
+def input(imockup_dir):
+    """Load the mockup from 'imockup_dir' into the current fish.
+
+    Mockup files are read in batches by a pool of threads (see the
+    "mockupLoadWorkers" configuration parameter) while the mockup
+    directories are still being walked, and are parsed and stored in
+    the fish in the order they are found, so the fish is the same as
+    when the files are read one at a time. Returns a list of the fish
+    keys loaded, in the order they were loaded.
+    """
+
+    # Ensure the input mockup directory exists
+    if not os.path.exists(imockup_dir):
+        print('Input mockup not found', imockup_dir)
+        # Failure exit; cannot continue
+        print('Input mockup not loaded, fishem ending')
+        exit(1)
+
+    # Archive mockups are read by input_archive()
+    if archive_type(imockup_dir):
+        return input_archive(imockup_dir)
+
+    # Set up the loader threads; batches of files being read are
+    # kept in 'pending' (in the order they were found) until stored
+    workers = int(fish_data.fishem_config.get('mockupLoadWorkers',
+                                              DEFAULT_LOAD_WORKERS))
+    pool = None
+    if workers > 1:
+        pool = concurrent.futures.ThreadPoolExecutor(workers)
+    pending = collections.deque()
+    batch = []
+    start_time = time.perf_counter()
+    file_count = 0
+    loaded_keys = {}
+
+    def read_batch():
+        """Starts reading the files in 'batch' in a loader thread."""
+        files, file_paths = zip(*batch)
+        pending.append((files, pool.submit(read_mockup_files,
+                                           file_paths)))
+        batch.clear()
+        # End of read_batch()
+
+    def store_batch():
+        """Stores the oldest batch of files read by a loader thread."""
+        files, future = pending.popleft()
+        for file_info, file_data in zip(files, future.result()):
+            store_mockup_file(*file_info, file_data)
+        # End of store_batch()
+
+    for fish_key, file_name, is_metadata, file_path in \
+            mockup_files(imockup_dir):
+        file_count += 1
+        loaded_keys[fish_key] = None
+
+        # Read and store the file now, or add it to the next batch for
+        # the loader threads
+        if pool is None:
+            store_mockup_file(fish_key, file_name, is_metadata,
+                              read_mockup_files([file_path])[0])
+            continue
+        batch.append(((fish_key, file_name, is_metadata), file_path))
+        if len(batch) == LOAD_BATCH_SIZE:
+            read_batch()
+            # Store the oldest batch, if enough are being read
+            if len(pending) > workers * LOAD_BATCHES_PER_WORKER:
+                store_batch()
+
+    # Store the files still being read
+    if batch:
+        read_batch()
+    while pending:
+        store_batch()
+    if pool is not None:
+        pool.shutdown()
+
+    # The mockup now matches the fish, apart from fish objects that
+    # did not come from it
+    track_changes(imockup_dir, set(fish) - loaded_keys.keys())
 
     # Success return
-    print('Loaded the mockup in "', imockup_dir, '"', sep='')
-    return
+    load_time = time.perf_counter() - start_time
+    print('Loaded the mockup in "', imockup_dir, '"', sep='', end='')
+    print(' (%d files in %.3f seconds, %.0f files/second)' %
+          (file_count, load_time, file_count / max(load_time, 1e-9)))
+    return list(loaded_keys)
 
     # End of input()
 
 
+# Function: archive_type()
+
+def archive_type(mockup_path):
+    """Returns 'tar' or 'zip' if 'mockup_path' is named as a mockup
+    archive file of that type, or None if it is not."""
+    name = mockup_path.lower()
+    if name.endswith(tuple(TAR_EXTENSIONS)):
+        return 'tar'
+    if name.endswith(ZIP_EXTENSIONS):
+        return 'zip'
+    return None
+
+    # End of archive_type()
+
+
+# Function: archive_files()
+
+def archive_files(archive_path):
+    """Yields the member path and contents (bytes) of each mockup file
+    (index.json or index.xml) in mockup archive 'archive_path', in
+    archive order. Tar archives, compressed or not, are read from
+    start to end in one pass."""
+    if archive_type(archive_path) == 'zip':
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and posixpath.basename(
+                        info.filename) in ('index.json', 'index.xml'):
+                    yield info.filename, archive.read(info)
+        return
+    with tarfile.open(archive_path, 'r:*') as archive:
+        for info in archive:
+            if info.isfile() and posixpath.basename(info.name) in \
+                    ('index.json', 'index.xml'):
+                yield info.name, archive.extractfile(info).read()
+            # Do not keep the headers of members already read
+            archive.members = []
+    return
+
+    # End of archive_files()
+
+
+# Function: input_archive()
+
+def input_archive(archive_path):
+    """Loads the mockup in archive file 'archive_path' into the current
+    fish. Each mockup file is parsed as it is read from the archive.
+    The directory of the index.json file nearest the top of the
+    archive is the service root ("/redfish/v1"); files outside it are
+    ignored. Returns a list of the fish keys loaded, in the order they
+    were loaded."""
+    start_time = time.perf_counter()
+    files = []
+    try:
+        for member_path, file_data in archive_files(archive_path):
+            dir_path, file_name = posixpath.split(
+                posixpath.normpath(member_path.lstrip('/')))
+            if dir_path == '.':
+                dir_path = ''
+            is_metadata = file_name == 'index.xml' and \
+                posixpath.basename(dir_path) == '$metadata'
+            files.append((dir_path, file_name, is_metadata,
+                          parse_mockup_file(member_path, file_name,
+                                            is_metadata, file_data),
+                          file_data if is_metadata else None))
+    except (OSError, tarfile.TarError, zipfile.BadZipFile) as error:
+        print('Failed to read input mockup archive "', archive_path,
+              '":', sep='')
+        print(error)
+        # Failure exit; cannot continue
+        print('Input mockup not loaded, fishem ending')
+        exit(1)
+
+    # Store the files below the service root in the fish
+    root_dirs = [dir_path.split('/') if dir_path else []
+                 for dir_path, file_name, _, _, _ in files
+                 if file_name == 'index.json']
+    root_dir = '/'.join(min(root_dirs, key=len)) if root_dirs else ''
+    loaded_keys = {}
+    for dir_path, file_name, is_metadata, json_data, xml_data in files:
+        if dir_path == root_dir:
+            rel_path = ''
+        elif root_dir == '' or dir_path.startswith(root_dir + '/'):
+            rel_path = dir_path[len(root_dir):].lstrip('/')
+        else:
+            continue
+        fish_key = FISH_KEY_BASE + ('/' + rel_path if rel_path else '')
+        fish[fish_key] = json_data
+        if is_metadata and rel_path == '$metadata':
+            fishem_metadata.remember_xml(xml_data)
+        loaded_keys[fish_key] = None
+
+    # An archive is never saved incrementally, so changes are not
+    # tracked against it
+    track_changes(None, set())
+
+    # Success return
+    load_time = time.perf_counter() - start_time
+    print('Loaded the mockup archive "', archive_path, '"', sep='', end='')
+    print(' (%d files in %.3f seconds, %.0f files/second)' %
+          (len(loaded_keys), load_time,
+           len(loaded_keys) / max(load_time, 1e-9)))
+    return list(loaded_keys)
+
+    # End of input_archive()
+
+
+# Function: track_changes()
+
+def track_changes(mockup_dir, changed_keys):
+    """Starts tracking changes to the fish against 'mockup_dir', a
+    mockup directory that now matches the fish except for the fish
+    objects in 'changed_keys'; or stops tracking changes, if
+    'mockup_dir' is None."""
+    global tracked_dir, changed
+    with changed_lock:
+        tracked_dir = os.path.abspath(mockup_dir) if mockup_dir else None
+        changed = set(changed_keys)
+    return
+
+    # End of track_changes()
+
+
+# Function: matches_mockup()
+
+def matches_mockup(mockup_dir, keys):
+    """Records that the fish objects for 'keys' now match mockup
+    directory 'mockup_dir', if changes are tracked against it."""
+    with changed_lock:
+        if tracked_dir == os.path.abspath(mockup_dir):
+            changed.difference_update(keys)
+    return
+
+    # End of matches_mockup()
+
+
+# Function: fish_changed()
+
+def fish_changed(key):
+    """fish listener; records fish keys changed since the tracked
+    mockup directory was loaded or saved."""
+    if tracked_dir is not None:
+        with changed_lock:
+            changed.add(key)
+    return
+
+    # End of fish_changed()
+
+
+# Function: mockup_dir_path()
+
+def mockup_dir_path(omockup_dir, fish_key):
+    """Returns the path of the directory for 'fish_key' in the output
+    mockup 'omockup_dir'."""
+    dir_path = fish_key.replace(FISH_KEY_BASE, omockup_dir)
+    return os.path.normpath(dir_path)
+
+    # End of mockup_dir_path()
+
+
+# Function: mockup_file_data()
+
+def mockup_file_data(fish_key):
+    """Returns the mockup file name, contents (bytes), and kind ('XML'
+    or 'JSON') for the fish object for 'fish_key'. The Redfish
+    $metadata document is saved as 'index.xml', and other fish
+    objects as 'index.json'."""
+    if fish_key == '/redfish/v1/$metadata':
+        return 'index.xml', fishem_metadata.xml_bytes(), 'XML'
+    return ('index.json',
+            json.dumps(fish.peek(fish_key), indent=4).encode(), 'JSON')
+
+    # End of mockup_file_data()
+
+
+# Function: write_mockup_file()
+
+def write_mockup_file(omockup_dir, fish_key):
+    """Saves the fish object for 'fish_key' in the output mockup
+    'omockup_dir'. Each file is written to a temporary file that is
+    then renamed, so a mockup file is never left partly written."""
+    dir_path = mockup_dir_path(omockup_dir, fish_key)
+    file_name, file_data, kind = mockup_file_data(fish_key)
+    file_path = os.path.join(dir_path, file_name)
+    try:
+        os.makedirs(dir_path, exist_ok=True)
+        temp_path = file_path + '.tmp'
+        with open(temp_path, 'wb') as mockup_file:
+            mockup_file.write(file_data)
+        os.replace(temp_path, file_path)
+    except Exception as error:
+        print('Failed to save output mockup', kind, 'data in "',
+              file_path, '":', sep='')
+        print(error)
+        # Failure exit; cannot continue
+        print('Output mockup not saved, fishem ending')
+        exit(1)
+    return
+
+    # End of write_mockup_file()
+
+
+# Function: remove_mockup_file()
+
+def remove_mockup_file(omockup_dir, fish_key):
+    """Removes the file for deleted fish object 'fish_key' from the
+    output mockup 'omockup_dir', and its directory if that is then
+    empty."""
+    dir_path = mockup_dir_path(omockup_dir, fish_key)
+    try:
+        for file_name in ['index.json', 'index.xml']:
+            file_path = os.path.join(dir_path, file_name)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        if os.path.isdir(dir_path) and not os.listdir(dir_path):
+            os.rmdir(dir_path)
+    except Exception as error:
+        print('Failed to remove output mockup data in "',
+              dir_path, '":', sep='')
+        print(error)
+        # Failure exit; cannot continue
+        print('Output mockup not saved, fishem ending')
+        exit(1)
+    return
+
+    # End of remove_mockup_file()
+
+
 # Function: output()
 
 def output(omockup_dir):
     """Save the current fish as a mockup in 'omockup_dir'.
+
+    If 'omockup_dir' is the mockup that was last loaded or saved,
+    only the fish objects that have changed since then are saved, and
+    only the deleted ones are removed. Otherwise the whole output
+    mockup is written.
     """
+    global changed
+
+    # Bring collection Members up to date
+    fishem_members.sync_all()
+
+    # Archive mockups are written by output_archive()
+    if archive_type(omockup_dir):
+        output_archive(omockup_dir)
+        return
+
+    # Save only the changes, if the output mockup matches the fish
+    # apart from the tracked changes; any changes made while saving
+    # are tracked for the next save
+    with changed_lock:
+        incremental = tracked_dir == os.path.abspath(omockup_dir)
+        changed_keys = changed
+    track_changes(omockup_dir, set())
+    if incremental:
+        saved = removed = 0
+        # Remove deleted objects below their parents first
+        for fish_key in sorted(changed_keys, reverse=True):
+            # The Redfish version object is not included in mockups
+            if fish_key == '/redfish':
+                continue
+            if fish_key in fish:
+                write_mockup_file(omockup_dir, fish_key)
+                saved += 1
+            else:
+                remove_mockup_file(omockup_dir, fish_key)
+                removed += 1
+        print('Saved the fish changes in the mockup in "', omockup_dir,
+              '" (', saved, ' saved, ', removed, ' removed)', sep='')
+        return
 
     # Delete the old output mockup directory hierarchy if it exists;
     # must build a new output mockup directory hierarchy every time
@@ -116,61 +546,13 @@ def output(omockup_dir):
                 print('Output mockup not saved, fishem ending')
                 exit(1)
 
-    # Create a new directory hierarchy for the output mockup
-    for fish_key in fish:
-        # The Redfish version object is not included in mockups
-        if fish_key == '/redfish':
-            continue
-        dir_path = fish_key.replace(FISH_KEY_BASE, omockup_dir)
-        dir_path = os.path.normpath(dir_path)
-        if not os.path.isdir(dir_path):
-            try:
-                os.makedirs(dir_path)
-            except Exception as error:
-                print('Failed to create output mockup directory "',
-                    dir_path, '":', sep='')
-                print(error)
-                # Failure exit; cannot continue
-                print('Output mockup not saved, fishem ending')
-                exit(1)
-
     # Save the fish objects in the output mockup directories
-    for fish_key in fish:
-        dir_path = fish_key.replace(FISH_KEY_BASE, omockup_dir)
-        dir_path = os.path.normpath(dir_path)
-
+    for fish_key in list(fish):
         # The Redfish Version object is not included in mockups
         if fish_key == '/redfish':
             continue
-
-        # Save the Redfish $metadata document as 'index.xml'
-        if fish_key == '/redfish/v1/$metadata':
-            file_path = os.path.join(dir_path, 'index.xml')
-            xml_data = xmltodict.unparse(fish[fish_key],
-                pretty=True)
-            try:
-                open(file_path, 'w').write(xml_data)
-            except Exception as error:
-                print('Failed to save output mockup XML data in "',
-                    file_path, '":', sep='')
-                print(error)
-                # Failure exit; cannot continue
-                print('Output mockup not saved, fishem ending')
-                exit(1)
-            continue
-
-        # Save the fish object as 'index.json'
-        file_path = os.path.join(dir_path, 'index.json')
-        json_data = json.dumps(fish[fish_key], indent=4)
-        try:
-            open(file_path, 'w').write(json_data)
-        except Exception as error:
-            print('Failed to save output mockup JSON data in "',
-                    file_path, '":', sep='')
-            print(error)
-            # Failure exit; cannot continue
-            print('Output mockup not saved, fishem ending')
-            exit(1)
+        if fish_key in fish:
+            write_mockup_file(omockup_dir, fish_key)
 
     # Success return
     print('Saved the current fish as a mockup in "',
@@ -178,3 +560,60 @@ def output(omockup_dir):
     return
 
     # End of output()
+
+
+# Function: output_archive()
+
+def output_archive(archive_path):
+    """Save the current fish as a mockup in archive file
+    'archive_path', whose type and compression are chosen by its file
+    name extension. The archive is streamed to a temporary file that
+    is then renamed, so it is never left partly written."""
+    temp_path = archive_path + '.tmp'
+    mtime = time.time()
+    file_count = 0
+    try:
+        if archive_type(archive_path) == 'zip':
+            archive = zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED)
+        else:
+            mode = next(mode for extension, mode in TAR_EXTENSIONS.items()
+                        if archive_path.lower().endswith(extension))
+            archive = tarfile.open(temp_path, mode)
+        with archive:
+            for fish_key in list(fish):
+                # The Redfish version object is not included in mockups
+                if not (fish_key == FISH_KEY_BASE or
+                        fish_key.startswith(FISH_KEY_BASE + '/')):
+                    continue
+                if fish_key not in fish:
+                    continue
+                file_name, file_data, kind = mockup_file_data(fish_key)
+                member_path = posixpath.join(
+                    fish_key[len(FISH_KEY_BASE) + 1:], file_name)
+                if isinstance(archive, zipfile.ZipFile):
+                    archive.writestr(member_path, file_data)
+                else:
+                    info = tarfile.TarInfo(member_path)
+                    info.size = len(file_data)
+                    info.mtime = int(mtime)
+                    archive.addfile(info, io.BytesIO(file_data))
+                file_count += 1
+        os.replace(temp_path, archive_path)
+    except Exception as error:
+        print('Failed to save output mockup archive "', archive_path,
+              '":', sep='')
+        print(error)
+        # Failure exit; cannot continue
+        print('Output mockup not saved, fishem ending')
+        exit(1)
+
+    # Success return
+    print('Saved the current fish as a mockup archive in "', archive_path,
+          '" (', file_count, ' files)', sep='')
+    return
+
+    # End of output_archive()
+
+
+# Track changes to the fish against the last mockup loaded or saved
+fish.listeners.append(fish_changed)
@@ -0,0 +1,176 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Input mockup watch mode for fishem.
+
+When the "mockupWatchSec" configuration parameter is not 0, the input
+mockup directory is checked for changes every "mockupWatchSec"
+seconds while fishem is running. Mockup files (index.json, and
+$metadata/index.xml) are compared by size and mtime, and only the
+resources whose files were changed or added are read and stored in
+the fish; the resources whose files were removed are deleted. The
+other fish indexes and caches (response cache, ETags, subtree,
+links, members, and so on) learn about the changes through the fish
+listeners, as they do for RESTful API changes.
+
+Each set of changes is applied while holding the collection
+membership index lock, so background snapshots (which hold it while
+they fork) see all of the changes or none of them. A file that cannot
+be decoded (for example, because an editor is still writing it) is
+reported and left as it was, and is tried again when it changes
+next.
+
+Mockup archives are not watched.
+"""
+
+# Standard library module imports
+import os                       # File I/O handling
+import threading                # Watcher thread
+import time                     # Reload timing
+
+# Third party module imports
+# None
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_members           # Collection membership index
+import fishem_metadata          # $metadata XML handling
+import fishem_mockupcache       # Mockup file fingerprints
+import fishem_mockupio          # Mockup input
+
+# Constants
+# None
+
+# The running watcher, if any
+watcher = None
+
+
+# Class: Watcher
+
+class Watcher:
+    """Thread that checks mockup directory 'mockup_dir' for changes
+    every 'interval_sec' seconds, and applies them to the fish.
+    'files' holds the file list entry (see current_files() in
+    fishem_mockupcache.py) for each mockup file path, as last
+    applied."""
+
+    def __init__(self, mockup_dir, interval_sec):
+        self.mockup_dir = mockup_dir
+        self.interval_sec = interval_sec
+        self.files = self.scan()
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self.run,
+                                       name='fishem mockup watch',
+                                       daemon=True)
+
+    def scan(self):
+        """Returns the file list entries of the mockup files as they
+        are now, by file path."""
+        return {file_info[0]: file_info for file_info in
+                fishem_mockupcache.current_files(self.mockup_dir, 'stat')}
+        # End of scan()
+
+    def poll(self):
+        """Applies the mockup files changed since the last check to
+        the fish. Returns the number of resources changed and
+        deleted."""
+        files = self.scan()
+        changed = [file_info for file_path, file_info in files.items()
+                   if self.files.get(file_path) != file_info]
+        current_keys = {file_info[1] for file_info in files.values()}
+        removed = [file_info for file_path, file_info in self.files.items()
+                   if file_path not in files and
+                   file_info[1] not in current_keys]
+        if not changed and not removed:
+            return 0, 0
+
+        start_time = time.perf_counter()
+        applied = []
+        with fishem_members.lock:
+            for file_path, fish_key, file_name, is_metadata, stamp in \
+                    changed:
+                file_data = fishem_mockupio.read_mockup_files(
+                    [file_path])[0]
+                try:
+                    json_data = fishem_mockupio.decode_mockup_file(
+                        is_metadata, file_data)
+                except Exception as error:
+                    # Keep the object as it was; the file is tried
+                    # again when it changes next
+                    print('Mockup file "', file_path, '" not reloaded: ',
+                          error, sep='')
+                    continue
+                fish[fish_key] = json_data
+                if is_metadata:
+                    fishem_metadata.remember_xml(file_data)
+                applied.append(fish_key)
+            for file_info in removed:
+                fish.pop(file_info[1], None)
+                applied.append(file_info[1])
+        self.files = files
+        if not applied:
+            return 0, 0
+
+        # The mockup directory matches these fish objects again
+        fishem_mockupio.matches_mockup(self.mockup_dir, applied)
+        changed_count = len(applied) - len(removed)
+        print('Reloaded the mockup in "', self.mockup_dir, '" (',
+              changed_count, ' changed, ', len(removed), ' removed,',
+              ' in %.3f seconds)' % (time.perf_counter() - start_time),
+              sep='')
+        return changed_count, len(removed)
+        # End of poll()
+
+    def run(self):
+        """Watcher thread; checks for changes until stopped."""
+        while not self.stopping.wait(self.interval_sec):
+            try:
+                self.poll()
+            except Exception as error:
+                print('Mockup watch check failed with this error:')
+                print(error)
+        return
+        # End of run()
+
+    def stop(self):
+        """Stops the watcher thread."""
+        self.stopping.set()
+        self.thread.join()
+        return
+        # End of stop()
+
+
+# Function: start()
+
+def start(config):
+    """Starts watching the input mockup ("imockup") for changes, if
+    configuration parameter "mockupWatchSec" is not 0."""
+    global watcher
+    mockup_dir = config.get('imockup')
+    interval_sec = config.get('mockupWatchSec', 0)
+    if not mockup_dir or not interval_sec:
+        return
+    if not os.path.isdir(mockup_dir):
+        print('Only mockup directories can be watched; "', mockup_dir,
+              '" is not watched', sep='')
+        return
+    watcher = Watcher(mockup_dir, interval_sec)
+    watcher.thread.start()
+    print('Watching the mockup in "', mockup_dir, '" for changes',
+          sep='')
+    return
+
+    # End of start()
+
+
+# Function: stop()
+
+def stop():
+    """Stops watching the input mockup."""
+    global watcher
+    if watcher is not None:
+        watcher.stop()
+        watcher = None
+    return
+
+    # End of stop()
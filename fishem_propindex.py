@@ -0,0 +1,203 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Secondary property indexes for $filter in fishem.
+
+A $filter on a large collection normally tests every member. For the
+property paths listed in the "filterIndexes" configuration parameter
+(for example "Status/Health" or "Severity"), this module keeps an
+index of the members of each collection by the value of that
+property, so a filter with an equality term on the property, such as
+
+    $filter=Status/Health eq 'Critical'
+
+only tests the members that have that value. The index for a
+collection is built the first time it is needed, and is then kept
+up to date as member objects are added, changed (see fish.touch() in
+fish_data.py), and deleted.
+
+Only collections whose members all have fish keys directly below the
+collection key (like most Redfish collections) are indexed; other
+collections are always searched member by member.
+"""
+
+# Standard library module imports
+import threading                # Index lock
+
+# Third party module imports
+# None
+
+# Local module imports
+import fish_data                # fish data and fishem config
+from fish_data import fish      # Fish data
+
+# Constants
+UNINDEXABLE = object()          # Index value for objects and arrays
+
+# Property indexes of each indexed collection, by property path, and
+# the member positions of each collection (None for a collection that
+# cannot be indexed), with the Members list they were made from
+indexes = {}
+positions = {}
+lock = threading.RLock()
+
+
+# Class: PropertyIndex
+
+class PropertyIndex:
+    """Index of the member objects of one collection by the value of
+    one property.
+
+    'buckets' maps each value to the fish keys that have it, and
+    'values' maps each indexed fish key to its value.
+    """
+
+    def __init__(self, path):
+        self.names = path.split('/')
+        self.buckets = {}
+        self.values = {}
+
+    def update(self, key):
+        """Indexes (or re-indexes) fish object 'key', or drops it
+        from the index if it is no longer in the fish."""
+        self.discard(key)
+        obj = fish.get(key)
+        if obj is None:
+            return
+        for name in self.names:
+            obj = obj.get(name) if isinstance(obj, dict) else None
+        value = index_value(obj)
+        self.values[key] = value
+        self.buckets.setdefault(value, {})[key] = None
+        return
+        # End of update()
+
+    def discard(self, key):
+        """Drops 'key' from the index."""
+        if key not in self.values:
+            return
+        value = self.values.pop(key)
+        bucket = self.buckets[value]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[value]
+        return
+        # End of discard()
+
+
+# Function: index_value()
+
+def index_value(value):
+    """Returns the index value for property value 'value'."""
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return UNINDEXABLE
+
+    # End of index_value()
+
+
+# Function: indexed_paths()
+
+def indexed_paths():
+    """Returns the property paths that are configured to be indexed."""
+    return fish_data.fishem_config.get('filterIndexes') or []
+
+    # End of indexed_paths()
+
+
+# Function: _positions()
+
+def _positions(coll_key):
+    """Returns a dictionary of the position of each member in the
+    Members list of collection 'coll_key', or None if the collection
+    cannot be indexed. The caller must hold the lock."""
+    members = fish[coll_key].get('Members')
+    cached = positions.get(coll_key)
+    if cached is not None and cached[0] is members and \
+            (cached[1] is None or len(cached[1]) == len(members)):
+        return cached[1]
+    member_pos = None
+    if isinstance(members, list):
+        member_pos = {}
+        prefix = coll_key + '/'
+        for pos, member in enumerate(members):
+            member_key = member.get('@odata.id') \
+                if isinstance(member, dict) else None
+            if not isinstance(member_key, str) or \
+                    not member_key.startswith(prefix) or \
+                    '/' in member_key[len(prefix):] or \
+                    member_key in member_pos:
+                member_pos = None
+                break
+            member_pos[member_key] = pos
+    positions[coll_key] = (members, member_pos)
+    if member_pos is None:
+        indexes.pop(coll_key, None)
+    else:
+        # Index any members that were added to the collection after
+        # their objects were added to the fish
+        for prop_index in indexes.get(coll_key, {}).values():
+            for member_key in member_pos:
+                if member_key not in prop_index.values:
+                    prop_index.update(member_key)
+    return member_pos
+
+    # End of _positions()
+
+
+# Function: find_members()
+
+def find_members(coll_key, path, value):
+    """Returns the Members list entries of collection 'coll_key'
+    whose property 'path' may equal 'value', in collection order, or
+    None if 'path' is not indexed for the collection. The caller must
+    still test each entry, and must have called fishem_members.sync()
+    for the collection."""
+    if path not in indexed_paths():
+        return None
+    value = index_value(value)
+    if value is UNINDEXABLE:
+        return None
+    with lock:
+        member_pos = _positions(coll_key)
+        if member_pos is None:
+            return None
+        coll_indexes = indexes.setdefault(coll_key, {})
+        prop_index = coll_indexes.get(path)
+        if prop_index is None:
+            prop_index = coll_indexes[path] = PropertyIndex(path)
+            for member_key in member_pos:
+                prop_index.update(member_key)
+        found = [member_pos[member_key]
+                 for member_key in prop_index.buckets.get(value, ())
+                 if member_key in member_pos]
+        members = fish[coll_key]['Members']
+    found.sort()
+    return [members[pos] for pos in found]
+
+    # End of find_members()
+
+
+# Function: fish_changed()
+
+def fish_changed(key):
+    """fish listener; keeps the property indexes up to date."""
+    if key in positions or key in indexes:
+        with lock:
+            # A collection changed; its member positions are rebuilt
+            # when next needed
+            positions.pop(key, None)
+            if key not in fish:
+                indexes.pop(key, None)
+    coll_indexes = indexes.get(key.rsplit('/', 1)[0])
+    if coll_indexes:
+        with lock:
+            for prop_index in coll_indexes.values():
+                prop_index.update(key)
+    return
+
+    # End of fish_changed()
+
+
+# Keep the property indexes up to date
+fish.listeners.append(fish_changed)
@@ -0,0 +1,471 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Query parameter support for GET requests in fishem.
+
+Supported query parameters:
+
+    $expand     Expand hyperlinks in the requested resource into the
+                objects they refer to, using the Redfish syntax:
+                    *   Expand all hyperlinks
+                    .   Expand hyperlinks not in Links properties
+                    ~   Expand hyperlinks in Links properties only
+                optionally followed by ($levels=n), for example
+                '$expand=.($levels=2)'. The default is one level.
+    $select     Return only the listed properties, for example
+                '$select=Status/Health,PowerState'. Nested properties
+                are given as paths. The @odata properties of the
+                resource are always returned.
+    $filter     Return only the collection members that match an
+                expression, for example
+                "$filter=Status/Health eq 'Critical'" (see
+                fishem_filter.py).
+    only        For a collection with exactly one member, return
+                that member instead of the collection.
+    $top        Return at most this many collection members.
+    $skip       Skip this many collection members.
+
+When the "collectionPageSize" configuration parameter is set, large
+collections are also paged without $top. A collection page has a
+"Members@odata.nextLink" property with the URI of the next page, and
+"Members@odata.count" is still the total number of members. Pages
+are sliced from the collection Members list, without copying it.
+
+Hyperlinks are resolved directly against the fish, so a client can
+get, for example, a collection and all of its members in one
+request. An object is never expanded inside itself (cycles are left
+as hyperlinks), and each object is only expanded once for each
+level and set of ancestors within a request. The "expandMaxLevels"
+and "expandMaxObjects" configuration parameters limit the depth and
+size of expanded responses; an object expanded more than once counts
+against "expandMaxObjects" each time it appears.
+
+$filter is applied first, then paging, $select, and $expand. A
+filtered collection has "Members@odata.count" set to the number of
+matching members; equality filters on indexed properties use the
+property indexes in fishem_propindex.py instead of testing every
+member, and with the SQLite fish store, filters are run in SQL (see
+fishem_sqlfish.py) where they can be.
+
+$select and paging are applied before the response is encoded, and
+these responses are kept in the response cache alongside the full
+response for the same fish object. $expand and $filter responses are
+not kept in the response cache, since they depend on more than one
+fish object; their ETags are made from the response contents
+instead.
+"""
+
+# Standard library module imports
+import re                       # Query parameter parsing
+from urllib.parse import urlencode      # Next page links
+
+# Third party module imports
+# None
+
+# Local module imports
+import fish_data                # fish data and fishem config
+from fish_data import fish      # Fish data
+import fishem_members           # Collection membership index
+import fishem_filter            # $filter expressions
+import fishem_propindex         # $filter property indexes
+import fishem_sqlfish           # $filter in the SQLite fish store
+
+# Constants
+QUERY_PARAMS = ('$expand', '$select', 'only', '$top', '$skip',
+                '$filter')
+NEXT_LINK_PARAMS = ('$filter', '$expand')
+EXPAND_RE = re.compile(r'([*.~])(?:\(\$levels=(\d+)\))?')
+DEFAULT_MAX_LEVELS = 6
+DEFAULT_MAX_OBJECTS = 10000
+DEFAULT_PAGE_SIZE = 0
+SELECT_ALWAYS = ('@odata.id', '@odata.type', '@odata.context',
+                 '@odata.etag')
+
+
+# Class: QueryError
+
+class QueryError(Exception):
+    """Raised for query parameters that cannot be handled; the
+    message is returned to the client with a 400 (Bad Request)."""
+
+
+# Function: has_query()
+
+def has_query(args):
+    """Returns True if request arguments 'args' contain any query
+    parameters handled by this module."""
+    for param in QUERY_PARAMS:
+        if param in args:
+            return True
+    return False
+
+    # End of has_query()
+
+
+# Function: cache_variant()
+
+def cache_variant(fish_key, args):
+    """Returns the response cache variant for a GET of 'fish_key'
+    with request arguments 'args': '' for the full object, a
+    normalized form of the $select and paging parameters, or None for
+    responses that must not be cached. Raises QueryError if the query
+    parameters cannot be handled."""
+    if '$expand' in args or '$filter' in args:
+        return None
+    variant = []
+    if '$select' in args:
+        variant.append('$select=' + select_text(args['$select']))
+    page = page_range(fish[fish_key], args)
+    if page is not None:
+        variant.append('$skip=%d&$top=%d' % page)
+    return '&'.join(variant)
+
+    # End of cache_variant()
+
+
+# Function: select_text()
+
+def select_text(text):
+    """Returns the normalized form of $select value 'text'."""
+    return ','.join(select_paths(parse_select(text)))
+
+    # End of select_text()
+
+
+# Function: parse_select()
+
+def parse_select(text):
+    """Returns a tree of nested dictionaries for the $select value
+    'text'; an empty dictionary selects a whole property."""
+    tree = {}
+    for path in text.split(','):
+        names = path.strip().split('/')
+        if '' in names:
+            raise QueryError('Bad $select input')
+        node = tree
+        for name in names[:-1]:
+            child = node.get(name)
+            if child == {}:
+                # The whole property is already selected
+                break
+            node = node.setdefault(name, {})
+        else:
+            node[names[-1]] = {}
+    return tree
+
+    # End of parse_select()
+
+
+# Function: select_paths()
+
+def select_paths(tree, prefix=''):
+    """Returns the sorted property paths selected by 'tree'."""
+    paths = []
+    for name, subtree in sorted(tree.items()):
+        if subtree:
+            paths.extend(select_paths(subtree, prefix + name + '/'))
+        else:
+            paths.append(prefix + name)
+    return paths
+
+    # End of select_paths()
+
+
+# Function: select()
+
+def select(value, tree):
+    """Returns the parts of 'value' (part of a fish object) selected
+    by 'tree'. Selections apply to each object in an array."""
+    if isinstance(value, list):
+        return [select(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    selected = {}
+    for name, item in value.items():
+        subtree = tree.get(name)
+        if subtree is None:
+            continue
+        selected[name] = select(item, subtree) if subtree else item
+    return selected
+
+    # End of select()
+
+
+# Function: page_size()
+
+def page_size():
+    """Returns the default collection page size, or 0 if collections
+    are only paged when requested."""
+    return config_limit('collectionPageSize', DEFAULT_PAGE_SIZE)
+
+    # End of page_size()
+
+
+# Function: count_arg()
+
+def count_arg(args, name):
+    """Returns the value of the $top or $skip parameter 'name' in
+    request arguments 'args', or None if it is not present."""
+    value = args.get(name)
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise QueryError('Bad ' + name + ' input')
+    return int(value)
+
+    # End of count_arg()
+
+
+# Function: page_range()
+
+def page_range(data, args):
+    """Returns (skip, top) for the page of the Members of collection
+    'data' to return for a GET with request arguments 'args', or None
+    if all Members are returned (or it is not a collection)."""
+    skip = count_arg(args, '$skip') or 0
+    top = count_arg(args, '$top')
+    members = data.get('Members')
+    if not isinstance(members, list):
+        return None
+    limit = page_size()
+    if limit > 0 and (top is None or top > limit):
+        top = limit
+    if top is None:
+        top = max(len(members) - skip, 0)
+    if skip == 0 and top >= len(members):
+        return None
+    return skip, top
+
+    # End of page_range()
+
+
+# Function: page()
+
+def page(fish_key, data, skip, top, args):
+    """Returns a copy of collection 'data' (the fish object for
+    'fish_key') with only the requested page of its Members, and a
+    link to the next page if there is one. The link only has the
+    query parameters that shape the page, with $select normalized,
+    so a cached page is the same for every request that shares its
+    cache variant. There is no next page for $top=0."""
+    members = data['Members']
+    paged = dict(data)
+    paged['Members'] = members[skip:skip + top]
+    if top > 0 and skip + top < len(members):
+        next_args = [(name, args[name]) for name in NEXT_LINK_PARAMS
+                     if name in args]
+        if '$select' in args:
+            next_args.append(('$select', select_text(args['$select'])))
+        next_args.extend((('$skip', skip + top), ('$top', top)))
+        paged['Members@odata.nextLink'] = fish_key + '?' + \
+            urlencode(next_args, safe='$,/()*~')
+    return paged
+
+    # End of page()
+
+
+# Function: filter_members()
+
+def filter_members(fish_key, data, text):
+    """Returns a copy of collection 'data' (the fish object for
+    'fish_key') with only the Members that match $filter expression
+    'text'. Objects that are not collections are returned as they
+    are."""
+    try:
+        compiled = fishem_filter.get_filter(text)
+    except fishem_filter.FilterError as error:
+        raise QueryError('Bad $filter input: ' + str(error))
+    members = data.get('Members')
+    if not isinstance(members, list):
+        return data
+    positions = fishem_sqlfish.match_members(
+        [link_key(member) for member in members], compiled)
+    if positions is not None:
+        matched = [members[position] for position in positions]
+    else:
+        for path, value in compiled.index_terms:
+            candidates = fishem_propindex.find_members(fish_key, path,
+                                                       value)
+            if candidates is not None:
+                members = candidates
+                break
+        matched = []
+        for member in members:
+            member_key = link_key(member)
+            if member_key is not None and \
+                    compiled.predicate(fish[member_key]):
+                matched.append(member)
+    filtered = dict(data)
+    filtered['Members'] = matched
+    filtered['Members@odata.count'] = len(matched)
+    return filtered
+
+    # End of filter_members()
+
+
+# Function: only_key()
+
+def only_key(fish_key):
+    """Returns the fish key of the only member of collection
+    'fish_key', or 'fish_key' if it is not a collection with
+    exactly one member."""
+    fishem_members.sync(fish_key)
+    members = fish[fish_key].get('Members')
+    if isinstance(members, list) and len(members) == 1:
+        member_key = link_key(members[0])
+        if member_key is not None:
+            return member_key
+    return fish_key
+
+    # End of only_key()
+
+
+# Function: link_key()
+
+def link_key(value):
+    """Returns the fish key that 'value' links to, if 'value' is a
+    hyperlink (an object with only an '@odata.id') to an object in
+    the fish, or None otherwise."""
+    if not isinstance(value, dict) or len(value) != 1:
+        return None
+    target = value.get('@odata.id')
+    if not isinstance(target, str):
+        return None
+    target = target.split('#')[0]
+    if target.endswith('/'):
+        target = target.rstrip('/')
+    return target if target in fish else None
+
+    # End of link_key()
+
+
+# Class: Expander
+
+class Expander:
+    """Expands hyperlinks for one request.
+
+    'mode' is '*', '.', or '~' (see the module docstring). 'memo'
+    holds each object expanded so far, by fish key and number of
+    levels, so an object linked many times is only expanded once for
+    each set of ancestors that changes its expansion. Each memo entry
+    is (cut, targets, expanded, objects): 'targets' holds every
+    hyperlink target met while expanding the object, 'cut' the ones
+    left as hyperlinks because they were ancestors, and 'objects' the
+    number of objects expanded, which is counted again each time the
+    entry is used.
+    """
+
+    def __init__(self, mode, max_objects):
+        self.mode = mode
+        self.max_objects = max_objects
+        self.objects = 0
+        self.memo = {}
+        self.targets = [set()]
+
+    def count(self, objects):
+        """Counts 'objects' more expanded objects against the limit."""
+        self.objects += objects
+        if self.objects > self.max_objects:
+            raise QueryError('$expand result too large')
+
+    def expand_key(self, key, levels, ancestors):
+        """Returns the fish object for 'key' with its hyperlinks
+        expanded 'levels' more levels."""
+        fishem_members.sync(key)
+        if levels == 0:
+            return fish[key]
+        ancestors = ancestors | {key}
+        entries = self.memo.setdefault((key, levels), [])
+        for cut, targets, expanded, objects in entries:
+            if ancestors & targets == cut:
+                self.count(objects)
+                self.targets[-1] |= targets
+                return expanded
+        start = self.objects
+        self.targets.append(set())
+        expanded = self.expand_value(fish[key], levels, False, ancestors)
+        targets = self.targets.pop()
+        entries.append((ancestors & targets, targets, expanded,
+                        self.objects - start))
+        self.targets[-1] |= targets
+        return expanded
+        # End of expand_key()
+
+    def expand_value(self, value, levels, in_links, ancestors):
+        """Returns 'value' (part of a fish object) with its
+        hyperlinks expanded 'levels' levels. 'in_links' is True
+        within a Links property. The fish is never changed."""
+        if isinstance(value, list):
+            return [self.expand_value(item, levels, in_links, ancestors)
+                    for item in value]
+        if not isinstance(value, dict):
+            return value
+        target = link_key(value)
+        if target is not None:
+            if self.mode == '*' or (self.mode == '~') == in_links:
+                self.targets[-1].add(target)
+                if target not in ancestors:
+                    self.count(1)
+                    return self.expand_key(target, levels - 1, ancestors)
+            return value
+        return {name: self.expand_value(item, levels,
+                                        in_links or name == 'Links',
+                                        ancestors)
+                for name, item in value.items()}
+        # End of expand_value()
+
+
+# Function: config_limit()
+
+def config_limit(name, default):
+    """Returns the limit from configuration parameter 'name'."""
+    return int(fish_data.fishem_config.get(name, default))
+
+    # End of config_limit()
+
+
+# Function: apply()
+
+def apply(fish_key, args):
+    """Returns the fish object for 'fish_key' as changed by the query
+    parameters in request arguments 'args'. Raises QueryError if the
+    query parameters cannot be handled."""
+    data = fish[fish_key]
+
+    filter_text = args.get('$filter')
+    if filter_text is not None:
+        data = filter_members(fish_key, data, filter_text)
+
+    page_args = page_range(data, args)
+    if page_args is not None:
+        data = page(fish_key, data, page_args[0], page_args[1], args)
+
+    select_arg = args.get('$select')
+    if select_arg is not None:
+        tree = parse_select(select_arg)
+        for name in SELECT_ALWAYS:
+            tree[name] = {}
+        if 'Members' in tree:
+            tree['Members@odata.nextLink'] = {}
+        data = select(data, tree)
+
+    expand = args.get('$expand')
+    if expand is not None:
+        expand_match = EXPAND_RE.fullmatch(expand)
+        if expand_match is None:
+            raise QueryError('Bad $expand input')
+        mode, levels = expand_match.groups()
+        levels = int(levels) if levels is not None else 1
+        if levels < 1:
+            raise QueryError('Bad $expand input')
+        levels = min(levels, config_limit('expandMaxLevels',
+                                          DEFAULT_MAX_LEVELS))
+        expander = Expander(mode, config_limit('expandMaxObjects',
+                                               DEFAULT_MAX_OBJECTS))
+        fishem_members.sync(fish_key)
+        data = expander.expand_value(data, levels, False,
+                                     frozenset((fish_key,)))
+
+    return data
+
+    # End of apply()
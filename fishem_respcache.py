@@ -0,0 +1,254 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Serialized response cache for fishem.
+
+Most fish objects never change between reads, but every GET encodes
+the requested object as JSON again. This module keeps the encoded
+response bytes for recently read fish objects, keyed by fish key, so
+that repeated GETs of the same object are answered without encoding
+it again. Responses to GETs with $select are kept as variants of the
+same fish key.
+
+A cached response is invalidated whenever its fish object, or any
+object directly below it (such as a member of a collection), is set,
+replaced, deleted, or changed in place (see FishDict in fish_data.py).
+This covers PUT, PATCH, POST, and DELETE requests, FishDoctor
+operations, and any other fish changes made by fishem modules.
+
+The cache is bounded by the "responseCacheMB" configuration
+parameter; the least recently used responses are evicted first.
+Setting "responseCacheMB" to 0 disables the cache.
+"""
+
+# Standard library module imports
+import json                     # JSON handling
+import threading                # Cache lock
+from collections import OrderedDict     # LRU ordering
+
+# Third party module imports
+from flask import request               # Query parameters
+from flask import make_response         # Cached responses
+
+# Local module imports
+from fish_data import fish              # Fish data
+import fishem_httpcodes as HTTP         # HTTP status codes
+import fishem_etag                      # ETag support
+import fishem_members                   # Collection membership index
+import fishem_query                     # Query parameter support
+
+# Constants
+MAX_ENTRY_FRACTION = 8          # Largest entry, as a fraction of cache
+
+# The response cache, once set up by setup(); None when disabled
+cache = None
+
+
+# Class: ResponseCache
+
+class ResponseCache:
+    """Bounded LRU cache of encoded JSON responses, keyed by fish key
+    and variant ('' for the full object, or a normalized $select).
+
+    'generation' counts invalidations. A response encoded while an
+    invalidation happens might be stale, so put() only stores a
+    response if no invalidation happened since it was started.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()    # (Key, variant) -> bytes
+        self.variants = {}              # Key -> set of variants
+        self.size = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, variant=''):
+        """Returns the encoded response for 'key' and 'variant', or
+        None."""
+        entry_key = (key, variant)
+        with self.lock:
+            body = self.entries.get(entry_key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(entry_key)
+            self.hits += 1
+            return body
+        # End of get()
+
+    def put(self, key, variant, body, generation):
+        """Stores the encoded response 'body' for 'key' and 'variant',
+        unless an invalidation happened since 'generation' was read."""
+        if len(body) > self.max_bytes // MAX_ENTRY_FRACTION:
+            return
+        entry_key = (key, variant)
+        with self.lock:
+            if generation != self.generation or entry_key in self.entries:
+                return
+            self.entries[entry_key] = body
+            self.variants.setdefault(key, set()).add(variant)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                (old_key, old_variant), old_body = \
+                    self.entries.popitem(last=False)
+                self.size -= len(old_body)
+                self.evictions += 1
+                old_variants = self.variants[old_key]
+                old_variants.discard(old_variant)
+                if not old_variants:
+                    del self.variants[old_key]
+        return
+        # End of put()
+
+    def invalidate(self, key):
+        """Removes the cached responses for 'key' and its parent."""
+        parent = key.rsplit('/', 1)[0]
+        with self.lock:
+            self.generation += 1
+            for stale_key in (key, parent):
+                for variant in self.variants.pop(stale_key, ()):
+                    body = self.entries.pop((stale_key, variant))
+                    self.size -= len(body)
+                    self.invalidations += 1
+        return
+        # End of invalidate()
+
+    def stats(self):
+        """Returns a dictionary of cache statistics."""
+        with self.lock:
+            return {'entries': len(self.entries),
+                    'bytes': self.size,
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'invalidations': self.invalidations}
+        # End of stats()
+
+
+# Function: encode()
+
+def encode(data):
+    """Encodes 'data' exactly as the fishem JSON representation does."""
+    return json.dumps(data, indent=4).encode()
+
+    # End of encode()
+
+
+# Function: setup()
+
+def setup(config):
+    """Sets up the response cache as specified by 'config'."""
+    global cache
+    cache_mb = config['responseCacheMB']
+    if not cache_mb or cache_mb <= 0:
+        print('Response cache disabled')
+        return
+    cache = ResponseCache(int(cache_mb * 1024 * 1024))
+    fish.listeners.append(cache.invalidate)
+    print('Response cache enabled, up to', cache_mb, 'MB')
+    return
+
+    # End of setup()
+
+
+# Function: get_response()
+
+def get_response(fish_key):
+    """Returns the response to a GET of the fish object 'fish_key':
+    304 (Not Modified) if the client already has the current object,
+    otherwise 200 (OK) with the object, from the cache when possible.
+    The caller must ensure the object is in the fish. Without a
+    cache, returns the object itself for flask_restful to encode.
+    Query parameters are handled with fishem_query; responses that
+    depend on more than one fish object are handled by
+    query_response()."""
+    # Bring collection Members up to date
+    fishem_members.sync(fish_key)
+    variant = ''
+    if fishem_query.has_query(request.args) or fishem_query.page_size():
+        try:
+            if 'only' in request.args:
+                fish_key = fishem_query.only_key(fish_key)
+                fishem_members.sync(fish_key)
+            variant = fishem_query.cache_variant(fish_key, request.args)
+        except fishem_query.QueryError as error:
+            return str(error), HTTP.BAD_REQUEST
+        if variant is None:
+            return query_response(fish_key)
+    # Get the ETag before the object, so it is never newer
+    etag = fishem_etag.etag(fish_key, variant)
+    resp = fishem_etag.not_modified(fish_key, etag)
+    if resp is not None:
+        return resp
+    if cache is None:
+        return response_data(fish_key, variant), HTTP.OK, {'ETag': etag}
+    body = cache.get(fish_key, variant)
+    if body is None:
+        generation = cache.generation
+        body = encode(response_data(fish_key, variant))
+        cache.put(fish_key, variant, body, generation)
+    resp = make_response(body, HTTP.OK)
+    resp.headers['Content-Type'] = 'application/json'
+    resp.headers['ETag'] = etag
+    return resp
+
+    # End of get_response()
+
+
+# Function: response_data()
+
+def response_data(fish_key, variant):
+    """Returns the data to encode for 'fish_key' and 'variant'."""
+    if variant:
+        return fishem_query.apply(fish_key, request.args)
+    return fish[fish_key]
+
+    # End of response_data()
+
+
+# Function: query_response()
+
+def query_response(fish_key):
+    """Returns the response to a GET of the fish object 'fish_key'
+    with query parameters that make it depend on more than one fish
+    object (such as $expand); these responses are not cached."""
+    fishem_members.sync(fish_key)
+    try:
+        data = fishem_query.apply(fish_key, request.args)
+    except fishem_query.QueryError as error:
+        return str(error), HTTP.BAD_REQUEST
+    body = encode(data)
+    etag = fishem_etag.body_etag(body)
+    resp = fishem_etag.not_modified(fish_key, etag)
+    if resp is not None:
+        return resp
+    resp = make_response(body, HTTP.OK)
+    resp.headers['Content-Type'] = 'application/json'
+    resp.headers['ETag'] = etag
+    return resp
+
+    # End of query_response()
+
+
+# Function: report()
+
+def report():
+    """Prints the response cache statistics."""
+    if cache is None:
+        return
+    stats = cache.stats()
+    lookups = stats['hits'] + stats['misses']
+    hit_rate = 100.0 * stats['hits'] / lookups if lookups else 0.0
+    print('Response cache: %d hits, %d misses (%.1f%% hit rate), '
+          '%d evictions, %d invalidations, %d entries, %.1f MB'
+          % (stats['hits'], stats['misses'], hit_rate,
+             stats['evictions'], stats['invalidations'],
+             stats['entries'], stats['bytes'] / (1024 * 1024)))
+    return
+
+    # End of report()
@@ -6,17 +6,47 @@ Initialize and launch REST operations for fishem.
 
 # Standard library module imports
 import json                     # JSON handling
-import importlib                # API module imports
 import os                       # CLI and file I/O handling
+import sys                      # Platform check
+import time                     # Startup time reporting
 
 # Third party module imports
 from flask import Flask, make_response  # REST operations
 from flask_restful import Api           # REST operations
 
 # Local module imports
+import fishem_uritrie           # Optional trie-based URI dispatcher
+import fishem_lazyapis          # Optional lazy API module activation
+import fishem_generic           # Generic resource engine
+import fishem_respcache         # Serialized response cache
+import fishem_etag              # ETag support
+import fishem_journal           # Fish change journal
+import fishem_sqlfish           # SQLite fish store
 # Note: API modules are programmatically imported in startup()
 
 
+# Function: resident_memory()
+
+def resident_memory():
+    """Returns the current resident memory of this process in bytes,
+    or None if it cannot be determined on this platform."""
+    try:
+        # Linux
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+    try:
+        # Other POSIX systems; peak rather than current memory
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == 'darwin' else rss * 1024
+    except Exception:
+        return None
+
+    # End of resident_memory()
+
+
 # Function: startup()
 
 def startup(config):
@@ -39,22 +69,65 @@ def startup(config):
         resp.headers.extend(headers or {})
         return resp
 
-    # Set up URIs for all fishem API modules
-    mod_count = 0
-    for dirpath, dirnames, filenames in os.walk('fishapis'):
-        if dirpath == 'fishapis':
-            for fn in filenames:
-                # Import API module to get access to its functions
-                if fn == '__init__.py': continue
-                mod_name = 'fishapis.' + fn.replace('.py', '')
-                api_mod = importlib.import_module(mod_name)
-                # Tell the API module to register its URIs
-                api_mod.activate(rest_api)
-                # Provide a simple progress indicator
-                if mod_count % 5 == 0:
-                    print('.', sep='', end='', flush=True)
-                mod_count += 1
-    print(' (', mod_count, ' API modules)', sep='')
+    # Cache encoded GET responses, if enabled, and track fish object
+    # versions for ETags; the cache must see fish changes first, so
+    # that a new ETag is never sent with an old cached response
+    fishem_respcache.setup(config)
+    fishem_etag.setup()
+
+    # Hold responses to requests that change the fish until the
+    # changes are in the journal, if journaling
+    flask_app.after_request(fishem_journal.after_request)
+
+    # Keep the fish objects a request uses in the SQLite fish store
+    # cache until it ends, if the fish is kept there
+    flask_app.teardown_request(fishem_sqlfish.teardown_request)
+
+    # API modules register their URIs either with flask_restful
+    # (one Werkzeug URL rule per URI) or with the trie dispatcher
+    # (one catch-all URL rule for all URIs); lazy API module
+    # activation always uses the trie dispatcher
+    if config['lazyApis']:
+        uri_registry = fishem_lazyapis.LazyDispatcher(rest_api)
+        uri_registry.install(flask_app)
+    elif config['uriDispatcher'] == 'trie':
+        uri_registry = fishem_uritrie.TrieDispatcher(rest_api)
+        uri_registry.install(flask_app)
+    else:
+        uri_registry = rest_api
+
+    if config['lazyApis']:
+        # Set up URIs only for APIs that must be activated at
+        # startup; all others are activated by their first request
+        for api_name in fishem_lazyapis.get_manifest()['eager']:
+            uri_registry.activate_api(api_name)
+        print('Lazy API activation:',
+              len(uri_registry.activated), 'APIs activated,',
+              len(fishem_lazyapis.get_manifest()['uris']),
+              'available on demand')
+    else:
+        # Set up URIs for all fishem APIs: the resource types in
+        # the resource table, and the API modules in 'fishapis'
+        api_count = 0
+        for api_name in fishem_generic.api_names():
+            # Tell the API to register its URIs
+            fishem_generic.activate_api(api_name, uri_registry)
+            # Provide a simple progress indicator
+            if api_count % 5 == 0:
+                print('.', sep='', end='', flush=True)
+            api_count += 1
+        print(' (', api_count, ' APIs)', sep='')
+        if config['uriDispatcher'] == 'trie':
+            print('Trie dispatcher has', uri_registry.trie.pattern_count,
+                  'URI patterns for', uri_registry.uri_count, 'URIs')
+
+    # Report startup time and resident memory
+    startup_time = time.perf_counter() - config['startTime']
+    print('fishem started in %.3f seconds' % startup_time, end='')
+    rss = resident_memory()
+    if rss:
+        print(', resident memory %.1f MB' % (rss / (1024 * 1024)), end='')
+    print()
     print('fishem running -----------------------------------------')
 
     # TODO: Finish adding HTTPS support
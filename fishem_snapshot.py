@@ -0,0 +1,300 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Background snapshots of the fish for fishem.
+
+A snapshot saves the fish to a fish file (see fishem_fishfileio.py)
+without holding up RESTful API operations while it is written. Where
+the operating system supports fork() (Linux and other Unix systems),
+a child process is forked to write the snapshot; the child has a
+copy-on-write copy of the fish as it was at the moment of the fork,
+so the snapshot is a consistent point-in-time view, and the server
+keeps changing its own fish while the child writes. Elsewhere, the
+snapshot is written by a thread, one fish object at a time, so each
+object is consistent but the fish can change while it is saved. The
+SQLite fish store (see fishem_sqlfish.py) is also saved by a thread.
+
+Snapshots are saved to the fish file named by the "snapshotFile"
+configuration parameter:
+
+    every "snapshotIntervalSec" seconds, if it is not 0
+    after "snapshotChanges" fish changes, if it is not 0
+    when requested with the FishDoctor.Snapshot action
+
+Only one snapshot is saved at a time. The journal (fishem_journal.py)
+uses the same facility to save its snapshots.
+"""
+
+# Standard library module imports
+import os                       # fork() and child process handling
+import threading                # Snapshot and trigger threads
+import time                     # Snapshot timing
+
+# Third party module imports
+# None
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_fishfileio        # Fish file output
+import fishem_members           # Collection membership index
+
+# Constants
+# None
+
+# The snapshot being saved, the last snapshot saved, and the running
+# snapshot trigger, if any
+lock = threading.Lock()
+running = None
+last = None
+trigger = None
+
+
+# Class: Snapshot
+
+class Snapshot:
+    """A snapshot of the fish being saved to 'file_name'. Each
+    function in 'done' is called with True or False when it has been
+    saved or has failed."""
+
+    def __init__(self, file_name, done):
+        self.file_name = file_name
+        self.done = done
+        self.start_time = time.time()
+        self.seconds = None
+        self.saved = None
+        self.pid = None
+        self.thread = threading.Thread(target=self.run,
+                                       name='fishem snapshot', daemon=True)
+
+    def fork(self):
+        """Forks a child process that saves the fish as it is now.
+        Members lists are brought up to date first, with the index
+        lock held across the fork, so the child sees the collections
+        exactly as the index does."""
+        with fishem_members.lock:
+            fishem_members.sync_all()
+            self.pid = os.fork()
+            if self.pid == 0:
+                self.child()
+        return
+        # End of fork()
+
+    def child(self):
+        """Runs in the forked child process; saves the fish and exits
+        without returning. Only the write is done here, as other
+        threads of the server (and any locks they held) were not
+        copied into the child."""
+        status = 0
+        try:
+            fishem_fishfileio.write_fish(self.file_name)
+        except BaseException as error:
+            os.write(2, ('Failed to save snapshot "%s": %s\n' %
+                         (self.file_name, error)).encode())
+            status = 1
+        os._exit(status)
+        # End of child()
+
+    def run(self):
+        """Snapshot thread; waits for the child process to save the
+        fish, or saves it here if there is no child process."""
+        if self.pid is not None:
+            status = os.waitpid(self.pid, 0)[1]
+            saved = os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+        else:
+            saved = True
+            try:
+                fishem_fishfileio.write_fish(self.file_name)
+            except Exception as error:
+                print('Failed to save snapshot "', self.file_name,
+                      '" with this error:', sep='')
+                print(error)
+                saved = False
+        self.finish(saved)
+        return
+        # End of run()
+
+    def finish(self, saved):
+        """Records the result of the snapshot and calls 'done'."""
+        global running, last
+        self.seconds = time.time() - self.start_time
+        self.saved = saved
+        for done in self.done:
+            done(saved)
+        with lock:
+            running = None
+            last = self
+        return
+        # End of finish()
+
+    def status(self):
+        """Returns a dictionary that describes the snapshot."""
+        return {'FileName': self.file_name,
+                'StartTime': time.strftime('%Y-%m-%dT%H:%M:%SZ',
+                                           time.gmtime(self.start_time)),
+                'InProgress': self.saved is None,
+                'Saved': self.saved,
+                'Seconds': self.seconds}
+        # End of status()
+
+
+# Function: save()
+
+def save(file_name, done=None):
+    """Starts saving a snapshot of the current fish to 'file_name' in
+    the background. 'done', if given, is called with True or False
+    when the snapshot has been saved or has failed. Returns the
+    Snapshot, or None if another snapshot is being saved."""
+    global running
+    with lock:
+        if running is not None:
+            return None
+        snapshot = running = Snapshot(file_name, [done] if done else [])
+    try:
+        if hasattr(os, 'fork') and fish.forkable:
+            snapshot.fork()
+    except OSError as error:
+        print('Failed to fork a snapshot process:', error)
+        print('Saving the snapshot in a thread instead')
+    snapshot.thread.start()
+    return snapshot
+
+    # End of save()
+
+
+# Function: in_progress()
+
+def in_progress():
+    """Returns True if a snapshot is being saved."""
+    return running is not None
+
+    # End of in_progress()
+
+
+# Function: wait()
+
+def wait():
+    """Waits for the snapshot being saved, if any, to finish."""
+    snapshot = running
+    if snapshot is not None:
+        snapshot.thread.join()
+    return
+
+    # End of wait()
+
+
+# Function: status()
+
+def status():
+    """Returns a dictionary that describes the snapshot being saved
+    and the last snapshot saved."""
+    snapshot, last_snapshot = running, last
+    return {'InProgress': snapshot.status() if snapshot else None,
+            'LastSnapshot': last_snapshot.status() if last_snapshot
+            else None}
+
+    # End of status()
+
+
+# Class: Trigger
+
+class Trigger:
+    """Thread that saves snapshots to 'file_name' every
+    'interval_sec' seconds and after every 'changes' fish changes
+    (each if it is not 0)."""
+
+    def __init__(self, file_name, interval_sec, changes):
+        self.file_name = file_name
+        self.interval_sec = interval_sec
+        self.changes = changes
+        self.changed = 0
+        self.stopping = False
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self.run,
+                                       name='fishem snapshot trigger',
+                                       daemon=True)
+
+    def fish_changed(self, key):
+        """fish listener; counts fish changes."""
+        with self.cond:
+            self.changed += 1
+            if self.changes and self.changed >= self.changes:
+                self.cond.notify_all()
+        return
+        # End of fish_changed()
+
+    def due(self, next_time):
+        """Returns True if a snapshot should be saved now."""
+        if self.changes and self.changed >= self.changes:
+            return True
+        return self.interval_sec and time.monotonic() >= next_time
+        # End of due()
+
+    def run(self):
+        """Trigger thread; saves snapshots when they are due."""
+        next_time = time.monotonic() + self.interval_sec
+        while True:
+            with self.cond:
+                while not self.stopping and not self.due(next_time):
+                    timeout = None
+                    if self.interval_sec:
+                        timeout = max(next_time - time.monotonic(), 0)
+                    self.cond.wait(timeout)
+                if self.stopping:
+                    break
+            # A snapshot that is already being saved counts as the
+            # one that is due
+            wait()
+            with self.cond:
+                self.changed = 0
+            next_time = time.monotonic() + self.interval_sec
+            save(self.file_name)
+        return
+        # End of run()
+
+    def stop(self):
+        """Stops the trigger thread."""
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        self.thread.join()
+        return
+        # End of stop()
+
+
+# Function: start()
+
+def start(config):
+    """Starts saving snapshots to the fish file named by configuration
+    parameter "snapshotFile", by interval ("snapshotIntervalSec") and
+    by number of changes ("snapshotChanges"), if either is set."""
+    global trigger
+    file_name = config.get('snapshotFile')
+    interval_sec = config.get('snapshotIntervalSec', 0)
+    changes = config.get('snapshotChanges', 0)
+    if not file_name or not (interval_sec or changes):
+        return
+    trigger = Trigger(file_name, interval_sec, changes)
+    if changes:
+        fish.listeners.append(trigger.fish_changed)
+    trigger.thread.start()
+    print('Saving snapshots in "', file_name, '"', sep='')
+    return
+
+    # End of start()
+
+
+# Function: stop()
+
+def stop():
+    """Stops saving snapshots, after any snapshot being saved is
+    finished."""
+    global trigger
+    if trigger is not None:
+        if trigger.fish_changed in fish.listeners:
+            fish.listeners.remove(trigger.fish_changed)
+        trigger.stop()
+        trigger = None
+    wait()
+    return
+
+    # End of stop()
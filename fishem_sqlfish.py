@@ -0,0 +1,525 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+SQLite fish store for fishem.
+
+With the "fishStore" configuration parameter set to "sqlite", the
+fish objects are kept in a SQLite database (the "fishStoreFile"
+configuration parameter) instead of only in memory, one row for each
+fish key, with the object as JSON text:
+
+    CREATE TABLE fish (key TEXT PRIMARY KEY, value TEXT NOT NULL)
+
+The fish becomes a SqlFishDict, which keeps every key in memory, but
+only the "fishStoreCacheObjects" most recently used objects; the
+others are decoded from the database when they are read again. Every
+change to the fish (a set, a delete, or a fish.touch() call) is
+written to the database and committed before it returns, with the
+database in WAL mode and synchronous=FULL, so each change is on disk
+when the request that made it gets its response. While the input
+fish file and mockup are loaded at startup, all changes are
+committed together at the end.
+
+If the database already has fish objects at startup, the fish is
+restored from it, and the input fish file and input mockup are not
+loaded; delete the database (and its -wal and -shm files) to start
+from the inputs again.
+
+$filter queries on collections are run in SQL when they can be: the
+expression (see fishem_filter.py) is translated into a WHERE clause
+on the member rows with the JSON1 functions json_type() and
+json_extract(), so the member objects are not decoded or brought
+into the cache. Comparisons of two properties are still made in
+Python. Paging only slices the Members list of a collection (see
+fishem_query.py), so it never reads member objects, and for a
+filtered collection it slices the positions of the members that
+SQLite found.
+
+Request handlers change fish objects in place and then call
+fish.touch(), so every object a request reads or sets is pinned in
+the cache until the request ends (see teardown_request()); an object
+being changed is never evicted, which would lose the changes made to
+it so far. Outside a request, objects must be changed by setting
+them. A fish.touch() of an object that is not in the cache is
+reported, since its changes were lost. Background snapshots of a SQLite
+fish store are written by a thread, not a forked child process (see
+fishem_snapshot.py), since a database connection cannot be used
+after a fork.
+"""
+
+# Standard library module imports
+import json                     # Object encoding
+import sqlite3                  # Fish store database
+import threading                # Database and cache lock
+import time                     # Restore timing
+from collections import OrderedDict     # LRU ordering
+
+# Third party module imports
+from flask import g             # Objects pinned by a request
+from flask import has_request_context   # Pinning only in requests
+
+# Local module imports
+from fish_data import fish      # Fish data
+from fish_data import FishDict  # Fish dictionary type
+import fishem_filter            # $filter comparisons
+import fishem_links             # Reverse-link index
+import fishem_members           # Collection membership index
+import fishem_subtree           # Subtree index
+
+# Constants
+DEFAULT_STORE_FILE = 'fishstore.db'
+DEFAULT_CACHE_OBJECTS = 10000
+COLD = object()                 # Value for objects not in the cache
+MISSING = object()
+UPSERT = ('INSERT INTO fish (key, value) VALUES (?, ?) '
+          'ON CONFLICT (key) DO UPDATE SET value = excluded.value')
+NUMBER_TYPES = "('true', 'false', 'integer', 'real')"
+SWAPPED = {'eq': 'eq', 'ne': 'ne', 'gt': 'lt', 'ge': 'le',
+           'lt': 'gt', 'le': 'ge'}
+SQL_OPERATORS = {'eq': '=', 'gt': '>', 'ge': '>=', 'lt': '<', 'le': '<='}
+
+
+# Class: SqlFishDict
+
+class SqlFishDict(FishDict):
+    """FishDict for the SQLite fish store. Every key is in the
+    dictionary; the value for a key whose object is not in the cache
+    is COLD. 'hot' holds the keys of the cached objects, least
+    recently used first, 'pinned' the number of requests that have
+    pinned each key, and 'db' is the database connection; all are
+    used while holding 'store_lock'. While 'loading' is True,
+    changes are not committed one at a time."""
+
+    forkable = False
+
+    def fetch(self, key):
+        """Returns the object for 'key' from the database, or MISSING
+        if it is not there. The caller must hold the lock."""
+        row = self.db.execute('SELECT value FROM fish WHERE key = ?',
+                              (key,)).fetchone()
+        return MISSING if row is None else json.loads(row[0])
+        # End of fetch()
+
+    def load(self, key):
+        """Returns the object for 'key', reading it into the cache if
+        it is not there, or MISSING if 'key' is not in the fish."""
+        with self.store_lock:
+            value = dict.get(self, key, MISSING)
+            if value is COLD:
+                value = self.fetch(key)
+                if value is not MISSING:
+                    dict.__setitem__(self, key, value)
+                    self.keep(key)
+            elif value is not MISSING:
+                self.hot.move_to_end(key)
+                self.pin(key)
+            return value
+        # End of load()
+
+    def keep(self, key):
+        """Marks 'key' as the most recently used cached object, pins
+        it for the current request, and evicts the least recently
+        used objects if the cache is full. The caller must hold the
+        lock."""
+        self.hot[key] = None
+        self.hot.move_to_end(key)
+        self.pin(key)
+        self.evict()
+        # End of keep()
+
+    def evict(self):
+        """Evicts the least recently used cached objects that are not
+        pinned until the cache is no longer full. The caller must hold
+        the lock."""
+        while len(self.hot) > self.cache_objects:
+            for old_key in self.hot:
+                if old_key not in self.pinned:
+                    break
+            else:
+                # Everything is pinned; evict once requests end
+                return
+            del self.hot[old_key]
+            dict.__setitem__(self, old_key, COLD)
+        # End of evict()
+
+    def pin(self, key):
+        """Keeps cached object 'key' in the cache until the current
+        request (if any) ends. The caller must hold the lock."""
+        if not has_request_context():
+            return
+        pins = g.setdefault('fish_pins', set())
+        if key not in pins:
+            pins.add(key)
+            self.pinned[key] = self.pinned.get(key, 0) + 1
+        # End of pin()
+
+    def unpin(self, keys):
+        """Releases the pins on 'keys' made by a request that has
+        ended."""
+        with self.store_lock:
+            for key in keys:
+                count = self.pinned.pop(key, 1) - 1
+                if count:
+                    self.pinned[key] = count
+            self.evict()
+        # End of unpin()
+
+    def used(self, key):
+        """Marks cached object 'key' as the most recently used one."""
+        try:
+            self.hot.move_to_end(key)
+        except KeyError:
+            # Evicted or deleted by another thread
+            pass
+        # End of used()
+
+    def write(self, key, value):
+        """Writes the object 'value' for 'key' to the database. The
+        caller must hold the lock."""
+        self.db.execute(UPSERT, (key, json.dumps(value)))
+        if not self.loading:
+            self.db.commit()
+        # End of write()
+
+    def remove(self, key):
+        """Deletes 'key' from the database and the cache. The caller
+        must hold the lock."""
+        self.db.execute('DELETE FROM fish WHERE key = ?', (key,))
+        if not self.loading:
+            self.db.commit()
+        dict.__delitem__(self, key)
+        self.hot.pop(key, None)
+        # End of remove()
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if value is not COLD and not has_request_context():
+            self.used(key)
+            return value
+        value = self.load(key)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        with self.store_lock:
+            self.write(key, value)
+            dict.__setitem__(self, key, value)
+            self.keep(key)
+        for listener in self.listeners:
+            listener(key)
+
+    def __delitem__(self, key):
+        with self.store_lock:
+            if key not in self:
+                raise KeyError(key)
+            self.remove(key)
+        for listener in self.listeners:
+            listener(key)
+
+    def get(self, key, default=None):
+        value = dict.get(self, key, MISSING)
+        if value is COLD or (value is not MISSING and
+                             has_request_context()):
+            value = self.load(key)
+        elif value is not MISSING:
+            self.used(key)
+        return default if value is MISSING else value
+
+    def peek(self, key, default=None):
+        value = dict.get(self, key, MISSING)
+        if value is COLD:
+            with self.store_lock:
+                value = dict.get(self, key, MISSING)
+                if value is COLD:
+                    value = self.fetch(key)
+        return default if value is MISSING else value
+
+    def pop(self, key, *default):
+        with self.store_lock:
+            value = dict.get(self, key, MISSING)
+            if value is MISSING:
+                if default:
+                    return default[0]
+                raise KeyError(key)
+            if value is COLD:
+                value = self.fetch(key)
+            self.remove(key)
+        for listener in self.listeners:
+            listener(key)
+        return value
+
+    def popitem(self):
+        with self.store_lock:
+            if not self:
+                raise KeyError('popitem(): dictionary is empty')
+            key = next(reversed(self))
+        return key, self.pop(key)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self):
+        with self.store_lock:
+            self.db.execute('DELETE FROM fish')
+            if not self.loading:
+                self.db.commit()
+            self.hot.clear()
+            keys = list(self)
+            dict.clear(self)
+        for key in keys:
+            for listener in self.listeners:
+                listener(key)
+
+    def touch(self, key):
+        # The Members list is written as it is read
+        fishem_members.sync(key)
+        with self.store_lock:
+            value = dict.get(self, key, MISSING)
+            if value is COLD:
+                print('Changes to fish object', key, 'were lost; it '
+                      'was evicted from the SQLite fish store cache')
+            elif value is not MISSING:
+                self.write(key, value)
+        FishDict.touch(self, key)
+
+    def items(self):
+        items = []
+        for key in list(self):
+            value = self.peek(key, MISSING)
+            if value is not MISSING:
+                items.append((key, value))
+        return items
+
+    def values(self):
+        return [value for key, value in self.items()]
+
+    def copy(self):
+        return dict(self.items())
+
+
+# Function: open_store()
+
+def open_store(store_file):
+    """Returns a connection to the fish store database 'store_file',
+    creating it if needed."""
+    db = sqlite3.connect(store_file, check_same_thread=False)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute('PRAGMA synchronous=FULL')
+    db.execute('CREATE TABLE IF NOT EXISTS fish '
+               '(key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    db.commit()
+    return db
+
+    # End of open_store()
+
+
+# Function: start()
+
+def start(config):
+    """Switches the fish to the SQLite fish store, if configuration
+    parameter "fishStore" is "sqlite". Returns True if the fish was
+    restored from the database; otherwise the current fish objects
+    are written to it, and the inputs are loaded until finish_load()
+    is called."""
+    if config.get('fishStore', 'dict') != 'sqlite':
+        return False
+    store_file = config.get('fishStoreFile') or DEFAULT_STORE_FILE
+    if config.get('lazyFish'):
+        print('The input fish file is not loaded lazily with the SQLite '
+              'fish store')
+        config['lazyFish'] = False
+
+    start_time = time.perf_counter()
+    try:
+        db = open_store(store_file)
+        keys = [row[0] for row in
+                db.execute('SELECT key FROM fish ORDER BY rowid')]
+    except Exception as error:
+        print('Failed to open the SQLite fish store "', store_file,
+              '":', sep='')
+        print(error)
+        # Failure exit; cannot continue
+        print('fishem ending')
+        exit(1)
+
+    # Switch the fish to the store; both classes keep their keys in
+    # the same dictionary, so the fish object itself is unchanged for
+    # every module that has imported it
+    if keys:
+        fish.clear()
+    fish.store_lock = threading.RLock()
+    fish.hot = OrderedDict()
+    fish.pinned = {}
+    fish.cache_objects = max(int(config.get('fishStoreCacheObjects',
+                                            DEFAULT_CACHE_OBJECTS)), 1)
+    fish.db = db
+    fish.loading = True
+    fish.__class__ = SqlFishDict
+
+    if not keys:
+        # A new store; save the objects set up by the API modules
+        for key in list(fish):
+            fish.write(key, dict.__getitem__(fish, key))
+            fish.keep(key)
+        print('Keeping the fish in the SQLite fish store "', store_file,
+              '"', sep='')
+        return False
+
+    # Restore the fish from the store; objects are read when used
+    dict.update(fish, ((key, COLD) for key in keys))
+    fishem_subtree.add_keys(sorted(keys))
+    fishem_links.add_keys(keys)
+    finish_load()
+    print('Restored the fish from the SQLite fish store "', store_file,
+          '" (', len(keys), ' objects in %.3f seconds)' %
+          (time.perf_counter() - start_time), sep='')
+    return True
+
+    # End of start()
+
+
+# Function: finish_load()
+
+def finish_load():
+    """Commits the fish objects loaded at startup, and commits each
+    change from now on."""
+    if type(fish) is not SqlFishDict:
+        return
+    with fish.store_lock:
+        fish.db.commit()
+        fish.loading = False
+    return
+
+    # End of finish_load()
+
+
+# Function: stop()
+
+def stop():
+    """Closes the SQLite fish store; every change is already committed.
+    """
+    if type(fish) is not SqlFishDict:
+        return
+    with fish.store_lock:
+        fish.db.commit()
+        fish.db.close()
+    return
+
+    # End of stop()
+
+
+# Function: teardown_request()
+
+def teardown_request(error):
+    """Flask teardown_request handler; lets the fish objects pinned by
+    the request be evicted from the SQLite fish store cache again."""
+    pins = g.pop('fish_pins', None)
+    if pins and type(fish) is SqlFishDict:
+        fish.unpin(pins)
+    return
+
+    # End of teardown_request()
+
+
+# Function: json_path()
+
+def json_path(names):
+    """Returns the JSON1 path for property path 'names'."""
+    return '$' + ''.join('."' + name + '"' for name in names)
+
+    # End of json_path()
+
+
+# Function: sql_comparison()
+
+def sql_comparison(op, names, literal):
+    """Returns the SQL condition (and its parameters) for comparing
+    property path 'names' of the member object with 'literal', with
+    the same result as the Python comparison in fishem_filter.py, or
+    None if it cannot be made in SQL."""
+    path = json_path(names)
+    if literal is None:
+        # Only eq and ne can compare with null; a missing property
+        # is null
+        if op not in ('eq', 'ne'):
+            return '0', []
+        sql = "COALESCE(json_type(f.value, ?) = 'null', 1)"
+        return (sql if op == 'eq' else 'NOT ' + sql), [path]
+    if type(literal) is str:
+        types = "('text')"
+    elif type(literal) is int and not -2**63 <= literal < 2**63:
+        return None
+    else:
+        # JSON true and false compare as 1 and 0, as they do in Python
+        types = NUMBER_TYPES
+    sql = 'COALESCE(json_type(f.value, ?) IN %s AND ' \
+          'json_extract(f.value, ?) %s ?, 0)' % \
+          (types, SQL_OPERATORS['eq' if op == 'ne' else op])
+    return (sql if op != 'ne' else 'NOT ' + sql), [path, path, literal]
+
+    # End of sql_comparison()
+
+
+# Function: sql_condition()
+
+def sql_condition(expr):
+    """Returns the SQL condition (and its parameters) for $filter
+    expression tree 'expr' (see fishem_filter.py), or None if it
+    cannot be made in SQL."""
+    kind = expr[0]
+    if kind in ('or', 'and'):
+        sqls = []
+        params = []
+        for term in expr[1]:
+            condition = sql_condition(term)
+            if condition is None:
+                return None
+            sqls.append(condition[0])
+            params.extend(condition[1])
+        return '(' + (' ' + kind.upper() + ' ').join(sqls) + ')', params
+    if kind == 'not':
+        condition = sql_condition(expr[1])
+        if condition is None:
+            return None
+        return '(NOT ' + condition[0] + ')', condition[1]
+    op, left, right = expr[1:]
+    if left[0] == 'literal' and right[0] == 'literal':
+        try:
+            return ('1' if fishem_filter.COMPARISONS[op](left[1], right[1])
+                    else '0'), []
+        except TypeError:
+            return '0', []
+    if left[0] == 'path' and right[0] == 'path':
+        return None
+    if left[0] == 'literal':
+        op, left, right = SWAPPED[op], right, left
+    return sql_comparison(op, left[1], right[1])
+
+    # End of sql_condition()
+
+
+# Function: match_members()
+
+def match_members(member_keys, compiled):
+    """Returns the positions in 'member_keys' (the fish keys of the
+    Members of a collection, or None for Members that are not links
+    to fish objects) of the member objects selected by compiled
+    $filter 'compiled', or None if the filter is not run in SQL."""
+    if type(fish) is not SqlFishDict:
+        return None
+    condition = sql_condition(compiled.expr)
+    if condition is None:
+        return None
+    sql, params = condition
+    with fish.store_lock:
+        rows = fish.db.execute(
+            'SELECT m.key FROM json_each(?) AS m '
+            'JOIN fish AS f ON f.key = m.value '
+            'WHERE ' + sql + ' ORDER BY m.key',
+            [json.dumps(member_keys)] + params).fetchall()
+    return [row[0] for row in rows]
+
+    # End of match_members()
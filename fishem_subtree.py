@@ -0,0 +1,214 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Subtree index for the fish.
+
+fish keys are resource paths, so the objects subordinate to a
+resource are the ones whose keys continue its path. This module
+keeps all fish keys in a path-segment trie that is updated whenever
+an object is added to or deleted from the fish (see FishDict in
+fish_data.py). Finding or deleting the objects at and below a key
+then takes time proportional to the number of objects found, rather
+than to the size of the fish.
+
+Keys are matched on whole path segments, so the subtree of
+'/redfish/v1/Systems/1' includes '/redfish/v1/Systems/1/Storage' but
+not '/redfish/v1/Systems/10'.
+
+Keys added in bulk by a lazily loaded fish (see fishem_lazyfish.py)
+are kept in a sorted list instead of the trie, and are found there
+by binary search.
+
+Any module can use these functions:
+    subtree_keys(key)       Keys of the objects at and below 'key'
+    delete_subtree(key)     Deletes the objects at and below 'key'
+    add_keys(sorted_keys)   Adds keys in bulk, in sorted order
+"""
+
+# Standard library module imports
+import bisect                   # Bulk key search
+import threading                # Index lock
+
+# Third party module imports
+# None
+
+# Local module imports
+from fish_data import fish      # Fish data
+
+# Constants
+# None
+
+
+# Class: KeyTrieNode
+
+class KeyTrieNode:
+    """One path segment level of a KeyTrie."""
+
+    __slots__ = ('children', 'present')
+
+    def __init__(self):
+        self.children = {}      # Path segment -> KeyTrieNode
+        self.present = False    # True if this path is a fish key
+
+
+# Class: KeyTrie
+
+class KeyTrie:
+    """Path-segment trie of fish keys."""
+
+    def __init__(self):
+        self.root = KeyTrieNode()
+        self.bulk = []          # Keys added in bulk, sorted
+        self.lock = threading.Lock()
+
+    def add(self, key):
+        """Adds 'key' to the trie."""
+        with self.lock:
+            node = self.root
+            for seg in key.split('/'):
+                child = node.children.get(seg)
+                if child is None:
+                    child = node.children[seg] = KeyTrieNode()
+                node = child
+            node.present = True
+        return
+        # End of add()
+
+    def remove(self, key):
+        """Removes 'key' from the trie, along with any path segment
+        nodes that no longer lead to a key."""
+        with self.lock:
+            path = [self.root]
+            segs = key.split('/')
+            for seg in segs:
+                node = path[-1].children.get(seg)
+                if node is None:
+                    return
+                path.append(node)
+            path[-1].present = False
+            # Prune empty nodes, from the bottom up
+            for index in range(len(segs), 0, -1):
+                node = path[index]
+                if node.present or node.children:
+                    break
+                del path[index - 1].children[segs[index - 1]]
+        return
+        # End of remove()
+
+    def add_bulk(self, sorted_keys):
+        """Adds the keys in list 'sorted_keys', in sorted order."""
+        with self.lock:
+            if self.bulk:
+                self.bulk = sorted(set(self.bulk).union(sorted_keys))
+            else:
+                self.bulk = sorted_keys
+        return
+        # End of add_bulk()
+
+    def bulk_below(self, key):
+        """Returns a list of the keys at and below 'key' that were
+        added in bulk and are still in the fish, in sorted order."""
+        bulk = self.bulk
+        keys = []
+        index = bisect.bisect_left(bulk, key)
+        if index < len(bulk) and bulk[index] == key and key in fish:
+            keys.append(key)
+        # Keys below 'key' sort between key + '/' and key + '0'
+        start = bisect.bisect_left(bulk, key + '/', index)
+        end = bisect.bisect_left(bulk, key + '0', start)
+        keys.extend(bulk_key for bulk_key in bulk[start:end]
+                    if bulk_key in fish)
+        return keys
+        # End of bulk_below()
+
+    def keys_below(self, key):
+        """Returns a list of the keys at and below 'key', parents
+        before their children, in the order they were added (or in
+        sorted order, if any keys were added in bulk)."""
+        with self.lock:
+            keys = self.bulk_below(key) if self.bulk else []
+            node = self.root
+            for seg in key.split('/'):
+                node = node.children.get(seg)
+                if node is None:
+                    return keys
+            if keys:
+                trie_keys = self.trie_below(key, node)
+                return sorted(set(keys).union(trie_keys))
+            return self.trie_below(key, node)
+        # End of keys_below()
+
+    def trie_below(self, key, node):
+        """Returns a list of the keys in the trie at and below 'key',
+        whose trie node is 'node', in the order they were added."""
+        keys = []
+        stack = [(key, node)]
+        while stack:
+            path, node = stack.pop()
+            if node.present:
+                keys.append(path)
+            for seg, child in reversed(node.children.items()):
+                stack.append((path + '/' + seg, child))
+        return keys
+        # End of trie_below()
+
+
+# The subtree index of the fish
+index = KeyTrie()
+
+
+# Function: fish_changed()
+
+def fish_changed(key):
+    """fish listener; keeps the subtree index up to date."""
+    if key in fish:
+        index.add(key)
+    else:
+        index.remove(key)
+    return
+
+    # End of fish_changed()
+
+
+# Function: subtree_keys()
+
+def subtree_keys(key):
+    """Returns a list of the fish keys at and below 'key', on whole
+    path segment boundaries, parents before their children."""
+    return index.keys_below(key)
+
+    # End of subtree_keys()
+
+
+# Function: add_keys()
+
+def add_keys(sorted_keys):
+    """Adds the fish keys in list 'sorted_keys', in sorted order, to
+    the subtree index all at once; for a lazily loaded fish (see
+    fishem_lazyfish.py), whose keys are added without calling the
+    fish listeners."""
+    index.add_bulk(sorted_keys)
+    return
+
+    # End of add_keys()
+
+
+# Function: delete_subtree()
+
+def delete_subtree(key):
+    """Deletes the fish objects at and below 'key', on whole path
+    segment boundaries. Returns a list of the keys deleted."""
+    del_keys = subtree_keys(key)
+    # Delete children before their parents
+    for del_key in reversed(del_keys):
+        fish.pop(del_key, None)
+    return del_keys
+
+    # End of delete_subtree()
+
+
+# Index any fish objects that are already present, then keep the
+# index up to date
+for fish_key in list(fish):
+    index.add(fish_key)
+fish.listeners.append(fish_changed)
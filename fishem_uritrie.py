@@ -0,0 +1,269 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Trie-based URI dispatcher for fishem.
+
+Optional replacement for the Werkzeug URL map. Instead of adding
+two Flask URL rules (with and without a trailing slash) for every
+URI an API module registers, all URI patterns are compiled into a
+single path-segment trie. Flask is given one catch-all rule, and
+each request is routed through the trie to the same flask_restful
+Resource classes the Werkzeug map would have used.
+
+Trailing slashes are normalized once, when a pattern is added and
+when a request path is matched, so per-request match cost depends
+on the number of path segments rather than the number of URIs.
+
+Select this dispatcher with "uriDispatcher": "trie" in the fishem
+config file, or with --uriDispatcher trie on the command line.
+"""
+
+# Standard library module imports
+import re                       # Mixed literal/variable segments
+
+# Third party module imports
+from flask import request               # Request path and method
+from flask import make_response         # Allow header handling
+from werkzeug.exceptions import NotFound    # Unknown URI handling
+
+# Local module imports
+import fishem_httpcodes as HTTP         # HTTP status codes
+
+# Constants
+DISPATCH_ENDPOINT = 'fishem_uritrie_dispatch'
+DISPATCH_METHODS = ['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE',
+                    'OPTIONS']
+URI_VAR_RE = re.compile(r'<(?:(\w+):)?(\w+)>')
+
+
+# Class: UriTrieNode
+
+class UriTrieNode:
+    """One path segment level of a UriTrie."""
+
+    __slots__ = ('static', 'mixed', 'param', 'path', 'target')
+
+    def __init__(self):
+        self.static = {}        # Literal segment -> UriTrieNode
+        self.mixed = []         # (Segment regex, UriTrieNode) list
+        self.param = None       # <string:...> segment UriTrieNode
+        self.path = None        # <path:...> segment(s) UriTrieNode
+        self.target = None      # (target, variable names) or None
+
+
+# Class: UriTrie
+
+class UriTrie:
+    """Path-segment trie of flask-style URI patterns.
+
+    Patterns use the same syntax as the API modules pass to
+    flask_restful, for example:
+        /redfish/v1/Systems/<string:ComputerSystemId>
+        /fishdoctor/<path:UriPath>/Actions/<string:UriAction>
+
+    A segment can also mix literal text and variables, such as
+    'NetworkDeviceFunctions<string:NetworkDeviceFunctionId>'.
+
+    Literal segments are matched first, then mixed segments, then
+    <string:> segments, and finally <path:> segments, in the same
+    way that the Werkzeug map prefers more specific rules.
+    """
+
+    def __init__(self):
+        self.root = UriTrieNode()
+        self.pattern_count = 0
+
+    def add(self, pattern, target):
+        """Adds 'pattern' to the trie, routing to 'target'. Returns
+        False if an equivalent pattern was already present (the
+        first pattern added wins), True otherwise."""
+        node = self.root
+        var_names = []
+        for seg in split_path(pattern):
+            var_match = URI_VAR_RE.fullmatch(seg)
+            if var_match is None and '<' in seg:
+                # Mixed segment: literal text with variable(s)
+                seg_re = ''
+                last = 0
+                for var in URI_VAR_RE.finditer(seg):
+                    seg_re += re.escape(seg[last:var.start()]) + '(.+?)'
+                    var_names.append(var.group(2))
+                    last = var.end()
+                seg_re = re.compile(seg_re + re.escape(seg[last:]))
+                for mixed_re, child in node.mixed:
+                    if mixed_re.pattern == seg_re.pattern:
+                        break
+                else:
+                    child = UriTrieNode()
+                    node.mixed.append((seg_re, child))
+                node = child
+            elif var_match is not None:
+                # Variable segment: <name> or <converter:name>
+                conv, name = var_match.groups()
+                var_names.append(name)
+                if conv == 'path':
+                    if node.path is None:
+                        node.path = UriTrieNode()
+                    node = node.path
+                else:
+                    if node.param is None:
+                        node.param = UriTrieNode()
+                    node = node.param
+            else:
+                child = node.static.get(seg)
+                if child is None:
+                    child = node.static[seg] = UriTrieNode()
+                node = child
+        if node.target is not None:
+            return False
+        node.target = (target, tuple(var_names))
+        self.pattern_count += 1
+        return True
+        # End of add()
+
+    def match(self, path):
+        """Matches 'path' against the trie. Returns a tuple with the
+        target and a dictionary of URI variables, or (None, None)
+        if nothing matches."""
+        segs = split_path(path)
+        values = []
+        node = _match(self.root, segs, 0, values)
+        if node is None:
+            return None, None
+        target, var_names = node.target
+        return target, dict(zip(var_names, values))
+        # End of match()
+
+
+# Function: split_path()
+
+def split_path(path):
+    """Splits a URI path into segments, ignoring the leading slash
+    and any trailing slash (trailing slashes are normalized here,
+    once, for both patterns and request paths)."""
+    path = path.strip('/')
+    if not path:
+        return []
+    return path.split('/')
+
+    # End of split_path()
+
+
+# Function: _match()
+
+def _match(node, segs, index, values):
+    """Recursive worker for UriTrie.match(). Appends the values of
+    matched URI variables to 'values' and returns the matching
+    node, or None."""
+    if index == len(segs):
+        return node if node.target is not None else None
+    seg = segs[index]
+    # Literal segments first
+    child = node.static.get(seg)
+    if child is not None:
+        found = _match(child, segs, index + 1, values)
+        if found is not None:
+            return found
+    # Then segments mixing literal text and variables
+    for mixed_re, child in node.mixed:
+        mixed_match = mixed_re.fullmatch(seg)
+        if mixed_match is not None:
+            values.extend(mixed_match.groups())
+            found = _match(child, segs, index + 1, values)
+            if found is not None:
+                return found
+            del values[len(values) - len(mixed_match.groups()):]
+    # Then a single <string:> segment
+    if node.param is not None and seg:
+        values.append(seg)
+        found = _match(node.param, segs, index + 1, values)
+        if found is not None:
+            return found
+        values.pop()
+    # Then one or more segments for <path:>, shortest first, so
+    # that any literal segments after the <path:> get matched
+    if node.path is not None and seg:
+        for end in range(index + 1, len(segs) + 1):
+            values.append('/'.join(segs[index:end]))
+            found = _match(node.path, segs, end, values)
+            if found is not None:
+                return found
+            values.pop()
+    return None
+
+    # End of _match()
+
+
+# Class: TrieDispatcher
+
+class TrieDispatcher:
+    """Stands in for the flask_restful Api object that is passed to
+    the activate() function of each API module.
+
+    add_resource() has the same signature as the flask_restful
+    version, but adds URIs to a UriTrie instead of to the Flask URL
+    map. All other attributes (such as mediatypes()) are passed
+    through to the real flask_restful Api object.
+    """
+
+    def __init__(self, rest_api):
+        self.rest_api = rest_api
+        self.trie = UriTrie()
+        self.uri_count = 0
+
+    def __getattr__(self, name):
+        # Anything not defined here comes from the flask_restful Api
+        return getattr(self.rest_api, name)
+
+    def add_resource(self, resource, *urls, **kwargs):
+        """Registers 'resource' for 'urls'. Mirrors what
+        flask_restful does in Api._register_view(), except for the
+        Flask URL rules."""
+        endpoint = kwargs.pop('endpoint', None) or resource.__name__.lower()
+        resource_class_args = kwargs.pop('resource_class_args', ())
+        resource_class_kwargs = kwargs.pop('resource_class_kwargs', {})
+        resource.mediatypes = self.rest_api.mediatypes_method()
+        resource.endpoint = endpoint
+        view = self.rest_api.output(resource.as_view(endpoint,
+            *resource_class_args, **resource_class_kwargs))
+        for decorator in self.rest_api.decorators:
+            view = decorator(view)
+        for url in urls:
+            self.uri_count += 1
+            self.trie.add(url, (resource, view))
+        return
+        # End of add_resource()
+
+    def install(self, flask_app):
+        """Adds the catch-all URL rules that route every request
+        through dispatch()."""
+        flask_app.add_url_rule('/', DISPATCH_ENDPOINT, self.dispatch,
+            methods=DISPATCH_METHODS, provide_automatic_options=False)
+        flask_app.add_url_rule('/<path:uri_path>', DISPATCH_ENDPOINT,
+            self.dispatch, methods=DISPATCH_METHODS,
+            provide_automatic_options=False)
+        return
+        # End of install()
+
+    def dispatch(self, uri_path=''):
+        """Flask view function for all URIs. Finds the Resource for
+        the request path and calls its flask_restful view."""
+        target, uri_vars = self.trie.match(request.path)
+        if target is None:
+            raise NotFound()
+        resource, view = target
+        # Provide the 405 and OPTIONS handling that Flask would
+        # otherwise derive from the URL rule methods
+        allowed = set(resource.methods or ())
+        if 'GET' in allowed:
+            allowed.add('HEAD')
+        if request.method == 'OPTIONS' and 'OPTIONS' not in allowed:
+            resp = make_response('', HTTP.OK)
+            resp.headers['Allow'] = ', '.join(sorted(allowed | {'OPTIONS'}))
+            return resp
+        if request.method not in allowed:
+            resp = make_response('', HTTP.METHOD_NOT_ALLOWED)
+            resp.headers['Allow'] = ', '.join(sorted(allowed | {'OPTIONS'}))
+            return resp
+        return view(**uri_vars)
+        # End of dispatch()
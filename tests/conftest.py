@@ -0,0 +1,190 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Shared fixtures for the fishem tests.
+
+The fish and the indexes kept by the fishem modules are shared by
+every test in a run, so tests that use the running emulator ('client')
+only change objects they create themselves, and tests that must start
+from their own fish (journal recovery, lazily loaded fish, the mockup
+cache) run fishem code in a separate Python process ('run_python').
+Scripts run that way can import this module, for start_fishem() and
+write_mockup().
+"""
+
+# Standard library module imports
+import json                     # Mockup files
+import os                       # File handling
+import subprocess               # Separate fishem processes
+import sys                      # Module path, Python executable
+import textwrap                 # Separate process scripts
+
+# Third party module imports
+import flask                    # Flask app capture
+import pytest                   # Fixtures
+
+# Constants
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+SENSORS = 30
+HEALTH = ('OK', 'Warning', 'Critical')
+
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+# Function: write_json()
+
+def write_json(file_path, obj):
+    """Writes 'obj' as JSON to 'file_path', making its directory."""
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as json_file:
+        json.dump(obj, json_file, indent=4)
+    return
+
+    # End of write_json()
+
+
+# Function: sensor()
+
+def sensor(number):
+    """Returns the mockup object for Sensor 'number' of Chassis 1."""
+    return {'@odata.id': '/redfish/v1/Chassis/1/Sensors/S%d' % number,
+            '@odata.type': '#Sensor.v1_5_0.Sensor',
+            'Id': 'S%d' % number, 'Name': 'Sensor %d' % number,
+            'Reading': number * 1.5, 'ReadingUnits': 'Cel',
+            'Status': {'State': 'Enabled',
+                       'Health': HEALTH[number % len(HEALTH)]}}
+
+    # End of sensor()
+
+
+# Function: write_mockup()
+
+def write_mockup(mockup_dir, sensors=SENSORS):
+    """Writes a small mockup to 'mockup_dir': the service root, a
+    Chassis collection with one Chassis, and a Sensor collection with
+    'sensors' Sensors."""
+    link = lambda key: {'@odata.id': key}
+    write_json(os.path.join(mockup_dir, 'index.json'),
+               {'@odata.id': '/redfish/v1', 'Id': 'RootService',
+                'Chassis': link('/redfish/v1/Chassis')})
+    write_json(os.path.join(mockup_dir, 'Chassis', 'index.json'),
+               {'@odata.id': '/redfish/v1/Chassis',
+                '@odata.type': '#ChassisCollection.ChassisCollection',
+                'Members': [link('/redfish/v1/Chassis/1')],
+                'Members@odata.count': 1})
+    write_json(os.path.join(mockup_dir, 'Chassis', '1', 'index.json'),
+               {'@odata.id': '/redfish/v1/Chassis/1', 'Id': '1',
+                'Sensors': link('/redfish/v1/Chassis/1/Sensors'),
+                'Links': {'Contains': [link('/redfish/v1/Chassis')]}})
+    sensors_dir = os.path.join(mockup_dir, 'Chassis', '1', 'Sensors')
+    write_json(os.path.join(sensors_dir, 'index.json'),
+               {'@odata.id': '/redfish/v1/Chassis/1/Sensors',
+                '@odata.type': '#SensorCollection.SensorCollection',
+                'Members': [link('/redfish/v1/Chassis/1/Sensors/S%d' %
+                                 number) for number in range(sensors)],
+                'Members@odata.count': sensors})
+    for number in range(sensors):
+        write_json(os.path.join(sensors_dir, 'S%d' % number, 'index.json'),
+                   sensor(number))
+    metadata_dir = os.path.join(mockup_dir, '$metadata')
+    os.makedirs(metadata_dir, exist_ok=True)
+    with open(os.path.join(metadata_dir, 'index.xml'), 'w') as xml_file:
+        xml_file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                       '<edmx:Edmx xmlns:edmx="http://docs.oasis-open.org'
+                       '/odata/ns/edmx" Version="4.0">\n'
+                       '  <edmx:DataServices/>\n</edmx:Edmx>\n')
+    return
+
+    # End of write_mockup()
+
+
+# Function: start_fishem()
+
+def start_fishem(*args):
+    """Runs fishem.main() with command line arguments 'args', without
+    starting its HTTP server. Returns the Flask app."""
+    apps = []
+    old_dir = os.getcwd()
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(flask.Flask, 'run',
+                      lambda self, *args, **kwargs: apps.append(self))
+        patch.setattr(sys, 'argv', ['fishem.py'] + list(args))
+        # API modules are found relative to the current directory
+        os.chdir(REPO_DIR)
+        try:
+            import fishem
+            fishem.main()
+        finally:
+            os.chdir(old_dir)
+    return apps[0]
+
+    # End of start_fishem()
+
+
+# Fixture: mockup_dir()
+
+@pytest.fixture
+def mockup_dir(tmp_path):
+    """Writes a small mockup (see write_mockup()), and returns its
+    directory."""
+    mockup_dir = str(tmp_path / 'mockup')
+    write_mockup(mockup_dir)
+    return mockup_dir
+
+    # End of mockup_dir()
+
+
+# Fixture: emulator()
+
+@pytest.fixture(scope='session')
+def emulator(tmp_path_factory):
+    """Starts fishem (without its HTTP server) on a small mockup with
+    fishdoctor enabled. Returns the Flask app and the work directory.
+    """
+    work_dir = tmp_path_factory.mktemp('emulator')
+    mockup_dir = str(work_dir / 'mockup')
+    write_mockup(mockup_dir)
+    os.makedirs(work_dir / 'snapshots')
+    app = start_fishem('--imockup', mockup_dir, '--fishdoctorEnabled',
+                       '--snapshotFile',
+                       str(work_dir / 'snapshots' / 'fish.json'))
+    return app, work_dir
+
+    # End of emulator()
+
+
+# Fixture: client()
+
+@pytest.fixture
+def client(emulator):
+    """Returns a Flask test client for the running emulator."""
+    return emulator[0].test_client()
+
+    # End of client()
+
+
+# Fixture: run_python()
+
+@pytest.fixture
+def run_python():
+    """Returns a function that runs a Python script with arguments in
+    a separate process, with the fishem modules and this module
+    importable, and returns its standard output. The test fails if
+    the script fails."""
+
+    def run(script, *args):
+        env = dict(os.environ,
+                   PYTHONPATH=os.pathsep.join((REPO_DIR, TESTS_DIR)))
+        result = subprocess.run([sys.executable, '-c',
+                                 textwrap.dedent(script)] + list(args),
+                                cwd=REPO_DIR, env=env,
+                                capture_output=True, text=True,
+                                timeout=120)
+        assert result.returncode == 0, result.stdout + result.stderr
+        return result.stdout
+
+    return run
+
+    # End of run_python()
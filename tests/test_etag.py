@@ -0,0 +1,98 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for ETags (fishem_etag.py): conditional GETs, and If-Match on
+changes through the generic resource engine and FishDoctor.
+"""
+
+# Standard library module imports
+# None
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_members           # Collection membership index
+
+# Constants
+CHASSIS_URI = '/redfish/v1/Chassis'
+SENSOR_KEY = '/redfish/v1/Chassis/1/Sensors/S29'
+FISHDOCTOR_URI = '/fishdoctor/Chassis/1/Sensors/S29'
+
+
+@pytest.fixture
+def chassis(client):
+    """Adds a Chassis with POST, and returns its URI."""
+    resp = client.post(CHASSIS_URI, json={'Id': 'ETagTest'})
+    assert resp.status_code == 201
+    uri = CHASSIS_URI + '/ETagTest'
+    yield uri
+    if uri in fish:
+        client.delete(uri)
+
+    # End of chassis()
+
+
+def test_post_returns_the_etag(client):
+    resp = client.post(CHASSIS_URI, json={'Id': 'ETagPost'})
+    try:
+        assert resp.status_code == 201
+        assert resp.headers['ETag'] == \
+            client.get(CHASSIS_URI + '/ETagPost').headers['ETag']
+    finally:
+        client.delete(CHASSIS_URI + '/ETagPost')
+
+
+def test_conditional_get(client, chassis):
+    etag = client.get(chassis).headers['ETag']
+    assert client.get(chassis, headers={'If-None-Match': etag}) \
+        .status_code == 304
+    client.patch(chassis, json={'Name': 'Changed'})
+    resp = client.get(chassis, headers={'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert resp.headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('method, body', [
+    ('put', {'@odata.id': CHASSIS_URI + '/ETagTest', 'Id': 'ETagTest'}),
+    ('patch', {'Name': 'New'}),
+    ('delete', None)])
+def test_if_match(client, chassis, method, body):
+    request = getattr(client, method)
+    resp = request(chassis, json=body, headers={'If-Match': '"bogus"'})
+    assert resp.status_code == 412
+    assert chassis in fish
+    etag = client.get(chassis).headers['ETag']
+    resp = request(chassis, json=body, headers={'If-Match': etag})
+    assert resp.status_code == 200
+
+
+@pytest.fixture
+def sensor_29():
+    """Restores Sensor S29 and its collection membership after a test
+    that may delete it."""
+    obj = fish[SENSOR_KEY]
+    yield SENSOR_KEY
+    if SENSOR_KEY not in fish:
+        fish[SENSOR_KEY] = obj
+        fishem_members.add_member(SENSOR_KEY.rsplit('/', 1)[0], SENSOR_KEY)
+
+    # End of sensor_29()
+
+
+def test_fishdoctor_patch_checks_if_match(client, sensor_29):
+    resp = client.patch(FISHDOCTOR_URI, json={'Reading': 1},
+                        headers={'If-Match': '"bogus"'})
+    assert resp.status_code == 412
+    assert fish[SENSOR_KEY]['Reading'] != 1
+
+
+def test_fishdoctor_delete_checks_if_match(client, sensor_29):
+    resp = client.delete(FISHDOCTOR_URI, headers={'If-Match': '"bogus"'})
+    assert resp.status_code == 412
+    assert SENSOR_KEY in fish
+    etag = client.get(SENSOR_KEY).headers['ETag']
+    resp = client.delete(FISHDOCTOR_URI, headers={'If-Match': etag})
+    assert resp.status_code == 200
+    assert SENSOR_KEY not in fish
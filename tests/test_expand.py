@@ -0,0 +1,118 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for $expand (fishem_query.py): cycles, shared objects, levels,
+and the limits on expanded responses.
+"""
+
+# Standard library module imports
+# None
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+import fish_data                # fishem config parameters
+from fish_data import fish      # Fish data
+import fishem_query             # Query parameters
+
+# Constants
+SENSORS_URI = '/redfish/v1/Chassis/1/Sensors'
+BASE = '/test/expand'
+
+
+# Function: link()
+
+def link(name):
+    """Returns a hyperlink to test object 'name'."""
+    return {'@odata.id': BASE + '/' + name}
+
+    # End of link()
+
+
+# Fixture: graph()
+
+@pytest.fixture
+def graph():
+    """Adds linked test objects to the fish: 'a' links to 'b' and 'c',
+    which both link to 'd', which links back to 'b'; 'coll' has 20
+    members that all link to 'x', which links to 5 objects."""
+    objects = {
+        'a': {'B': link('b'), 'C': link('c')},
+        'b': {'D': link('d')},
+        'c': {'D': link('d')},
+        'd': {'B': link('b')},
+        'coll': {'Members': [link('m%d' % n) for n in range(20)]},
+        'x': {'Y': [link('y%d' % n) for n in range(5)]},
+    }
+    objects.update(('m%d' % n, {'X': link('x')}) for n in range(20))
+    objects.update(('y%d' % n, {'Id': n}) for n in range(5))
+    for name, obj in objects.items():
+        fish[BASE + '/' + name] = dict(obj, **link(name))
+    yield
+    for name in objects:
+        del fish[BASE + '/' + name]
+
+    # End of graph()
+
+
+# Function: expand()
+
+def expand(name, levels, max_objects=10000):
+    """Returns the expanded test object 'name', and the number of
+    objects expanded."""
+    expander = fishem_query.Expander('*', max_objects)
+    data = expander.expand_value(fish[BASE + '/' + name], levels, False,
+                                 frozenset((BASE + '/' + name,)))
+    return data, expander.objects
+
+    # End of expand()
+
+
+def test_expand_leaves_ancestors_as_links(graph):
+    data, objects = expand('a', 3)
+    # Under b, the link from d back to b is a cycle
+    assert data['B']['D']['B'] == link('b')
+    # Under c, b is not an ancestor, so it is expanded
+    assert data['C']['D']['B']['D'] == link('d')
+    assert objects == 5
+
+
+def test_expand_counts_every_copy_of_a_shared_object(graph):
+    data, objects = expand('coll', 3)
+    assert all(member['X']['Y'][4]['Id'] == 4
+               for member in data['Members'])
+    assert objects == 20 + 20 + 20 * 5
+
+
+def test_expand_limit_counts_memoized_objects(graph):
+    with pytest.raises(fishem_query.QueryError):
+        expand('coll', 3, max_objects=100)
+
+
+def test_expand_limit_in_requests(client, monkeypatch):
+    monkeypatch.setitem(fish_data.fishem_config, 'expandMaxObjects', 10)
+    resp = client.get(SENSORS_URI + '?$expand=.')
+    assert resp.status_code == 400
+    monkeypatch.setitem(fish_data.fishem_config, 'expandMaxObjects', 100)
+    resp = client.get(SENSORS_URI + '?$expand=.')
+    assert resp.status_code == 200
+    assert resp.json['Members'][3]['Id'] == 'S3'
+
+
+def test_expand_levels_and_links(client):
+    data = client.get('/redfish/v1/Chassis/1?$expand=~').json
+    assert data['Links']['Contains'][0]['Members'] == \
+        [{'@odata.id': '/redfish/v1/Chassis/1'}]
+    assert data['Sensors'] == {'@odata.id': SENSORS_URI}
+    data = client.get('/redfish/v1?$expand=*($levels=2)').json
+    assert data['Chassis']['Members'][0]['Id'] == '1'
+    assert client.get('/redfish/v1?$expand=*($levels=0)').status_code == \
+        400
+
+
+def test_expand_levels_are_limited(client, monkeypatch):
+    monkeypatch.setitem(fish_data.fishem_config, 'expandMaxLevels', 1)
+    data = client.get('/redfish/v1?$expand=*($levels=3)').json
+    assert data['Chassis']['Members'] == \
+        [{'@odata.id': '/redfish/v1/Chassis/1'}]
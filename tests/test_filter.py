@@ -0,0 +1,143 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for $filter parsing and compiled predicates (fishem_filter.py),
+and for the property indexes used to run them (fishem_propindex.py).
+"""
+
+# Standard library module imports
+import urllib.parse             # Query strings
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+import fish_data                # Emulator configuration
+import fishem_filter            # $filter expressions
+import fishem_propindex         # Property indexes
+
+# Constants
+MEMBERS = [
+    {'Id': '1', 'Reading': 10, 'Status': {'Health': 'OK'}, 'On': True},
+    {'Id': '2', 'Reading': 20.5, 'Status': {'Health': 'Critical'},
+     'On': False},
+    {'Id': '3', 'Reading': 'n/a', 'Status': {'Health': 'Warning'}},
+    {'Id': '4', 'Reading': None, 'Status': {}},
+    {'Id': "it's", 'Reading': 0, 'Status': {'Health': 'OK'}, 'On': 1},
+    {'Id': '6', 'Reading': 1e3, 'Status': 'OK'},
+]
+EXPRESSIONS = [
+    "Status/Health eq 'OK'",
+    "Status/Health ne 'OK'",
+    "Reading gt 10",
+    "Reading ge 10 and Reading lt 1000",
+    "Reading le 0 or Reading eq 'n/a'",
+    "Reading eq null",
+    "Reading ne null",
+    "Status/Health eq null",
+    "not (Status/Health eq 'Critical')",
+    "On eq true",
+    "On eq 1",
+    "On ne false",
+    "Id eq 'it''s'",
+    "10 lt Reading",
+    "'a' lt Reading",
+    "Reading gt null",
+    "1 eq 1 and Id eq '2'",
+    "Status/Health eq 'OK' or Status/Health eq 'Warning' and Reading "
+    "eq 'n/a'",
+]
+SENSORS_URI = '/redfish/v1/Chassis/1/Sensors'
+
+
+# Function: selected()
+
+def selected(text):
+    """Returns the Ids of the MEMBERS selected by $filter 'text'."""
+    compiled = fishem_filter.get_filter(text)
+    return [member['Id'] for member in MEMBERS
+            if compiled.predicate(member)]
+
+    # End of selected()
+
+
+def test_comparisons_and_missing_properties():
+    assert selected("Status/Health eq 'OK'") == ['1', "it's"]
+    assert selected("Status/Health eq null") == ['4', '6']
+    assert selected("Reading gt 10") == ['2', '6']
+    # A string and a number cannot be ordered
+    assert selected("Reading lt 'z'") == ['3']
+
+
+def test_and_binds_more_tightly_than_or():
+    assert selected("Id eq '1' or Id eq '2' and Reading eq 0") == ['1']
+    assert selected("(Id eq '1' or Id eq '2') and Reading eq 20.5") == \
+        ['2']
+    assert selected("not Id eq '1' and not Id eq '2'") == \
+        ['3', '4', "it's", '6']
+
+
+def test_index_terms():
+    compiled = fishem_filter.get_filter(
+        "Status/Health eq 'OK' and Reading gt 1")
+    assert compiled.index_terms == [('Status/Health', 'OK')]
+    assert fishem_filter.get_filter(
+        "Id eq '1' or Id eq '2'").index_terms == []
+
+
+def test_compiled_filters_are_reused():
+    assert fishem_filter.get_filter("Id eq '1'") is \
+        fishem_filter.get_filter("Id eq '1'")
+
+
+@pytest.mark.parametrize('text', [
+    '', 'Id eq', "Id eq '1' and", '(Id eq 1', 'Id eq 1)', 'Id xx 1',
+    "Id eq 'open", 'and eq 1', 'Id eq 1 Id eq 2'])
+def test_bad_expressions(text):
+    with pytest.raises(fishem_filter.FilterError):
+        fishem_filter.get_filter(text)
+
+
+# Function: filtered_ids()
+
+def filtered_ids(client, text):
+    """Returns the Ids of the sensors that a GET with $filter 'text'
+    returns."""
+    data = client.get(SENSORS_URI + '?$filter=' +
+                      urllib.parse.quote(text)).json
+    return [member['@odata.id'].split('/')[-1]
+            for member in data['Members']]
+
+    # End of filtered_ids()
+
+
+def test_indexed_filters_match_unindexed_filters(client, monkeypatch):
+    text = "Status/Health eq 'Critical'"
+    unindexed = filtered_ids(client, text)
+    assert 'S2' in unindexed
+    monkeypatch.setitem(fish_data.fishem_config, 'filterIndexes',
+                        ['Status/Health'])
+    assert filtered_ids(client, text) == unindexed
+    found = fishem_propindex.find_members(SENSORS_URI, 'Status/Health',
+                                          'Critical')
+    assert [member['@odata.id'].split('/')[-1] for member in found] == \
+        unindexed
+    # Paths that are not indexed are not looked up
+    assert fishem_propindex.find_members(SENSORS_URI, 'Reading', 3.0) \
+        is None
+
+
+def test_property_indexes_follow_changes(client, monkeypatch):
+    monkeypatch.setitem(fish_data.fishem_config, 'filterIndexes',
+                        ['Status/Health'])
+    text = "Status/Health eq 'Critical'"
+    before = filtered_ids(client, text)
+    sensor_uri = SENSORS_URI + '/S2'
+    assert client.patch(sensor_uri, json={
+        'Status': {'Health': 'OK'}}).status_code == 200
+    try:
+        assert filtered_ids(client, text) == \
+            [sensor_id for sensor_id in before if sensor_id != 'S2']
+    finally:
+        client.patch(sensor_uri, json={'Status': {'Health': 'Critical'}})
+    assert filtered_ids(client, text) == before
@@ -0,0 +1,120 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for fish file I/O (fishem_fishfileio.py): saving and loading
+JSON, JSON Lines, and binary fish files.
+"""
+
+# Standard library module imports
+import gzip                     # Binary fish file headers
+import json                     # Fish file records
+import marshal                  # Binary fish file versions
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_fishfileio        # Fish file I/O
+
+# Constants
+OBJECTS = {'/test/fishfile/%d' % number: {
+    'Id': str(number), 'Name': 'Thing é\n%d' % number,
+    'Values': [number, number / 2, None, True, {'Nested': {}}]}
+    for number in range(7)}
+
+
+@pytest.fixture
+def objects():
+    """Adds OBJECTS to the fish, and removes them after the test."""
+    for key, value in OBJECTS.items():
+        fish[key] = value
+    yield list(OBJECTS)
+    for key in OBJECTS:
+        fish.pop(key, None)
+
+    # End of objects()
+
+
+# Function: round_trip()
+
+def round_trip(fish_file, keys):
+    """Saves the objects for 'keys' to 'fish_file', deletes them from
+    the fish, loads the file, and returns the loaded objects."""
+    fishem_fishfileio.write_fish(str(fish_file), keys)
+    for key in keys:
+        del fish[key]
+    fishem_fishfileio.read_fish(str(fish_file))
+    return {key: fish[key] for key in keys}
+
+    # End of round_trip()
+
+
+@pytest.mark.parametrize('file_name', ['fish.json', 'fish.jsonl',
+                                       'fish.NDJSON', 'fish.fishz',
+                                       'fish.fishxz'])
+def test_round_trip(tmp_path, objects, monkeypatch, file_name):
+    # Read JSON Lines and binary files in several chunks
+    monkeypatch.setattr(fishem_fishfileio, 'JSONL_CHUNK_LINES', 3)
+    monkeypatch.setattr(fishem_fishfileio, 'BINARY_CHUNK_OBJECTS', 3)
+    assert round_trip(tmp_path / file_name, objects) == OBJECTS
+    assert not (tmp_path / (file_name + '.tmp')).exists()
+
+
+def test_jsonl_records(tmp_path, objects):
+    fish_file = tmp_path / 'fish.jsonl'
+    fishem_fishfileio.write_fish(str(fish_file), objects)
+    lines = fish_file.read_text(encoding='utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == \
+        [{'key': key, 'value': value} for key, value in OBJECTS.items()]
+
+
+@pytest.mark.parametrize('bad_line', [
+    '{"key": "/test/fishfile/bad"}', '{"key": "/test/fishfile/bad", ',
+    '[1, 2]'])
+def test_bad_jsonl_record(tmp_path, monkeypatch, bad_line):
+    monkeypatch.setattr(fishem_fishfileio, 'JSONL_CHUNK_LINES', 3)
+    lines = ['{"key": "/test/fishfile/%d", "value": {}}' % number
+             for number in range(4)]
+    # Blank lines are skipped, but counted
+    lines[1:1] = ['', bad_line]
+    fish_file = tmp_path / 'fish.jsonl'
+    fish_file.write_text('\n'.join(lines) + '\n')
+    try:
+        with pytest.raises(ValueError, match='Bad record on line 3: '):
+            fishem_fishfileio.read_fish(str(fish_file))
+    finally:
+        for number in range(4):
+            fish.pop('/test/fishfile/%d' % number, None)
+
+
+def test_binary_property_names_are_shared(tmp_path, objects):
+    loaded = round_trip(tmp_path / 'fish.fishz', objects)
+    first, second = (list(loaded[key]) for key in objects[:2])
+    assert all(name is other for name, other in zip(first, second))
+
+
+@pytest.mark.parametrize('header', [
+    b'fishem marshal fish 99\n', b'fishem marshal fish x\n',
+    b'not a fish file\n'])
+def test_binary_file_that_cannot_be_read(tmp_path, header):
+    fish_file = tmp_path / 'fish.fishz'
+    fish_file.write_bytes(gzip.compress(
+        header + marshal.dumps([('/test/fishfile/0', {})])))
+    with pytest.raises(ValueError) as error:
+        fishem_fishfileio.read_fish(str(fish_file))
+    if header.startswith(fishem_fishfileio.BINARY_MAGIC):
+        assert 'incompatible marshal version ' + \
+            header.split()[-1].decode() in str(error.value)
+    else:
+        assert str(error.value) == 'Not a binary fish file'
+    assert '/test/fishfile/0' not in fish
+
+
+def test_truncated_binary_file(tmp_path, objects):
+    fish_file = tmp_path / 'fish.fishz'
+    fishem_fishfileio.write_fish(str(fish_file), objects)
+    data = gzip.decompress(fish_file.read_bytes())
+    fish_file.write_bytes(gzip.compress(data[:-10]))
+    with pytest.raises(ValueError, match='truncated'):
+        fishem_fishfileio.read_fish(str(fish_file))
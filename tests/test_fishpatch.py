@@ -0,0 +1,128 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for fish diffs and patches (fishem_fishpatch.py), and for
+applying patches with the FishDoctor.Patch action.
+"""
+
+# Standard library module imports
+import copy                     # Fish object copies
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_fishpatch         # Fish patches
+
+# Constants
+BASE = '/test/patch'
+OLD = {
+    BASE + '/same': {'Id': 'same', 'List': [1, 2, 3]},
+    BASE + '/changed': {'Id': 'changed', 'Status': {'Health': 'OK'},
+                        'List': [1, 2, 3], 'Gone': True, 'a/b~c': 1},
+    BASE + '/removed': {'Id': 'removed'},
+}
+NEW = {
+    BASE + '/same': {'Id': 'same', 'List': [1, 2, 3]},
+    BASE + '/changed': {'Id': 'changed', 'Status': {'Health': 'Critical'},
+                        'List': [1, 5], 'New': [None], 'a/b~c': 1.0},
+    BASE + '/added': {'Id': 'added'},
+}
+
+
+@pytest.fixture
+def old_fish():
+    """Puts copies of the OLD test objects in the fish."""
+    for key, obj in OLD.items():
+        fish[key] = copy.deepcopy(obj)
+    yield
+    for key in list(OLD) + list(NEW):
+        fish.pop(key, None)
+
+    # End of old_fish()
+
+
+# Function: base_objects()
+
+def base_objects():
+    """Returns the test objects now in the fish."""
+    return {key: fish[key] for key in fish if key.startswith(BASE + '/')}
+
+    # End of base_objects()
+
+
+def test_diff_and_apply(old_fish):
+    encodings = {key: fishem_fishpatch.encoding(obj)
+                 for key, obj in OLD.items()}
+    patch, counts = fishem_fishpatch.diff(encodings, NEW.items())
+    assert counts == {'added': 1, 'removed': 1, 'changed': 1,
+                      'unchanged': 1}
+    assert BASE + '/same' not in patch
+    assert {'op': 'replace', 'path': '/a~1b~0c', 'value': 1.0} in \
+        patch[BASE + '/changed']
+    assert fishem_fishpatch.apply(patch) == (2, 1)
+    assert base_objects() == NEW
+
+
+def test_patch_file_round_trip(tmp_path):
+    encodings = {key: fishem_fishpatch.encoding(obj)
+                 for key, obj in OLD.items()}
+    patch = fishem_fishpatch.diff(encodings, NEW.items())[0]
+    patch_file = str(tmp_path / 'fish.patch')
+    fishem_fishpatch.write_patch(patch_file, patch)
+    assert fishem_fishpatch.read_patch(patch_file) == patch
+
+
+def test_operations(old_fish):
+    key = BASE + '/changed'
+    fishem_fishpatch.apply({key: [
+        {'op': 'test', 'path': '/Status', 'value': {'Health': 'OK'}},
+        {'op': 'add', 'path': '/List/-', 'value': 4},
+        {'op': 'add', 'path': '/List/0', 'value': 0},
+        {'op': 'remove', 'path': '/Gone'},
+        {'op': 'copy', 'from': '/Status', 'path': '/Copy'},
+        {'op': 'move', 'from': '/Copy/Health', 'path': '/Health'},
+        {'op': 'replace', 'path': '/Id', 'value': 'new'}]})
+    assert fish[key] == {'Id': 'new', 'Status': {'Health': 'OK'},
+                         'List': [0, 1, 2, 3, 4], 'a/b~c': 1, 'Copy': {},
+                         'Health': 'OK'}
+
+
+@pytest.mark.parametrize('ops', [
+    [{'op': 'test', 'path': '/Id', 'value': 'other'}],
+    [{'op': 'test', 'path': '/List', 'value': [1, 2, 3.5]}],
+    [{'op': 'remove', 'path': '/Missing'}],
+    [{'op': 'replace', 'path': '/List/3', 'value': 4}],
+    [{'op': 'add', 'path': '/List/01', 'value': 4}],
+    [{'op': 'move', 'from': '/Status', 'path': '/Status/Inner'}],
+    [{'op': 'add', 'path': '', 'value': [1]}],
+    [{'op': 'frobnicate', 'path': '/Id'}],
+    [{'op': 'add', 'path': 'Id', 'value': 1}],
+    [{'op': 'add', 'path': '/Id'}],
+    'not a list',
+])
+def test_failed_patch_changes_nothing(old_fish, ops):
+    before = copy.deepcopy(base_objects())
+    patch = {
+        # Applies cleanly, but must be rolled back with the rest
+        BASE + '/same': [{'op': 'replace', 'path': '/Id', 'value': 'x'}],
+        BASE + '/removed': [{'op': 'remove', 'path': ''}],
+        BASE + '/changed': ops,
+    }
+    with pytest.raises(fishem_fishpatch.PatchError):
+        fishem_fishpatch.apply(patch)
+    assert base_objects() == before
+
+
+def test_patch_action(client, old_fish):
+    resp = client.post('/fishdoctor/Actions/FishDoctor.Patch', json={
+        BASE + '/same': [{'op': 'replace', 'path': '/Id', 'value': 'x'}],
+        BASE + '/removed': [{'op': 'remove', 'path': ''}]})
+    assert resp.status_code == 200
+    assert resp.json == {'Changed': 1, 'Removed': 1}
+    assert fish[BASE + '/same']['Id'] == 'x'
+    assert BASE + '/removed' not in fish
+    resp = client.post('/fishdoctor/Actions/FishDoctor.Patch', json={
+        BASE + '/same': [{'op': 'test', 'path': '/Id', 'value': 'y'}]})
+    assert resp.status_code == 400
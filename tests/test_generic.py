@@ -0,0 +1,117 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the generic resource engine (fishem_generic.py): Resource
+classes made from the resource table, API module overrides, and the
+REST behaviors of the generic classes.
+"""
+
+# Standard library module imports
+import types                    # Override API modules
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_generic           # Generic resource engine
+
+# Constants
+SENSORS_URI = '/redfish/v1/Chassis/1/Sensors'
+SENSOR_URI = SENSORS_URI + '/S28'
+SENSOR_ENTRY = {'kind': 'Singleton', 'capabilities': 'U',
+                'actions': ['Sensor.ResetMetrics'],
+                'uris': ['/redfish/v1/Chassis/<string:ChassisId>/Sensors/'
+                         '<string:SensorId>']}
+
+
+def test_singleton_classes_from_the_table():
+    (sensor, uris), (actions, action_uris) = \
+        fishem_generic.resource_classes('Sensor', SENSOR_ENTRY, None)
+    uri = SENSOR_ENTRY['uris'][0]
+    assert issubclass(sensor, fishem_generic.Singleton)
+    assert sensor.__name__ == 'Sensor'
+    assert uris == [uri, uri + '/']
+    assert (sensor.res_cap_insertable, sensor.res_cap_updatable,
+            sensor.res_cap_deletable) == (False, True, False)
+    assert sensor.allow_http_verbs == 'GET, PUT, PATCH'
+    assert issubclass(actions, fishem_generic.SingletonActions)
+    assert actions.actions == frozenset(['Sensor.ResetMetrics'])
+    assert uri + '/Actions/<string:UriAction>' in action_uris
+    assert uri + '/Actions/Oem/<string:UriOemAction>/' in action_uris
+
+
+def test_collection_classes_from_the_table():
+    entry = {'kind': 'Collection', 'capabilities': 'I',
+             'uris': ['/redfish/v1/Chassis']}
+    [(collection, uris)] = fishem_generic.resource_classes(
+        'ChassisCollection', entry, None)
+    assert issubclass(collection, fishem_generic.Collection)
+    assert uris == ['/redfish/v1/Chassis', '/redfish/v1/Chassis/']
+    assert collection.allow_http_verbs == 'GET, POST'
+
+
+def test_api_module_overrides_handlers():
+
+    class Sensor:
+        res_cap_deletable = True
+
+        def get(self, **uri_args):
+            return 'override'
+
+    api_mod = types.SimpleNamespace(Sensor=Sensor)
+    (sensor, uris), (actions, action_uris) = \
+        fishem_generic.resource_classes('Sensor', SENSOR_ENTRY, api_mod)
+    assert sensor.get is Sensor.get
+    assert sensor.patch is fishem_generic.Singleton.patch
+    # Capabilities set by the override win over the table
+    assert sensor.res_cap_deletable
+    assert sensor.allow_http_verbs == 'GET, PUT, PATCH, DELETE'
+    assert actions.post is fishem_generic.SingletonActions.post
+
+
+@pytest.fixture
+def sensor_28():
+    """Restores Sensor S28 after a test that changes it."""
+    obj = fish[SENSOR_URI]
+    yield SENSOR_URI
+    fish[SENSOR_URI] = obj
+
+    # End of sensor_28()
+
+
+def test_get(client):
+    assert client.get(SENSOR_URI).json['Id'] == 'S28'
+    assert client.get(SENSOR_URI + '/').json['Id'] == 'S28'
+    assert client.get(SENSORS_URI + '/S99').status_code == 404
+
+
+def test_patch_and_put(client, sensor_28):
+    resp = client.patch(SENSOR_URI, json={'Reading': 99})
+    assert resp.status_code == 200
+    assert fish[SENSOR_URI]['Reading'] == 99
+    assert client.get(SENSOR_URI).json['Reading'] == 99
+    resp = client.put(SENSOR_URI, json={'@odata.id': SENSOR_URI,
+                                        'Id': 'S28'})
+    assert resp.status_code == 200
+    assert client.get(SENSOR_URI).json == {'@odata.id': SENSOR_URI,
+                                           'Id': 'S28'}
+    assert client.put(SENSOR_URI, json={'Id': 'S28'}).status_code == 400
+
+
+@pytest.mark.parametrize('method, uri, allowed', [
+    ('delete', SENSOR_URI, 'GET, PUT, PATCH'),
+    ('post', SENSORS_URI, 'GET')])
+def test_capabilities(client, method, uri, allowed):
+    resp = getattr(client, method)(uri, json={'Id': 'S99'})
+    assert resp.status_code == 405
+    assert resp.headers['Allow'] == allowed
+    assert SENSORS_URI + '/S28' in fish
+
+
+def test_actions(client):
+    resp = client.post(SENSOR_URI + '/Actions/Sensor.ResetMetrics')
+    assert resp.status_code == 200
+    assert resp.json == 'Sensor.ResetMetrics action for ' + SENSOR_URI
+    resp = client.post(SENSOR_URI + '/Actions/Sensor.Explode')
+    assert resp.status_code == 400
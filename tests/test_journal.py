@@ -0,0 +1,233 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the write-ahead journal (fishem_journal.py): replaying
+journal segments, recovering the fish after a crash, journaling each
+request as one batch, compaction, and failing loudly when the journal
+cannot be written.
+"""
+
+# Standard library module imports
+import json                     # Journal records
+import threading                # Changes outside of requests
+
+# Third party module imports
+import flask                    # Request handling
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_journal           # Fish change journal
+import fishem_snapshot          # Background fish snapshots
+
+# Constants
+BASE = '/test/journal'
+
+# Makes journaled changes, then exits without stopping the journal
+CRASH_SCRIPT = '''
+    import os, sys
+    from fish_data import fish
+    import fishem_journal, fishem_snapshot
+    config = {'journalFile': sys.argv[1], 'journalSyncMs': 0,
+              'journalSnapshotRecords': 4}
+    for number in range(3):
+        fish['/j/%d' % number] = {'Value': number}
+    fishem_journal.start(config)
+    for number in range(3, 12):
+        fish['/j/%d' % number] = {'Value': number}
+        fishem_journal.journal.wait_durable()
+    fish['/j/0']['Value'] = 'changed'
+    fish.touch('/j/0')
+    del fish['/j/1']
+    fishem_journal.journal.wait_durable()
+    fishem_snapshot.wait()
+    os._exit(0)
+'''
+RECOVER_SCRIPT = '''
+    import json, sys
+    from fish_data import fish
+    import fishem_journal
+    assert fishem_journal.recover({'journalFile': sys.argv[1]})
+    print(json.dumps(dict(fish)))
+'''
+
+
+# Function: write_segment()
+
+def write_segment(path, lines):
+    """Writes journal segment 'path' with record 'lines'."""
+    with open(path, 'w') as segment:
+        segment.write(''.join(line + '\n' for line in lines))
+    return
+
+    # End of write_segment()
+
+
+def test_replay_stops_at_an_incomplete_batch(tmp_path):
+    segment = str(tmp_path / 'journal.000001')
+    write_segment(segment, [
+        json.dumps({'k': BASE + '/a', 'v': {'N': 1}}),
+        json.dumps({'k': BASE + '/b', 'v': {'N': 2}}),
+        '{"commit": 1}',
+        json.dumps({'k': BASE + '/a'}),
+        '{"commit": 2}',
+        json.dumps({'k': BASE + '/b', 'v': {'N': 3}}),
+        '{"k": "' + BASE + '/c", "v": {"N"'])
+    try:
+        applied, complete = fishem_journal.replay(segment)
+        assert (applied, complete) == (3, False)
+        assert BASE + '/a' not in fish
+        assert fish[BASE + '/b'] == {'N': 2}
+        assert BASE + '/c' not in fish
+    finally:
+        fish.pop(BASE + '/a', None)
+        fish.pop(BASE + '/b', None)
+
+
+def test_replay_of_a_complete_segment(tmp_path):
+    segment = str(tmp_path / 'journal.000001')
+    write_segment(segment, [json.dumps({'k': BASE + '/a', 'v': {'N': 1}}),
+                            '{"commit": 1}'])
+    try:
+        assert fishem_journal.replay(segment) == (1, True)
+        assert fish[BASE + '/a'] == {'N': 1}
+    finally:
+        fish.pop(BASE + '/a', None)
+
+
+def test_recovery_after_a_crash(tmp_path, run_python):
+    journal_file = str(tmp_path / 'fish.journal')
+    run_python(CRASH_SCRIPT, journal_file)
+    segments, snapshots = fishem_journal.journal_files(journal_file)
+    # Later segments were started, and the older ones deleted
+    assert snapshots[0] > 1
+    output = run_python(RECOVER_SCRIPT, journal_file)
+    recovered = json.loads(output.splitlines()[-1])
+    expected = {'/j/%d' % number: {'Value': number}
+                for number in range(2, 12)}
+    expected['/j/0'] = {'Value': 'changed'}
+    assert recovered == expected
+
+
+def test_no_recovery_without_a_journal(tmp_path):
+    assert not fishem_journal.recover(
+        {'journalFile': str(tmp_path / 'none.journal')})
+    assert not fishem_journal.recover({'journalFile': ''})
+
+
+def test_encode_copies_objects_changed_while_encoded(monkeypatch):
+    real_dumps = json.dumps
+    calls = []
+
+    def changing_dumps(value):
+        calls.append(value)
+        if len(calls) == 1:
+            raise RuntimeError('dictionary changed size during iteration')
+        return real_dumps(value)
+
+    monkeypatch.setattr(fishem_journal.json, 'dumps', changing_dumps)
+    assert fishem_journal.encode({'A': [1, 2]}) == '{"A": [1, 2]}'
+    assert len(calls) == 2
+
+
+@pytest.fixture
+def journaled_app(tmp_path, monkeypatch):
+    """Starts a journal, and returns a Flask test client for an app
+    that changes test object 'a' with PATCH, and the signals sent to
+    fishem to stop it."""
+    fish[BASE + '/a'] = {'N': 0}
+    fish[BASE + '/b'] = {'N': 0}
+    monkeypatch.setattr(fishem_journal, 'stopping', False)
+    fishem_journal.start({'journalFile': str(tmp_path / 'app.journal'),
+                          'journalSyncMs': 0})
+    app = flask.Flask('test_journal')
+
+    @app.route(BASE + '/a', methods=['PATCH'])
+    def patch():
+        fish[BASE + '/a']['N'] += 1
+        fish.touch(BASE + '/a')
+        return 'OK'
+
+    @app.route(BASE + '/both', methods=['PATCH'])
+    def patch_both():
+        # Change 'a', then let a batch with a change made outside of
+        # the request be flushed, then change 'b'
+        fish[BASE + '/a']['N'] += 1
+        fish.touch(BASE + '/a')
+        flushed = fishem_journal.journal.flushed
+        other = threading.Thread(target=fish.__setitem__,
+                                 args=(BASE + '/c', {'N': 0}))
+        other.start()
+        other.join()
+        with fishem_journal.journal.cond:
+            while fishem_journal.journal.flushed == flushed:
+                fishem_journal.journal.cond.wait()
+        fish[BASE + '/b']['N'] += 1
+        fish.touch(BASE + '/b')
+        return 'OK'
+
+    app.after_request(fishem_journal.after_request)
+    signals = []
+    monkeypatch.setattr(fishem_journal.os, 'kill',
+                        lambda pid, sig: signals.append(sig))
+    yield app.test_client(), signals
+    fishem_journal.stop()
+    for key in ('a', 'b', 'c'):
+        fish.pop(BASE + '/' + key, None)
+
+    # End of journaled_app()
+
+
+def test_requests_fail_after_a_journal_failure(journaled_app, monkeypatch):
+    client, signals = journaled_app
+    assert client.patch(BASE + '/a').status_code == 200
+    assert signals == []
+
+    def disk_full(fd):
+        raise OSError(28, 'No space left on device')
+
+    monkeypatch.setattr(fishem_journal.os, 'fsync', disk_full)
+    assert client.patch(BASE + '/a').status_code == 500
+    assert client.patch(BASE + '/a').status_code == 500
+    # fishem is stopped once, and changes are no longer collected
+    assert len(signals) == 1
+    assert fishem_journal.journal.pending == []
+    assert fishem_journal.journal.loose == {}
+    assert isinstance(fishem_journal.journal.error, OSError)
+
+
+def test_a_request_is_one_batch(journaled_app):
+    client, signals = journaled_app
+    assert client.patch(BASE + '/both').status_code == 200
+    journal = fishem_journal.journal
+    with open(fishem_journal.segment_path(journal.journal_file,
+                                          journal.number)) as segment:
+        records = [json.loads(line) for line in segment]
+    batches = [[]]
+    for record in records:
+        if 'commit' in record:
+            batches.append([])
+        else:
+            batches[-1].append((record['k'], record['v']['N']))
+    assert batches == [[(BASE + '/c', 0)],
+                       [(BASE + '/a', 1), (BASE + '/b', 1)], []]
+
+
+def test_compaction_is_retried_when_a_snapshot_is_running(journaled_app,
+                                                          monkeypatch):
+    client, signals = journaled_app
+    journal = fishem_journal.journal
+    journal.records = journal.snapshot_records
+    number = journal.number
+    with monkeypatch.context() as patch:
+        # Another snapshot starts after the in_progress() check
+        patch.setattr(fishem_snapshot, 'save',
+                      lambda file_name, done=None: None)
+        journal.snapshot()
+    assert journal.number == number + 1
+    assert journal.records == journal.snapshot_records
+    journal.snapshot()
+    fishem_snapshot.wait()
+    assert journal.records == 0
+    assert fishem_journal.journal_files(journal.journal_file) == \
+        ([number + 2], [number + 2])
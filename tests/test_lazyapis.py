@@ -0,0 +1,106 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for lazy, on-demand activation of APIs (fishem_lazyapis.py),
+and for the manifest of API URIs it uses.
+"""
+
+# Standard library module imports
+import json                     # Script output
+import textwrap                 # API module source
+
+# Third party module imports
+# None
+
+# Local module imports
+from conftest import REPO_DIR   # Repository directory
+import fishem_lazyapis          # Lazy API activation
+
+# Constants
+API_MODULE = '''
+    """An API module."""
+    import fishem_generic
+    INITIAL = {'Id': 'Thing'}
+
+    class Thing(fishem_generic.Singleton):
+        def get(self):
+            return 'thing'
+
+    def activate(rest_api):
+        rest_api.add_resource(Thing, '/redfish/v1/Thing')
+'''
+
+# Starts fishem with lazy API activation, and reports the APIs that
+# are activated as requests arrive
+LAZY_SCRIPT = '''
+    import json, sys
+    import conftest
+    import fishem_uritrie
+    app = conftest.start_fishem('--imockup', sys.argv[1], '--lazyApis')
+    dispatcher = app.view_functions[
+        fishem_uritrie.DISPATCH_ENDPOINT].__self__
+    client = app.test_client()
+    steps = [['startup', None, sorted(dispatcher.activated),
+              'fishapis.RedfishODataMetadata' in sys.modules]]
+    for method, uri in (('get', '/redfish/v1/Chassis/1/Sensors/S3/'),
+                        ('get', '/redfish/v1/Chassis/1/Sensors/S4'),
+                        ('post',
+                         '/redfish/v1/Chassis/1/Actions/Chassis.Reset'),
+                        ('get', '/redfish/v1/$metadata'),
+                        ('get', '/redfish/v1/NoSuchThing')):
+        resp = getattr(client, method)(uri, headers={'Accept': '*/*'})
+        steps.append([uri, resp.status_code, sorted(dispatcher.activated),
+                      'fishapis.RedfishODataMetadata' in sys.modules])
+    print(json.dumps(steps))
+'''
+
+
+def test_apis_are_activated_by_their_first_request(run_python, mockup_dir):
+    output = run_python(LAZY_SCRIPT, mockup_dir)
+    # The prebuilt manifest is current, so it is not rebuilt
+    assert 'API module manifest' not in output
+    steps = json.loads(output.splitlines()[-1])
+    eager = ['RedfishProtocolVersion']
+    assert steps == [
+        ['startup', None, eager, False],
+        ['/redfish/v1/Chassis/1/Sensors/S3/', 200, eager + ['Sensor'],
+         False],
+        ['/redfish/v1/Chassis/1/Sensors/S4', 200, eager + ['Sensor'],
+         False],
+        ['/redfish/v1/Chassis/1/Actions/Chassis.Reset', 200,
+         ['Chassis'] + eager + ['Sensor'], False],
+        ['/redfish/v1/$metadata', 200,
+         ['Chassis', 'RedfishODataMetadata'] + eager + ['Sensor'], True],
+        ['/redfish/v1/NoSuchThing', 404,
+         ['Chassis', 'RedfishODataMetadata'] + eager + ['Sensor'], True]]
+
+
+def test_the_manifest_is_current(monkeypatch):
+    monkeypatch.chdir(REPO_DIR)
+    with open(fishem_lazyapis.MANIFEST_FILE) as manifest_file:
+        manifest = json.load(manifest_file)
+    assert fishem_lazyapis.manifest_is_current(manifest)
+
+
+def test_only_uri_registration_changes_the_fingerprint(tmp_path):
+
+    # Function: outline()
+
+    def outline(old, new):
+        """Returns the outline of API_MODULE with 'old' replaced by
+        'new'."""
+        module_file = tmp_path / 'Thing.py'
+        module_file.write_text(textwrap.dedent(API_MODULE)
+                               .replace(old, new))
+        return fishem_lazyapis.module_outline(str(module_file))
+
+        # End of outline()
+
+    original = outline('', '')
+    # Handler methods and comments do not change the outline
+    assert outline("return 'thing'", "return 'other'") == original
+    assert outline('    def get', '    # Comment\n    def get') == original
+    # URIs, initial fish data, and classes do
+    assert outline("/redfish/v1/Thing'", "/redfish/v1/Other'") != original
+    assert outline("'Thing'}", "'Other'}") != original
+    assert outline('class Thing(', 'class Other(') != original
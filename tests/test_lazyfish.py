@@ -0,0 +1,108 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for lazily loaded fish files (fishem_lazyfish.py): the key
+index, and loading objects when they are first read.
+"""
+
+# Standard library module imports
+import json                     # Fish file records
+import os                       # File times
+
+# Third party module imports
+# None
+
+# Local module imports
+import fishem_lazyfish          # Lazily loaded fish
+
+# Constants
+OBJECTS = {
+    '/redfish/v1': {'Id': 'Root', 'Name': 'Service "root"'},
+    '/redfish/v1/Chassis/1': {'Id': '1', 'Reading': [1, 2.5, None]},
+    '/redfish/v1/Oddé': {'Id': 'odd', 'Text': 'line\nbreak'},
+}
+LAZY_SCRIPT = '''
+    import json, sys
+    from fish_data import fish
+    import fishem_lazyfish
+    fishem_lazyfish.input(sys.argv[1])
+    unread = [key for key in fish if type(dict.get(fish, key)) is tuple]
+    peeked = fish.peek('/redfish/v1')
+    after_peek = type(dict.get(fish, '/redfish/v1')) is tuple
+    chassis = fish['/redfish/v1/Chassis/1']
+    after_read = type(dict.get(fish, '/redfish/v1/Chassis/1')) is tuple
+    print(json.dumps({'type': type(fish).__name__, 'unread': unread,
+                      'peeked': peeked, 'after_peek': after_peek,
+                      'chassis': chassis, 'after_read': after_read,
+                      'fish': dict(fish.items())}))
+'''
+
+
+# Function: write_fish_file()
+
+def write_fish_file(path, odd_record=None):
+    """Writes OBJECTS to JSON Lines fish file 'path' as fishem saves
+    them, followed by 'odd_record' (a line laid out another way), if
+    it is given."""
+    with open(path, 'w') as fish_file:
+        for key, value in OBJECTS.items():
+            fish_file.write('{"key": ' + json.dumps(key) + ', "value": ' +
+                            json.dumps(value) + '}\n')
+        if odd_record is not None:
+            fish_file.write(odd_record + '\n')
+    return
+
+    # End of write_fish_file()
+
+
+def test_make_index(tmp_path):
+    path = str(tmp_path / 'fish.jsonl')
+    write_fish_file(path, '{"value": {"Id": "x"},   "key": "/x"}')
+    with open(path, 'rb') as fish_file:
+        data = fish_file.read()
+    keys, offsets, lengths, records = fishem_lazyfish.make_index(data)
+    assert keys == list(OBJECTS)
+    for key, offset, length in zip(keys, offsets, lengths):
+        assert json.loads(data[offset:offset + length]) == OBJECTS[key]
+    assert len(records) == 1
+    offset, length = records[0]
+    assert json.loads(data[offset:offset + length])['key'] == '/x'
+
+
+def test_saved_index_is_used_until_the_file_changes(tmp_path):
+    path = str(tmp_path / 'fish.jsonl')
+    write_fish_file(path)
+    with open(path, 'rb') as fish_file:
+        data = fish_file.read()
+    index = fishem_lazyfish.make_index(data)
+    fishem_lazyfish.save_index(path, index)
+    saved = fishem_lazyfish.read_index(path, data)
+    assert saved[0] == index[0]
+    assert list(saved[1]) == list(index[1])
+    assert list(saved[2]) == list(index[2])
+
+    # A new modification time makes the index stale
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000))
+    assert fishem_lazyfish.read_index(path, data) is None
+
+    # So does a new size
+    write_fish_file(path, '{"key": "/y", "value": {}}')
+    with open(path, 'rb') as fish_file:
+        assert fishem_lazyfish.read_index(path, fish_file.read()) is None
+
+
+def test_objects_are_loaded_when_read(tmp_path, run_python):
+    path = str(tmp_path / 'fish.jsonl')
+    write_fish_file(path, '{"value": {"Id": "x"}, "key": "/x"}')
+    for run in range(2):
+        result = json.loads(run_python(LAZY_SCRIPT, path).splitlines()[-1])
+        assert result['type'] == 'LazyFishDict'
+        assert result['unread'] == list(OBJECTS)
+        assert result['peeked'] == OBJECTS['/redfish/v1']
+        assert result['after_peek'] is True
+        assert result['chassis'] == OBJECTS['/redfish/v1/Chassis/1']
+        assert result['after_read'] is False
+        assert result['fish'] == dict(OBJECTS, **{'/x': {'Id': 'x'}})
+        # The first run saves the index, the second one uses it
+        assert os.path.exists(path + fishem_lazyfish.INDEX_SUFFIX)
@@ -0,0 +1,114 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the reverse-link index (fishem_links.py): finding links in
+both directions, and removing links to deleted objects.
+"""
+
+# Standard library module imports
+# None
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+import fish_data                # Emulator configuration
+from fish_data import fish      # Fish data
+import fishem_links             # Reverse-link index
+
+# Constants
+BASE = '/test/links'
+COLL_KEY = BASE + '/Things'
+THING_1 = COLL_KEY + '/1'
+THING_2 = COLL_KEY + '/2'
+HOLDER = BASE + '/Holder'
+
+
+@pytest.fixture
+def objects():
+    """Adds a collection with two members, and an object that links
+    to both members, then removes them after the test."""
+    fish[THING_1] = {'@odata.id': THING_1,
+                     'Links': {'Peer': {'@odata.id': THING_2 + '/'}}}
+    fish[THING_2] = {'@odata.id': THING_2}
+    fish[COLL_KEY] = {'Members': [{'@odata.id': THING_1},
+                                  {'@odata.id': THING_2}],
+                      'Members@odata.count': 2}
+    fish[HOLDER] = {
+        '@odata.id': HOLDER,
+        'Links': {'Things': [{'@odata.id': THING_1},
+                             {'@odata.id': THING_2}],
+                  'Things@odata.count': 2,
+                  'Main': {'@odata.id': THING_2 + '#/Status'}}}
+    yield
+    for key in (THING_1, THING_2, COLL_KEY, HOLDER):
+        fish.pop(key, None)
+
+    # End of objects()
+
+
+def test_referrers_and_references(objects):
+    assert fishem_links.referrers(THING_2) == [COLL_KEY, THING_1, HOLDER]
+    assert fishem_links.referrers(HOLDER) == []
+    # Fragments and trailing slashes are not part of the target
+    assert fishem_links.references(THING_1) == [THING_2]
+    assert fishem_links.references(COLL_KEY) == [THING_1, THING_2]
+    assert sorted(fishem_links.references(HOLDER)) == [THING_1, THING_2]
+
+
+def test_changed_objects_are_indexed_again(objects):
+    fish[THING_1]['Links'] = {}
+    fish.touch(THING_1)
+    assert THING_1 not in fishem_links.referrers(THING_2)
+    del fish[HOLDER]
+    assert fishem_links.referrers(THING_2) == [COLL_KEY]
+
+
+def test_strip_links(objects):
+    del fish[THING_2]
+    # Keys still in the fish are skipped
+    assert fishem_links.strip_links([THING_2, THING_1]) == 3
+    assert fish[THING_1]['Links'] == {}
+    assert fish[HOLDER]['Links'] == {
+        'Things': [{'@odata.id': THING_1}], 'Things@odata.count': 1}
+    # Members are left to the collection membership index
+    assert len(fish[COLL_KEY]['Members']) == 2
+    assert fishem_links.referrers(THING_2) == [COLL_KEY]
+
+
+def test_remove_link_leaves_objects_that_are_not_just_links():
+    obj = {'Items': [{'@odata.id': 'a', 'Name': 'A'}, {'@odata.id': 'b'}],
+           'Items@odata.count': 2}
+    assert fishem_links.remove_link(obj, ('Items', 0)) == 0
+    assert fishem_links.remove_link(obj, ('Items', 1)) == 1
+    assert obj == {'Items': [{'@odata.id': 'a', 'Name': 'A'}],
+                   'Items@odata.count': 1}
+
+
+def test_strip_dangling_is_configured(objects, monkeypatch):
+    del fish[THING_2]
+    monkeypatch.setitem(fish_data.fishem_config, 'stripDanglingLinks',
+                        False)
+    assert fishem_links.strip_dangling([THING_2]) == 0
+    assert fishem_links.referrers(THING_2) == [COLL_KEY, THING_1, HOLDER]
+    monkeypatch.setitem(fish_data.fishem_config, 'stripDanglingLinks',
+                        True)
+    assert fishem_links.strip_dangling([THING_2]) == 3
+
+
+def test_delete_request_strips_dangling_links(client, monkeypatch):
+    monkeypatch.setitem(fish_data.fishem_config, 'stripDanglingLinks',
+                        True)
+    chassis_uri = '/redfish/v1/Chassis/LinkTest'
+    assert client.post('/redfish/v1/Chassis',
+                       json={'Id': 'LinkTest'}).status_code == 201
+    fish[HOLDER] = {'Links': {'Chassis': [{'@odata.id': chassis_uri}],
+                              'Chassis@odata.count': 1}}
+    try:
+        assert fishem_links.referrers(chassis_uri) == \
+            ['/redfish/v1/Chassis', HOLDER]
+        assert client.delete(chassis_uri).status_code == 200
+        assert fish[HOLDER]['Links'] == {'Chassis': [],
+                                         'Chassis@odata.count': 0}
+    finally:
+        fish.pop(HOLDER, None)
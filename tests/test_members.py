@@ -0,0 +1,98 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the collection membership index (fishem_members.py).
+"""
+
+# Standard library module imports
+# None
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_members           # Collection membership index
+
+# Constants
+COLL_KEY = '/test/members/Things'
+CHASSIS_URI = '/redfish/v1/Chassis'
+
+
+# Function: link()
+
+def link(number):
+    """Returns a link to member 'number' of the test collection."""
+    return {'@odata.id': COLL_KEY + '/%d' % number}
+
+    # End of link()
+
+
+@pytest.fixture
+def collection():
+    """Adds a test collection with members 0, 1, 2, an item that is
+    not a link, and a duplicate link to member 0; removes it after
+    the test."""
+    fish[COLL_KEY] = {'Members': [link(0), link(1), link(2), 'odd',
+                                  link(0)],
+                      'Members@odata.count': 5}
+    yield COLL_KEY
+    fish.pop(COLL_KEY, None)
+
+    # End of collection()
+
+
+# Function: members()
+
+def members():
+    """Returns the Members of the test collection, as read by a GET."""
+    fishem_members.sync(COLL_KEY)
+    return fish[COLL_KEY]['Members']
+
+    # End of members()
+
+
+def test_has_member(collection):
+    assert fishem_members.has_member(COLL_KEY, COLL_KEY + '/1')
+    assert not fishem_members.has_member(COLL_KEY, COLL_KEY + '/3')
+
+
+def test_add_member_appends(collection):
+    fishem_members.add_member(COLL_KEY, COLL_KEY + '/3')
+    assert COLL_KEY not in fishem_members.dirty
+    assert fish[COLL_KEY]['Members'][-1] == link(3)
+    assert fish[COLL_KEY]['Members@odata.count'] == 6
+
+
+def test_removed_members_are_dropped_when_the_list_is_read(collection):
+    fishem_members.remove_member(COLL_KEY, COLL_KEY + '/1')
+    fishem_members.add_member(COLL_KEY, COLL_KEY + '/3')
+    assert COLL_KEY in fishem_members.dirty
+    assert fish[COLL_KEY]['Members@odata.count'] == 5
+    # Items that are not links, and later duplicates, are kept
+    assert members() == [link(0), link(2), 'odd', link(0), link(3)]
+    assert COLL_KEY not in fishem_members.dirty
+
+
+def test_replaced_collections_are_indexed_again(collection):
+    fishem_members.has_member(COLL_KEY, COLL_KEY + '/1')
+    fish[COLL_KEY] = {'Members': [link(5)]}
+    assert fishem_members.has_member(COLL_KEY, COLL_KEY + '/5')
+    assert not fishem_members.has_member(COLL_KEY, COLL_KEY + '/1')
+    del fish[COLL_KEY]
+    assert COLL_KEY not in fishem_members.indexes
+
+
+def test_post_and_delete_requests(client):
+    resp = client.post(CHASSIS_URI, json={'Id': 'MemberTest'})
+    assert resp.status_code == 201
+    uri = CHASSIS_URI + '/MemberTest'
+    data = client.get(CHASSIS_URI).json
+    assert data['Members'][-1] == {'@odata.id': uri}
+    assert data['Members@odata.count'] == len(data['Members'])
+    assert client.delete(uri).status_code == 200
+    data = client.get(CHASSIS_URI).json
+    assert {'@odata.id': uri} not in data['Members']
+    assert data['Members@odata.count'] == len(data['Members'])
+    # A deleted member cannot be deleted again
+    assert client.delete(uri).status_code == 404
@@ -0,0 +1,77 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the cached $metadata document (fishem_metadata.py and
+fishapis/RedfishODataMetadata.py).
+"""
+
+# Standard library module imports
+import copy                     # Saved $metadata object
+import gzip                     # Compressed responses
+import os                       # Mockup files
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_metadata          # $metadata XML handling
+
+# Constants
+METADATA_URI = '/redfish/v1/$metadata'
+XML = {'Accept': 'application/xml'}
+GZIP = dict(XML, **{'Accept-Encoding': 'gzip'})
+IDENTITY = dict(XML, **{'Accept-Encoding': 'identity'})
+
+
+@pytest.fixture
+def metadata():
+    """Restores the $metadata object and its XML after a test that
+    changes them."""
+    obj = copy.deepcopy(fish[METADATA_URI])
+    xml_data = fishem_metadata.xml_bytes()
+    yield
+    fish[METADATA_URI] = obj
+    fishem_metadata.remember_xml(xml_data)
+
+    # End of metadata()
+
+
+def test_the_mockup_xml_is_returned(client, emulator):
+    with open(os.path.join(emulator[1], 'mockup', '$metadata',
+                           'index.xml'), 'rb') as xml_file:
+        xml_data = xml_file.read()
+    resp = client.get(METADATA_URI, headers=IDENTITY)
+    assert resp.status_code == 200
+    assert resp.headers['Content-Type'] == 'application/xml'
+    assert resp.data == xml_data
+    resp = client.get(METADATA_URI, headers=GZIP)
+    assert resp.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(resp.data) == xml_data
+    # The compressed document is made once
+    assert fishem_metadata.gzip_bytes() is fishem_metadata.gzip_bytes()
+
+
+def test_changed_metadata_is_converted_again(client, metadata):
+    fish[METADATA_URI]['edmx:Edmx']['@Version'] = '4.01'
+    fish.touch(METADATA_URI)
+    resp = client.get(METADATA_URI, headers=IDENTITY)
+    assert b'Version="4.01"' in resp.data
+    assert b'Version="4.01"' in gzip.decompress(
+        client.get(METADATA_URI, headers=GZIP).data)
+    # Replacing the object also discards the old XML
+    fish[METADATA_URI] = {'edmx:Edmx': {'@Version': '5.0'}}
+    assert b'Version="5.0"' in client.get(METADATA_URI,
+                                          headers=IDENTITY).data
+
+
+def test_metadata_encodings_have_their_own_etags(client):
+    gzip_resp = client.get(METADATA_URI, headers=GZIP)
+    identity = client.get(METADATA_URI, headers=IDENTITY)
+    assert gzip_resp.headers['ETag'] != identity.headers['ETag']
+    for resp, headers in ((gzip_resp, GZIP), (identity, IDENTITY)):
+        headers = dict(headers, **{'If-None-Match': resp.headers['ETag']})
+        assert client.get(METADATA_URI, headers=headers).status_code == 304
+    # A client that has the gzip document does not get it as identity
+    headers = dict(IDENTITY, **{'If-None-Match': gzip_resp.headers['ETag']})
+    assert client.get(METADATA_URI, headers=headers).status_code == 200
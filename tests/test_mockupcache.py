@@ -0,0 +1,107 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the parsed mockup cache (fishem_mockupcache.py): the cache
+is used while the mockup is unchanged, and only the changed files are
+parsed again.
+"""
+
+# Standard library module imports
+import json                     # Mockup files
+import os                       # File handling
+import shutil                   # Mockup changes
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+# None
+
+# Constants
+SENSORS = '/redfish/v1/Chassis/1/Sensors'
+
+# Loads the mockup through the cache, and reports the load message
+# and the Sensor objects
+LOAD_SCRIPT = '''
+    import json, sys
+    import fish_data
+    from fish_data import fish
+    import fishem_mockupcache
+    fish_data.fishem_config = {'mockupCache': sys.argv[2]}
+    fishem_mockupcache.input(sys.argv[1])
+    print(json.dumps({key: fish[key] for key in fish
+                      if key.startswith('/redfish/v1/Chassis/1/Sensors/')}))
+'''
+
+
+# Function: load()
+
+def load(run_python, mockup_dir, validation='stat'):
+    """Loads 'mockup_dir' through the mockup cache in a separate
+    process. Returns the load message and the Sensor objects by Id."""
+    lines = run_python(LOAD_SCRIPT, mockup_dir, validation).splitlines()
+    sensors = json.loads(lines[-1])
+    return lines[-2], {key.split('/')[-1]: obj
+                       for key, obj in sensors.items()}
+
+    # End of load()
+
+
+# Function: rewrite()
+
+def rewrite(mockup_dir, name, obj):
+    """Writes Sensor 'name' of 'mockup_dir' as 'obj', with a later
+    modification time."""
+    file_path = os.path.join(mockup_dir, 'Chassis', '1', 'Sensors', name,
+                             'index.json')
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, 'w') as json_file:
+        json.dump(obj, json_file, indent=4)
+    later = os.stat(file_path).st_mtime + 10
+    os.utime(file_path, (later, later))
+    return
+
+    # End of rewrite()
+
+
+def test_first_load_saves_the_cache(run_python, mockup_dir):
+    message, sensors = load(run_python, mockup_dir)
+    assert 'from the cache' not in message
+    assert len(sensors) == 30
+    assert os.path.exists(mockup_dir + '.cache.fishz')
+    message, cached = load(run_python, mockup_dir)
+    assert '(0 files changed, 0 removed' in message
+    assert cached == sensors
+
+
+def test_changed_files_are_parsed_again(run_python, mockup_dir):
+    first = load(run_python, mockup_dir)[1]
+    rewrite(mockup_dir, 'S3', dict(first['S3'], Reading=999))
+    rewrite(mockup_dir, 'S99', {'@odata.id': SENSORS + '/S99', 'Id': 'S99'})
+    shutil.rmtree(os.path.join(mockup_dir, 'Chassis', '1', 'Sensors', 'S5'))
+    message, sensors = load(run_python, mockup_dir)
+    assert '(2 files changed, 1 removed' in message
+    assert sensors['S3']['Reading'] == 999
+    assert sensors['S99']['Id'] == 'S99'
+    assert 'S5' not in sensors
+    assert sensors['S4'] == first['S4']
+    # The cache was saved again with the changes
+    message, again = load(run_python, mockup_dir)
+    assert '(0 files changed, 0 removed' in message
+    assert again == sensors
+
+
+@pytest.mark.parametrize('validation, changed', [('stat', 1),
+                                                 ('content', 0)])
+def test_validation(run_python, mockup_dir, validation, changed):
+    first = load(run_python, mockup_dir, validation)[1]
+    # Same content, later modification time
+    rewrite(mockup_dir, 'S3', first['S3'])
+    message = load(run_python, mockup_dir, validation)[0]
+    assert '(%d files changed' % changed in message
+
+
+def test_cache_is_not_used_for_another_validation(run_python, mockup_dir):
+    load(run_python, mockup_dir, 'stat')
+    message = load(run_python, mockup_dir, 'content')[0]
+    assert 'from the cache' not in message
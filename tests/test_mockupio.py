@@ -0,0 +1,148 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for mockup I/O (fishem_mockupio.py): loading mockup files with
+a pool of loader threads, saving only the fish changes to the mockup
+that was loaded, and loading and saving mockup archives.
+"""
+
+# Standard library module imports
+import json                     # Script output
+import os                       # Mockup files
+import tarfile                  # Mockup archives
+import zipfile                  # Mockup archives
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from conftest import write_mockup       # Test mockups
+
+# Constants
+SENSORS = 1200                  # Enough files to fill many batches
+SENSORS_PATH = os.path.join('Chassis', '1', 'Sensors')
+
+# Loads the mockup in sys.argv[1] with sys.argv[2] loader threads, and
+# reports the keys loaded and the fish, in order
+LOAD_SCRIPT = '''
+    import json, sys
+    import fish_data
+    from fish_data import fish
+    import fishem_mockupio
+    fish_data.fishem_config['mockupLoadWorkers'] = sys.argv[2]
+    loaded = fishem_mockupio.input(sys.argv[1])
+    print(json.dumps({'loaded': loaded, 'fish': list(fish.items())}))
+'''
+
+
+def test_loader_threads_build_the_same_fish(tmp_path, run_python):
+    mockup_dir = str(tmp_path / 'mockup')
+    write_mockup(mockup_dir, SENSORS)
+    results = {}
+    for workers in ('1', '8'):
+        output = run_python(LOAD_SCRIPT, mockup_dir, workers)
+        assert '(%d files in' % (SENSORS + 5) in output
+        results[workers] = json.loads(output.splitlines()[-1])
+    assert results['8'] == results['1']
+    keys = results['1']['loaded']
+    assert len(keys) == SENSORS + 5
+    assert [key for key, obj in results['1']['fish']] == keys
+    assert keys.index('/redfish/v1/Chassis/1/Sensors') < \
+        keys.index('/redfish/v1/Chassis/1/Sensors/S0')
+
+
+# Loads the mockup in sys.argv[1], changes, deletes, and adds a Sensor,
+# and saves the fish to the same mockup, then twice to the mockup in
+# sys.argv[2]
+SAVE_SCRIPT = '''
+    import sys
+    from fish_data import fish
+    import fishem_mockupio
+    sensors_key = '/redfish/v1/Chassis/1/Sensors'
+    fishem_mockupio.input(sys.argv[1])
+    fish[sensors_key + '/S1']['Reading'] = 99
+    fish.touch(sensors_key + '/S1')
+    del fish[sensors_key + '/S2']
+    fish[sensors_key + '/New'] = {'Id': 'New'}
+    fishem_mockupio.output(sys.argv[1])
+    fishem_mockupio.output(sys.argv[2])
+    fishem_mockupio.output(sys.argv[2])
+'''
+
+
+def test_only_changes_are_saved_to_the_loaded_mockup(mockup_dir, tmp_path,
+                                                     run_python):
+    sensors_dir = os.path.join(mockup_dir, SENSORS_PATH)
+    unchanged = os.path.join(sensors_dir, 'S0', 'index.json')
+    os.utime(unchanged, ns=(0, 0))
+    other_dir = str(tmp_path / 'other')
+    output = run_python(SAVE_SCRIPT, mockup_dir, other_dir).splitlines()
+    assert output[-3:] == [
+        'Saved the fish changes in the mockup in "' + mockup_dir +
+        '" (2 saved, 1 removed)',
+        'Saved the current fish as a mockup in "' + other_dir + '"',
+        # Changes are tracked against the mockup saved last
+        'Saved the fish changes in the mockup in "' + other_dir +
+        '" (0 saved, 0 removed)']
+    assert os.stat(unchanged).st_mtime_ns == 0
+    assert not os.path.exists(os.path.join(sensors_dir, 'S2'))
+    for sensors in (sensors_dir, os.path.join(other_dir, SENSORS_PATH)):
+        with open(os.path.join(sensors, 'S1', 'index.json')) as json_file:
+            assert json.load(json_file)['Reading'] == 99
+        with open(os.path.join(sensors, 'New', 'index.json')) as json_file:
+            assert json.load(json_file) == {'Id': 'New'}
+    # The full save writes every object
+    assert sorted(os.listdir(os.path.join(other_dir, SENSORS_PATH))) == \
+        sorted(os.listdir(sensors_dir))
+
+
+# Loads the mockup (or archive) in sys.argv[1], saves it to the mockup
+# archive in sys.argv[2], if given, and reports the fish
+ARCHIVE_SCRIPT = '''
+    import json, sys
+    from fish_data import fish
+    import fishem_mockupio
+    fishem_mockupio.input(sys.argv[1])
+    if len(sys.argv) > 2:
+        fishem_mockupio.output(sys.argv[2])
+    print(json.dumps(dict(fish)))
+'''
+
+
+@pytest.mark.parametrize('archive_name', ['mockup.tar.gz', 'mockup.zip',
+                                          'mockup.tar.xz', 'MOCKUP.TGZ'])
+def test_archive_round_trip(mockup_dir, tmp_path, run_python, archive_name):
+    archive_path = str(tmp_path / archive_name)
+    output = run_python(ARCHIVE_SCRIPT, mockup_dir, archive_path)
+    assert 'Saved the current fish as a mockup archive in "' + \
+        archive_path + '" (35 files)' in output
+    loaded = json.loads(output.splitlines()[-1])
+    output = run_python(ARCHIVE_SCRIPT, archive_path)
+    assert 'Loaded the mockup archive "' + archive_path + '" (35 files' \
+        in output
+    assert json.loads(output.splitlines()[-1]) == loaded
+    assert not os.path.exists(archive_path + '.tmp')
+
+
+def test_archive_root_is_the_top_index_file(mockup_dir, tmp_path,
+                                            run_python):
+    expected = json.loads(run_python(ARCHIVE_SCRIPT,
+                                     mockup_dir).splitlines()[-1])
+    # Archives made from the mockup directory, as tar and zip do
+    tar_path = str(tmp_path / 'mockup.tar')
+    with tarfile.open(tar_path, 'w') as archive:
+        archive.add(mockup_dir, arcname='mockup')
+    zip_path = str(tmp_path / 'mockup.zip')
+    with zipfile.ZipFile(zip_path, 'w') as archive:
+        for dir_path, dir_names, file_names in os.walk(mockup_dir):
+            for file_name in file_names:
+                file_path = os.path.join(dir_path, file_name)
+                archive.write(file_path, os.path.join(
+                    'top', 'mockup',
+                    os.path.relpath(file_path, mockup_dir)))
+        # Files outside the service root are ignored
+        archive.writestr('top/other/Thing/index.json', '{"Id": "Other"}')
+    for archive_path in (tar_path, zip_path):
+        assert json.loads(run_python(ARCHIVE_SCRIPT,
+                                     archive_path).splitlines()[-1]) == \
+            expected
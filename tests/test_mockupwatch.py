@@ -0,0 +1,66 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for input mockup watch mode (fishem_mockupwatch.py).
+"""
+
+# Standard library module imports
+import json                     # Script output
+
+# Third party module imports
+# None
+
+# Local module imports
+# None
+
+# Constants
+# Loads the mockup in sys.argv[1], then changes, adds, removes, and
+# breaks Sensor files, and reports what each poll applies
+WATCH_SCRIPT = '''
+    import json, os, shutil, sys
+    from fish_data import fish
+    import conftest
+    import fishem_mockupio, fishem_mockupwatch
+    mockup_dir = sys.argv[1]
+    sensors_dir = os.path.join(mockup_dir, 'Chassis', '1', 'Sensors')
+    sensors_key = '/redfish/v1/Chassis/1/Sensors'
+    fishem_mockupio.input(mockup_dir)
+    watcher = fishem_mockupwatch.Watcher(mockup_dir, 1)
+    steps = [watcher.poll()]
+
+    def write(name, obj):
+        file_path = os.path.join(sensors_dir, name, 'index.json')
+        conftest.write_json(file_path, obj)
+        # Make sure the file looks changed, however coarse the clock
+        os.utime(file_path, (1, 1 + len(steps)))
+
+    write('S1', dict(conftest.sensor(1), Reading=99))
+    write('S99', conftest.sensor(99))
+    shutil.rmtree(os.path.join(sensors_dir, 'S2'))
+    with open(os.path.join(sensors_dir, 'S3', 'index.json'), 'w') as bad:
+        bad.write('{"Id": ')
+    steps.append(watcher.poll())
+    state = {name: fish.get(sensors_key + '/' + name)
+             for name in ('S1', 'S2', 'S3', 'S99')}
+    write('S3', dict(conftest.sensor(3), Reading=33))
+    steps.append(watcher.poll())
+    steps.append(watcher.poll())
+    print(json.dumps({'steps': steps, 'state': state,
+                      'S3': fish[sensors_key + '/S3']}))
+'''
+
+
+def test_poll_applies_mockup_changes(mockup_dir, run_python):
+    output = run_python(WATCH_SCRIPT, mockup_dir)
+    assert 'Reloaded the mockup in "' + mockup_dir + \
+        '" (2 changed, 1 removed, in' in output
+    assert 'index.json" not reloaded: ' in output
+    result = json.loads(output.splitlines()[-1])
+    assert result['steps'] == [[0, 0], [2, 1], [1, 0], [0, 0]]
+    state = result['state']
+    assert state['S1']['Reading'] == 99
+    assert state['S2'] is None
+    assert state['S99']['Id'] == 'S99'
+    # The file that could not be decoded left the object as it was
+    assert state['S3']['Reading'] == 4.5
+    assert result['S3']['Reading'] == 33
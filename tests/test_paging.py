@@ -0,0 +1,94 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for $top/$skip paging with Members@odata.nextLink
+(fishem_query.py).
+"""
+
+# Standard library module imports
+# None
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+import fish_data                # fishem config parameters
+
+# Constants
+SENSORS_URI = '/redfish/v1/Chassis/1/Sensors'
+
+
+# Function: follow_pages()
+
+def follow_pages(client, uri):
+    """Returns the Ids of the members on every page of the collection
+    at 'uri', following nextLinks, and the pages read. Every page must
+    have the same Members@odata.count, the number of all members."""
+    ids = []
+    pages = []
+    counts = set()
+    while uri is not None:
+        data = client.get(uri).json
+        counts.add(data['Members@odata.count'])
+        ids.extend(member['@odata.id'].split('/')[-1]
+                   for member in data['Members'])
+        pages.append(uri)
+        uri = data.get('Members@odata.nextLink')
+    assert counts == {len(ids)}
+    return ids, pages
+
+    # End of follow_pages()
+
+
+def test_paging_follows_next_links(client):
+    ids, pages = follow_pages(client, SENSORS_URI + '?$top=7')
+    assert ids == ['S%d' % n for n in range(30)]
+    assert pages[1:] == [SENSORS_URI + '?$skip=%d&$top=7' % skip
+                         for skip in (7, 14, 21, 28)]
+
+
+def test_paging_with_default_page_size(client, monkeypatch):
+    monkeypatch.setitem(fish_data.fishem_config, 'collectionPageSize', 8)
+    data = client.get(SENSORS_URI).json
+    assert len(data['Members']) == 8
+    assert data['Members@odata.count'] == 30
+    assert data['Members@odata.nextLink'] == \
+        SENSORS_URI + '?$skip=8&$top=8'
+    # $top cannot go over the page size
+    assert len(client.get(SENSORS_URI + '?$top=20').json['Members']) == 8
+
+
+def test_skip_past_the_end(client):
+    data = client.get(SENSORS_URI + '?$skip=40&$top=5').json
+    assert data['Members'] == []
+    assert 'Members@odata.nextLink' not in data
+
+
+def test_top_zero_has_no_next_link(client):
+    data = client.get(SENSORS_URI + '?$top=0').json
+    assert data['Members'] == []
+    assert data['Members@odata.count'] == 30
+    assert 'Members@odata.nextLink' not in data
+
+
+@pytest.mark.parametrize('query', ['$top=-1', '$top=x', '$skip=1.5'])
+def test_bad_paging_input(client, query):
+    assert client.get(SENSORS_URI + '?' + query).status_code == 400
+
+
+def test_next_link_has_only_page_parameters(client):
+    first = client.get(SENSORS_URI +
+                       '?$top=5&client=one&$select=Name,Members').json
+    # Same cache variant, different spelling and other arguments
+    second = client.get(SENSORS_URI +
+                        '?$select=Members,Name&$top=5&client=two').json
+    expected = SENSORS_URI + '?$select=Members,Name&$skip=5&$top=5'
+    assert first['Members@odata.nextLink'] == expected
+    assert second['Members@odata.nextLink'] == expected
+
+
+def test_filtered_pages(client):
+    ids, pages = follow_pages(
+        client, SENSORS_URI + "?$filter=Status/Health eq 'Critical'&$top=4")
+    assert ids == ['S%d' % n for n in range(2, 30, 3)]
+    assert all('$filter=' in page for page in pages)
@@ -0,0 +1,88 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the serialized response cache (fishem_respcache.py): LRU
+eviction, and invalidation when fish objects change.
+"""
+
+# Standard library module imports
+# None
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_respcache         # Serialized response cache
+
+# Constants
+SENSORS_URI = '/redfish/v1/Chassis/1/Sensors'
+SENSOR_URI = SENSORS_URI + '/S27'
+
+
+def test_least_recently_used_responses_are_evicted():
+    cache = fishem_respcache.ResponseCache(400)
+    for number in range(10):
+        cache.put('/%d' % number, '', b'x' * 40, cache.generation)
+    cache.get('/0')
+    cache.put('/10', '', b'x' * 40, cache.generation)
+    assert cache.get('/1') is None
+    assert cache.get('/0') == b'x' * 40
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 400
+    # Responses larger than an eighth of the cache are not kept
+    cache.put('/big', '', b'x' * 51, cache.generation)
+    assert cache.get('/big') is None
+
+
+def test_invalidate_removes_the_key_and_its_parent():
+    cache = fishem_respcache.ResponseCache(1000)
+    for key, variant in (('/c', ''), ('/c/1', ''), ('/c/1', 'Id'),
+                         ('/c/1/x', ''), ('/c/2', '')):
+        cache.put(key, variant, key.encode(), cache.generation)
+    cache.invalidate('/c/1')
+    assert [key for key in (('/c', ''), ('/c/1', ''), ('/c/1', 'Id'),
+                            ('/c/1/x', ''), ('/c/2', ''))
+            if cache.get(*key) is not None] == [('/c/1/x', ''), ('/c/2', '')]
+    assert cache.stats()['invalidations'] == 3
+
+
+def test_responses_encoded_during_an_invalidation_are_not_kept():
+    cache = fishem_respcache.ResponseCache(1000)
+    generation = cache.generation
+    cache.invalidate('/a')
+    cache.put('/a', '', b'stale', generation)
+    assert cache.get('/a') is None
+
+
+@pytest.fixture
+def sensor_27():
+    """Restores Sensor S27 after a test that changes it."""
+    obj = fish[SENSOR_URI]
+    yield SENSOR_URI
+    fish[SENSOR_URI] = obj
+
+    # End of sensor_27()
+
+
+def test_gets_are_answered_from_the_cache(client):
+    cache = fishem_respcache.cache
+    first = client.get(SENSOR_URI)
+    hits = cache.stats()['hits']
+    second = client.get(SENSOR_URI)
+    assert cache.stats()['hits'] == hits + 1
+    assert second.data == first.data
+    assert second.json['Id'] == 'S27'
+
+
+def test_changes_invalidate_cached_responses(client, sensor_27):
+    client.get(SENSOR_URI)
+    client.get(SENSOR_URI + '?$select=Reading')
+    client.get(SENSORS_URI)
+    # Changed in place, as the API modules do
+    fish[SENSOR_URI]['Reading'] = -1
+    fish.touch(SENSOR_URI)
+    assert client.get(SENSOR_URI).json['Reading'] == -1
+    assert client.get(SENSOR_URI + '?$select=Reading').json['Reading'] == -1
+    # The collection is invalidated with its members
+    assert fishem_respcache.cache.get(SENSORS_URI) is None
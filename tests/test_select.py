@@ -0,0 +1,64 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for $select and 'only' on GET (fishem_query.py).
+"""
+
+# Standard library module imports
+# None
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+import fishem_query             # Query parameters
+
+# Constants
+SENSORS_URI = '/redfish/v1/Chassis/1/Sensors'
+SENSOR_URI = SENSORS_URI + '/S2'
+
+
+def test_parse_select():
+    tree = fishem_query.parse_select('Status/Health, Name,Status/State')
+    assert tree == {'Status': {'Health': {}, 'State': {}}, 'Name': {}}
+    # A whole property wins over its parts
+    assert fishem_query.parse_select('Status,Status/Health') == \
+        {'Status': {}}
+    assert fishem_query.select_text('Status/State,Name,Status/Health') == \
+        'Name,Status/Health,Status/State'
+
+
+@pytest.mark.parametrize('text', ['', 'Name,', 'Status//Health', '/Name'])
+def test_bad_select(text):
+    with pytest.raises(fishem_query.QueryError):
+        fishem_query.parse_select(text)
+
+
+def test_select_applies_to_array_items():
+    value = {'Items': [{'A': 1, 'B': 2}, {'A': 3}], 'C': 4}
+    assert fishem_query.select(value, {'Items': {'A': {}}}) == \
+        {'Items': [{'A': 1}, {'A': 3}]}
+
+
+def test_select_in_requests(client):
+    data = client.get(SENSOR_URI + '?$select=Status/Health,Reading').json
+    assert data == {'@odata.id': SENSOR_URI,
+                    '@odata.type': '#Sensor.v1_5_0.Sensor',
+                    'Reading': 3.0, 'Status': {'Health': 'Critical'}}
+    assert client.get(SENSOR_URI + '?$select=').status_code == 400
+
+
+def test_select_members(client):
+    data = client.get(SENSORS_URI + '?$select=Members').json
+    assert set(data) == {'@odata.id', '@odata.type', 'Members'}
+    assert len(data['Members']) == 30
+
+
+def test_only(client):
+    # The Chassis collection has one member
+    assert client.get('/redfish/v1/Chassis?only').json['Id'] == '1'
+    assert client.get('/redfish/v1/Chassis?only&$select=Id').json == \
+        {'@odata.id': '/redfish/v1/Chassis/1', 'Id': '1'}
+    # Other resources are returned as they are
+    assert 'Members' in client.get(SENSORS_URI + '?only').json
+    assert client.get(SENSOR_URI + '?only').json['Id'] == 'S2'
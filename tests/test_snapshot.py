@@ -0,0 +1,102 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for background fish snapshots (fishem_snapshot.py), and for the
+FishDoctor.Snapshot action that starts them.
+"""
+
+# Standard library module imports
+import json                     # Snapshot files
+import os                       # Snapshot files
+import sys                      # Thread switch interval
+import threading                # Concurrent fish changes
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_snapshot          # Background fish snapshots
+
+# Constants
+SNAPSHOT_URI = '/fishdoctor/Actions/FishDoctor.Snapshot'
+TEST_KEY = '/test/snapshot/Thing'
+
+
+def test_snapshot_is_the_fish_when_it_was_started(tmp_path):
+    snapshot_file = tmp_path / 'fish.json'
+    results = []
+    fish[TEST_KEY] = {'Value': 1}
+    try:
+        snapshot = fishem_snapshot.save(str(snapshot_file), results.append)
+        assert snapshot is not None
+        # Changes made while the snapshot is saved are not in it
+        fish[TEST_KEY]['Value'] = 2
+        fish.touch(TEST_KEY)
+        # Only one snapshot is saved at a time
+        assert fishem_snapshot.save(str(tmp_path / 'other.json')) is None
+        fishem_snapshot.wait()
+    finally:
+        del fish[TEST_KEY]
+    assert results == [True]
+    assert not fishem_snapshot.in_progress()
+    with open(snapshot_file) as fish_file:
+        assert json.load(fish_file)[TEST_KEY] == {'Value': 1}
+    assert not os.path.exists(tmp_path / 'other.json')
+
+
+def test_trigger_counts_every_change(tmp_path):
+    trigger = fishem_snapshot.Trigger(str(tmp_path / 'fish.json'), 0,
+                                      10 ** 9)
+    # Switch threads as often as possible, to expose lost updates
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=lambda: [
+            trigger.fish_changed('/key') for count in range(20000)])
+            for number in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(old_interval)
+    assert trigger.changed == 4 * 20000
+
+
+def test_trigger_saves_after_changes(tmp_path):
+    snapshot_file = tmp_path / 'fish.json'
+    trigger = fishem_snapshot.Trigger(str(snapshot_file), 0, 3)
+    trigger.thread.start()
+    try:
+        for count in range(3):
+            trigger.fish_changed('/key')
+        for attempt in range(100):
+            fishem_snapshot.wait()
+            if snapshot_file.exists():
+                break
+            threading.Event().wait(0.05)
+    finally:
+        trigger.stop()
+        fishem_snapshot.wait()
+    assert snapshot_file.exists()
+    assert trigger.changed == 0
+
+
+@pytest.mark.parametrize('file_name', [
+    '../outside.json', '/tmp/outside.json', '..', 'sub/dir.json', 5])
+def test_snapshot_file_name_must_be_in_the_snapshot_directory(
+        client, emulator, file_name):
+    resp = client.post(SNAPSHOT_URI, json={'FileName': file_name})
+    assert resp.status_code == 400
+    assert not os.path.exists(emulator[1] / 'outside.json')
+
+
+def test_snapshot_to_another_file(client, emulator):
+    resp = client.post(SNAPSHOT_URI, json={'FileName': 'other.json'})
+    assert resp.status_code == 202
+    fishem_snapshot.wait()
+    snapshot_file = emulator[1] / 'snapshots' / 'other.json'
+    assert resp.json['InProgress']['FileName'] == str(snapshot_file)
+    with open(snapshot_file) as fish_file:
+        assert '/redfish/v1/Chassis/1' in json.load(fish_file)
@@ -0,0 +1,158 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the SQLite fish store (fishem_sqlfish.py): the object
+cache, pinning the objects a request changes, restoring the fish,
+and running $filter expressions in SQL.
+"""
+
+# Standard library module imports
+import json                     # Stored objects
+import sqlite3                  # SQL $filter
+import threading                # Store lock
+from collections import OrderedDict     # Cache order
+
+# Third party module imports
+import flask                    # Request handling
+import pytest                   # Test framework
+
+# Local module imports
+import fishem_filter            # $filter expressions
+import fishem_sqlfish           # SQLite fish store
+from test_filter import EXPRESSIONS, MEMBERS, selected  # $filter cases
+
+# Constants
+STORE_SCRIPT = '''
+    import json, sys
+    from fish_data import fish
+    import fishem_sqlfish, fishem_query
+    config = {'fishStore': 'sqlite', 'fishStoreFile': sys.argv[1],
+              'fishStoreCacheObjects': 5}
+    restored = fishem_sqlfish.start(config)
+    coll_key = '/redfish/v1/Sensors'
+    if not restored:
+        fish[coll_key] = {'Members': [{'@odata.id': coll_key + '/%d' % n}
+                                      for n in range(20)]}
+        for n in range(20):
+            fish[coll_key + '/%d' % n] = {
+                'Id': str(n), 'Reading': n,
+                'Status': {'Health': 'OK' if n % 3 else 'Critical'}}
+    fishem_sqlfish.finish_load()
+    fish[coll_key + '/4']['Reading'] = 400
+    fish.touch(coll_key + '/4')
+    filtered = fishem_query.filter_members(
+        coll_key, fish[coll_key], "Status/Health eq 'Critical' or "
+        "Reading gt 300")
+    cold = sum(1 for key in fish if dict.get(fish, key) is
+               fishem_sqlfish.COLD)
+    print(json.dumps({'restored': restored,
+                      'members': [member['@odata.id'].split('/')[-1]
+                                  for member in filtered['Members']],
+                      'cold': cold,
+                      'sensor4': fish.peek(coll_key + '/4')}))
+    fishem_sqlfish.stop()
+'''
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Returns a SqlFishDict (not the fish) that keeps 2 objects in
+    its cache, with objects 'a', 'b', and 'c'."""
+    fish_store = fishem_sqlfish.SqlFishDict()
+    fish_store.store_lock = threading.RLock()
+    fish_store.hot = OrderedDict()
+    fish_store.pinned = {}
+    fish_store.cache_objects = 2
+    fish_store.db = fishem_sqlfish.open_store(str(tmp_path / 'fish.db'))
+    fish_store.loading = False
+    for key in ('a', 'b', 'c'):
+        fish_store[key] = {'Key': key, 'N': 0}
+    yield fish_store
+    fish_store.db.close()
+
+    # End of store()
+
+
+# Function: stored()
+
+def stored(fish_store, key):
+    """Returns the object for 'key' in the database of 'fish_store'."""
+    row = fish_store.db.execute('SELECT value FROM fish WHERE key = ?',
+                                (key,)).fetchone()
+    return json.loads(row[0])
+
+    # End of stored()
+
+
+def test_least_recently_used_objects_are_evicted(store):
+    assert dict.get(store, 'a') is fishem_sqlfish.COLD
+    store['b']
+    store['a']
+    assert dict.get(store, 'c') is fishem_sqlfish.COLD
+    assert store['c'] == {'Key': 'c', 'N': 0}
+    assert list(store.hot) == ['a', 'c']
+
+
+def test_objects_used_by_a_request_are_not_evicted(store, monkeypatch):
+    # teardown_request() releases the pins on the fish
+    monkeypatch.setattr(fishem_sqlfish, 'fish', store)
+    app = flask.Flask('test_sqlfish')
+    app.teardown_request(fishem_sqlfish.teardown_request)
+
+    @app.route('/patch')
+    def patch():
+        # Change 'a' in place, one property at a time, while other
+        # objects are read
+        store['a']['N'] = 1
+        store['b']
+        store['c']
+        store['a']['Other'] = 2
+        store.touch('a')
+        return 'OK'
+
+    assert app.test_client().get('/patch').status_code == 200
+    assert stored(store, 'a') == {'Key': 'a', 'N': 1, 'Other': 2}
+    # The pins are released, and the cache is back to its size
+    assert store.pinned == {}
+    assert len(store.hot) == 2
+
+
+def test_touch_of_an_evicted_object_is_reported(store, capsys):
+    store['a']['N'] = 5
+    store['b']
+    store['c']
+    store.touch('a')
+    assert 'Changes to fish object a were lost' in capsys.readouterr().out
+    assert stored(store, 'a')['N'] == 0
+
+
+def test_restore_and_sql_filter(tmp_path, run_python):
+    store_file = str(tmp_path / 'store.db')
+    first = json.loads(run_python(STORE_SCRIPT, store_file).splitlines()[-1])
+    assert first['restored'] is False
+    assert first['members'] == ['0', '3', '4', '6', '9', '12', '15', '18']
+    second = json.loads(run_python(STORE_SCRIPT, store_file).splitlines()[-1])
+    assert second['restored'] is True
+    assert second['members'] == first['members']
+    assert second['sensor4']['Reading'] == 400
+    # The members were matched in SQL, without being read into memory
+    assert second['cold'] >= 15
+
+
+@pytest.mark.parametrize('text', EXPRESSIONS)
+def test_sql_matches_python(text):
+    db = sqlite3.connect(':memory:')
+    db.execute('CREATE TABLE fish (key TEXT PRIMARY KEY, value TEXT)')
+    db.executemany('INSERT INTO fish VALUES (?, ?)',
+                   [(member['Id'], json.dumps(member))
+                    for member in MEMBERS])
+    sql, params = fishem_sqlfish.sql_condition(
+        fishem_filter.get_filter(text).expr)
+    rows = db.execute('SELECT f.key FROM fish AS f WHERE ' + sql +
+                      ' ORDER BY f.rowid', params).fetchall()
+    assert [row[0] for row in rows] == selected(text)
+
+
+def test_sql_not_used_for_property_comparisons():
+    compiled = fishem_filter.get_filter('Reading eq Id')
+    assert fishem_sqlfish.sql_condition(compiled.expr) is None
@@ -0,0 +1,88 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the subtree index (fishem_subtree.py): whole path segment
+matching, keys added in bulk, and deleting subtrees.
+"""
+
+# Standard library module imports
+# None
+
+# Third party module imports
+import pytest                   # Test framework
+
+# Local module imports
+from fish_data import fish      # Fish data
+import fishem_subtree           # Subtree index
+
+# Constants
+BASE = '/test/subtree'
+KEYS = [BASE + path for path in (
+    '/Systems', '/Systems/1', '/Systems/1/Storage', '/Systems/1/Storage/A',
+    '/Systems/10', '/Systems/1x', '/Systems/2')]
+
+
+@pytest.fixture
+def keys():
+    """Adds test objects for KEYS to the fish, and removes them after
+    the test."""
+    for key in KEYS:
+        fish[key] = {'@odata.id': key}
+    yield KEYS
+    for key in KEYS:
+        fish.pop(key, None)
+
+    # End of keys()
+
+
+def test_subtrees_end_on_path_segment_boundaries(keys):
+    assert fishem_subtree.subtree_keys(BASE + '/Systems/1') == [
+        BASE + '/Systems/1', BASE + '/Systems/1/Storage',
+        BASE + '/Systems/1/Storage/A']
+    assert fishem_subtree.subtree_keys(BASE + '/Systems/3') == []
+    assert fishem_subtree.subtree_keys(BASE + '/Sys') == []
+
+
+def test_delete_subtree(keys):
+    deleted = fishem_subtree.delete_subtree(BASE + '/Systems/1')
+    assert deleted == KEYS[1:4]
+    assert [key for key in KEYS if key in fish] == \
+        [KEYS[0]] + KEYS[4:]
+    # Deleted keys are removed from the index
+    assert fishem_subtree.subtree_keys(BASE + '/Systems/1') == []
+    assert fishem_subtree.subtree_keys(BASE + '/Systems') == \
+        [KEYS[0]] + KEYS[4:]
+
+
+def test_keys_added_in_bulk(keys):
+    index = fishem_subtree.KeyTrie()
+    index.add_bulk(sorted(KEYS[1:]))
+    index.add(BASE + '/Systems/1/Memory')
+    fish[BASE + '/Systems/1/Memory'] = {}
+    try:
+        assert index.keys_below(BASE + '/Systems/1') == [
+            BASE + '/Systems/1', BASE + '/Systems/1/Memory',
+            BASE + '/Systems/1/Storage', BASE + '/Systems/1/Storage/A']
+        # Bulk keys no longer in the fish are not found
+        del fish[BASE + '/Systems/1/Storage/A']
+        assert BASE + '/Systems/1/Storage/A' not in \
+            index.keys_below(BASE + '/Systems')
+    finally:
+        fish.pop(BASE + '/Systems/1/Memory', None)
+
+
+def test_delete_request_removes_the_subtree(client):
+    chassis_uri = '/redfish/v1/Chassis/Sub'
+    assert client.post('/redfish/v1/Chassis',
+                       json={'Id': 'Sub'}).status_code == 201
+    assert client.post('/redfish/v1/Chassis',
+                       json={'Id': 'Sub2'}).status_code == 201
+    try:
+        fish[chassis_uri + '/Sensors'] = {'Members': []}
+        fish[chassis_uri + '/Sensors/T'] = {'Id': 'T'}
+        assert client.delete(chassis_uri).status_code == 200
+        assert fishem_subtree.subtree_keys(chassis_uri) == []
+        assert chassis_uri + '/Sensors/T' not in fish
+        assert '/redfish/v1/Chassis/Sub2' in fish
+    finally:
+        client.delete('/redfish/v1/Chassis/Sub2')
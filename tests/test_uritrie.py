@@ -0,0 +1,137 @@
+# Copyright (c) 2021-2022 by Don Deel. All rights reserved.
+
+"""
+Tests for the trie-based URI dispatcher (fishem_uritrie.py): URI
+pattern matching, and the 404, 405, and OPTIONS handling that Flask
+provides for its own URL rules.
+"""
+
+# Standard library module imports
+import json                     # Script output
+
+# Third party module imports
+import flask                    # Request handling
+import flask_restful            # Resource classes
+import pytest                   # Test framework
+
+# Local module imports
+import fishem_uritrie           # Trie-based URI dispatcher
+
+# Constants
+SYSTEM = '/redfish/v1/Systems/<string:ComputerSystemId>'
+
+# Starts fishem with the trie dispatcher, and reports some responses
+TRIE_SCRIPT = '''
+    import json, sys
+    import conftest
+    app = conftest.start_fishem('--imockup', sys.argv[1],
+                                '--uriDispatcher', 'trie')
+    client = app.test_client()
+    results = {}
+    for uri in ('/redfish/v1/Chassis/1/Sensors/S7',
+                '/redfish/v1/Chassis/1/Sensors/S7/',
+                '/redfish/v1/Chassis/1/Sensors/S99',
+                '/redfish/v1/NoSuchThing'):
+        resp = client.get(uri)
+        data = resp.json if resp.is_json else None
+        results[uri] = [resp.status_code,
+                        data.get('Id') if isinstance(data, dict) else None]
+    print(json.dumps(results))
+'''
+
+
+@pytest.fixture
+def trie():
+    """Returns a UriTrie with patterns of each kind."""
+    uri_trie = fishem_uritrie.UriTrie()
+    uri_trie.add(SYSTEM, 'system')
+    uri_trie.add('/redfish/v1/Systems/Special', 'special')
+    uri_trie.add(SYSTEM + '/NetworkDeviceFunctions<string:FunctionId>',
+                 'mixed')
+    uri_trie.add('/fishdoctor/<path:UriPath>/Actions/<string:UriAction>',
+                 'action')
+    uri_trie.add('/fishdoctor/<path:UriPath>', 'fishdoctor')
+    return uri_trie
+
+    # End of trie()
+
+
+@pytest.mark.parametrize('path, target, uri_vars', [
+    ('/redfish/v1/Systems/1', 'system', {'ComputerSystemId': '1'}),
+    ('/redfish/v1/Systems/1/', 'system', {'ComputerSystemId': '1'}),
+    ('/redfish/v1/Systems/Special', 'special', {}),
+    ('/redfish/v1/Systems/1/NetworkDeviceFunctions7', 'mixed',
+     {'ComputerSystemId': '1', 'FunctionId': '7'}),
+    ('/fishdoctor/Chassis/1/Actions/Reset', 'action',
+     {'UriPath': 'Chassis/1', 'UriAction': 'Reset'}),
+    ('/fishdoctor/Chassis/1', 'fishdoctor', {'UriPath': 'Chassis/1'}),
+    ('/redfish/v1/Systems', None, None),
+    ('/redfish/v1/Systems/1/Other', None, None)])
+def test_match(trie, path, target, uri_vars):
+    assert trie.match(path) == (target, uri_vars)
+
+
+def test_first_pattern_added_wins(trie):
+    assert not trie.add(SYSTEM + '/', 'again')
+    assert not trie.add('/redfish/v1/Systems/<string:OtherName>', 'again')
+    assert trie.match('/redfish/v1/Systems/1')[0] == 'system'
+    assert trie.pattern_count == 5
+
+
+@pytest.fixture
+def dispatcher_client():
+    """Returns a Flask test client for an app that routes a GET-only
+    and a GET/PATCH resource through the trie dispatcher."""
+    app = flask.Flask('test_uritrie')
+    dispatcher = fishem_uritrie.TrieDispatcher(flask_restful.Api(app))
+    dispatcher.install(app)
+
+    class ReadOnly(flask_restful.Resource):
+        def get(self, ComputerSystemId):
+            return {'Id': ComputerSystemId}
+
+    class Writable(flask_restful.Resource):
+        def get(self):
+            return {'Id': 'Writable'}
+
+        def patch(self):
+            return {'Patched': True}
+
+    dispatcher.add_resource(ReadOnly, SYSTEM, SYSTEM + '/')
+    dispatcher.add_resource(Writable, '/redfish/v1/Writable')
+    return app.test_client()
+
+    # End of dispatcher_client()
+
+
+def test_dispatch(dispatcher_client):
+    resp = dispatcher_client.get('/redfish/v1/Systems/7/')
+    assert resp.status_code == 200
+    assert resp.json == {'Id': '7'}
+    assert dispatcher_client.head('/redfish/v1/Systems/7').status_code == \
+        200
+    assert dispatcher_client.patch('/redfish/v1/Writable').json == \
+        {'Patched': True}
+    assert dispatcher_client.get('/redfish/v1/Nothing').status_code == 404
+
+
+@pytest.mark.parametrize('uri, allowed', [
+    ('/redfish/v1/Systems/7', 'GET, HEAD, OPTIONS'),
+    ('/redfish/v1/Writable', 'GET, HEAD, OPTIONS, PATCH')])
+def test_allowed_methods(dispatcher_client, uri, allowed):
+    resp = dispatcher_client.options(uri)
+    assert resp.status_code == 200
+    assert resp.headers['Allow'] == allowed
+    resp = dispatcher_client.delete(uri)
+    assert resp.status_code == 405
+    assert resp.headers['Allow'] == allowed
+
+
+def test_fishem_with_the_trie_dispatcher(run_python, mockup_dir):
+    results = json.loads(run_python(TRIE_SCRIPT, mockup_dir)
+                         .splitlines()[-1])
+    assert results == {
+        '/redfish/v1/Chassis/1/Sensors/S7': [200, 'S7'],
+        '/redfish/v1/Chassis/1/Sensors/S7/': [200, 'S7'],
+        '/redfish/v1/Chassis/1/Sensors/S99': [404, None],
+        '/redfish/v1/NoSuchThing': [404, None]}